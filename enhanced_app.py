@@ -1,11 +1,14 @@
 import json
 import re
 from flask import Flask, request, jsonify, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from openai import OpenAI
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 import os
+from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
 import time
@@ -13,13 +16,34 @@ import asyncio
 import chromadb
 from chromadb.config import Settings
 
+try:
+    import orjson  # Serializes JSON responses several times faster than json
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
+
 # Load environment variables from .env file (look in parent directories too)
 env_path = Path(__file__).parent / '.env'
 if not env_path.exists():
     env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(env_path)
 
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson; responses are compact, with Flask's default() for other types"""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(
+            obj,
+            default=self.default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+        ).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+if ORJSON_AVAILABLE:
+    app.json = ORJSONProvider(app)
 
 # Initialize OpenAI client
 api_key = os.getenv("OPENAI_API_KEY")
@@ -27,9 +51,18 @@ if not api_key:
     raise ValueError("OPENAI_API_KEY not found. Please set it in your .env file.")
 client = OpenAI(api_key=api_key)
 
+_WHITESPACE_RE = re.compile(r'\s+')
+# Tag of a discourse element in "[[Category/Element]] description" form
+_DISCOURSE_TAG_RE = re.compile(r'\[\[([^\]]+)\]\]')
+# Numbered citation in a summary, in square brackets [1] or parentheses (1)
+_CITATION_RE = re.compile(r'[\[\(](\d+)[\]\)]')
+
 # Global variables
 dataset = []
+chunk_by_id = {}  # chunk id -> chunk in dataset, rebuilt by load_dataset
+boost_features = []  # ChunkBoostFeatures of each dataset chunk, indexed by its _chunk_index
 available_sources = []
+source_name_by_id = {}  # available_sources id -> name, for ChromaDB where clauses
 valid_concepts = []
 valid_discourse_elements = []
 valid_scripture_references = set()
@@ -38,6 +71,8 @@ valid_authors = set()
 valid_sources = set()
 chroma_client = None
 chroma_collection = None
+# Distance function of chroma_collection ("l2", "cosine" or "ip"), read from its hnsw:space metadata
+chroma_distance_space = 'l2'
 
 def load_schema_indices():
     """Load valid concepts and discourse elements from index files"""
@@ -74,7 +109,7 @@ def load_schema_indices():
 
 def load_chromadb():
     """Initialize ChromaDB client and collection"""
-    global chroma_client, chroma_collection
+    global chroma_client, chroma_collection, chroma_distance_space
     
     script_dir = Path(__file__).parent
     chroma_db_path = script_dir / 'chroma_db'
@@ -87,8 +122,10 @@ def load_chromadb():
         
         collection_name = "theological_corpus"
         chroma_collection = chroma_client.get_collection(name=collection_name)
+        # Collections created before migrate_to_chroma.py set hnsw:space use ChromaDB's default, l2
+        chroma_distance_space = (chroma_collection.metadata or {}).get('hnsw:space', 'l2')
         
-        print(f"✅ ChromaDB initialized: {chroma_collection.count()} chunks in collection")
+        print(f"✅ ChromaDB initialized: {chroma_collection.count()} chunks in collection ({chroma_distance_space} distance)")
         return True
     except Exception as e:
         print(f"⚠️  ChromaDB initialization failed: {e}")
@@ -97,7 +134,7 @@ def load_chromadb():
 
 def load_dataset():
     """Load the theological chunks dataset from deployed sources"""
-    global dataset, available_sources, valid_scripture_references, valid_named_entities, valid_authors, valid_sources
+    global dataset, chunk_by_id, boost_features, available_sources, source_name_by_id, valid_scripture_references, valid_named_entities, valid_authors, valid_sources
     
     # Get the path to deployed sources (relative to this file)
     script_dir = Path(__file__).parent
@@ -146,6 +183,11 @@ def load_dataset():
                             continue
         
         available_sources = list(sources_map.values())
+        source_name_by_id = {source_info['id']: source_info['name'] for source_info in available_sources}
+        # Maps ChromaDB result ids back to chunks on every search
+        chunk_by_id = {chunk.get('id'): chunk for chunk in dataset}
+        # Metadata normalized once here instead of on every re-rank
+        boost_features = [chunk_boost_features(chunk) for chunk in dataset]
         
         # Extract valid scripture references, named entities, authors, and sources from dataset
         for chunk in dataset:
@@ -170,17 +212,27 @@ def load_dataset():
         print(f"Error loading dataset: {e}")
         return False
 
+def canonicalize_query(query):
+    """Strip and collapse whitespace so queries differing only in spacing share one cache entry (case is kept, since this is the text that gets embedded)"""
+    return _WHITESPACE_RE.sub(' ', query.strip())
+
+@lru_cache(maxsize=1024)
+def _cached_embedding(query_canonical):
+    """Embed a canonicalized query; repeated queries skip the API round trip (errors are not cached)"""
+    response = client.embeddings.create(
+        input=query_canonical,
+        model="text-embedding-3-small"
+    )
+    return tuple(response.data[0].embedding)
+
 def get_embedding(text):
     """Get embedding for a text using OpenAI API"""
     start_time = time.time()
     try:
-        response = client.embeddings.create(
-            input=text,
-            model="text-embedding-3-small"
-        )
+        embedding = list(_cached_embedding(canonicalize_query(text)))
         elapsed = time.time() - start_time
         print(f"[TIMING] get_embedding: {elapsed:.2f}s")
-        return response.data[0].embedding
+        return embedding
     except Exception as e:
         print(f"Error getting embedding: {e}")
         elapsed = time.time() - start_time
@@ -193,16 +245,14 @@ async def get_embedding_async(text):
     try:
         # OpenAI client doesn't have native async, but we can run in executor
         loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
+        embedding = await loop.run_in_executor(
             None,
-            lambda: client.embeddings.create(
-                input=text,
-                model="text-embedding-3-small"
-            )
+            _cached_embedding,
+            canonicalize_query(text)
         )
         elapsed = time.time() - start_time
         print(f"[TIMING] get_embedding_async: {elapsed:.2f}s")
-        return response.data[0].embedding
+        return list(embedding)
     except Exception as e:
         print(f"Error getting embedding (async): {e}")
         elapsed = time.time() - start_time
@@ -418,104 +468,117 @@ Respond in JSON format:
             "search_strategy": "Using basic vector similarity search"
         }
 
+def chroma_distances_to_similarities(distances, count):
+    """Convert ChromaDB query distances to cosine similarities clamped to [0, 1]
+    
+    Missing distances count as unrelated (similarity 0).
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    if chroma_distance_space in ('cosine', 'ip'):
+        # Cosine distance is 1 - cosine_similarity (inner product distance is 1 - dot
+        # product, the same thing for normalized embeddings)
+        similarities = 1.0 - distances
+    else:
+        # ChromaDB's default "l2" space returns squared Euclidean distance, and for
+        # normalized embeddings ||a - b||² = 2 * (1 - cosine_similarity)
+        similarities = 1.0 - distances / 2.0
+    
+    # Debug: Check for unusual distances
+    unrelated = int(np.count_nonzero(similarities < 0.001))
+    if unrelated:
+        print(f"[DEBUG] Found {unrelated} chunks with similarity ~0.0 or below (distance range {distances.min():.3f}-{distances.max():.3f}, space={chroma_distance_space})")
+    
+    similarities = np.clip(similarities, 0.0, 1.0)
+    if len(similarities) < count:
+        similarities = np.concatenate([similarities, np.zeros(count - len(similarities))])
+    return similarities
+
+def retrieve_candidates(query_embedding, selected_sources=None):
+    """Stage 1 of search_with_filters: ChromaDB top 100 by similarity, as parallel lists of dataset
+    chunks and similarity scores; needs no query analysis, so it can run while the analysis is pending"""
+    if not query_embedding:
+        return [], []
+    
+    # STAGE 1: ChromaDB vector search - get top 100 by similarity
+    if not chroma_collection:
+        raise RuntimeError("ChromaDB collection not initialized. Please run migrate_to_chroma.py first.")
+    
+    stage1_start = time.time()
+    
+    # Build where clause for source filtering if needed
+    where_clause = None
+    if selected_sources and len(selected_sources) > 0:
+        # ChromaDB where clause: {"source": {"$in": [...]}}
+        # Need to map source IDs back to source names
+        source_names = [source_name_by_id[source_id] for source_id in selected_sources if source_id in source_name_by_id]
+        if source_names:
+            where_clause = {"source": {"$in": source_names}}
+    
+    # Query ChromaDB for top 100 results; chunk text and metadata come from dataset,
+    # so only ids and distances are fetched
+    results = chroma_collection.query(
+        query_embeddings=[query_embedding],
+        n_results=100,  # Get top 100 for re-ranking
+        where=where_clause,
+        include=["distances"]
+    )
+    
+    stage1_time = time.time() - stage1_start
+    print(f"[TIMING] Stage 1 (ChromaDB top 100): {stage1_time:.3f}s")
+    
+    # Map ChromaDB results back to dataset chunks, kept as parallel candidate/similarity
+    # arrays; result dicts are only built for the final top 15
+    candidates = []
+    candidate_similarities = []
+    if results['ids'] and len(results['ids'][0]) > 0:
+        ids = results['ids'][0]
+        similarities = chroma_distances_to_similarities(results['distances'][0] if results.get('distances') else [], len(ids))
+        for chunk_id, similarity in zip(ids, similarities.tolist()):
+            chunk = chunk_by_id.get(chunk_id)
+            if chunk is not None:
+                candidates.append(chunk)
+                candidate_similarities.append(similarity)
+    
+    return candidates, candidate_similarities
+
+def rerank_candidates(candidates, candidate_similarities, analysis):
+    """Stage 2 of search_with_filters: re-rank retrieve_candidates() results with the metadata boost → top 15"""
+    if not candidates:
+        return []
+    
+    # STAGE 2: Re-rank top 100 with metadata boost
+    stage2_start = time.time()
+    prepared_boost = prepare_metadata_boost(analysis)
+    base_scores = np.array(candidate_similarities, dtype=np.float64)
+    metadata_boosts = np.array([calculate_metadata_boost(chunk, analysis, prepared_boost, boost_features[chunk['_chunk_index']]) for chunk in candidates], dtype=np.float64)
+    final_scores = base_scores + metadata_boosts
+    
+    # Sort by final score (stable, so ties keep similarity order) and return top 15
+    top_15 = [
+        {
+            # Embeddings are only needed for retrieval, not by the client
+            **{key: value for key, value in candidates[i].items() if key != 'embedding'},
+            'similarity_score': float(base_scores[i]),
+            'metadata_boost': float(metadata_boosts[i]),
+            'final_score': float(final_scores[i])
+        }
+        for i in np.argsort(-final_scores, kind='stable')[:15].tolist()
+    ]
+    
+    stage2_time = time.time() - stage2_start
+    print(f"[TIMING] Stage 2 (Re-rank top 100): {stage2_time:.3f}s")
+    
+    return top_15
+
 def search_with_filters(query, query_embedding, analysis, selected_sources=None):
     """Perform intelligent two-stage search: ChromaDB top 100 → re-rank with metadata → top 15"""
     try:
-        if not query_embedding:
-            return []
-        
         start_time = time.time()
-        
-        # STAGE 1: ChromaDB vector search - get top 100 by similarity
-        if not chroma_collection:
-            raise RuntimeError("ChromaDB collection not initialized. Please run migrate_to_chroma.py first.")
-        
-        stage1_start = time.time()
-        
-        # Build where clause for source filtering if needed
-        where_clause = None
-        if selected_sources and len(selected_sources) > 0:
-            # ChromaDB where clause: {"source": {"$in": [...]}}
-            # Need to map source IDs back to source names
-            source_names = []
-            for source_info in available_sources:
-                if source_info['id'] in selected_sources:
-                    source_names.append(source_info['name'])
-            if source_names:
-                where_clause = {"source": {"$in": source_names}}
-        
-        # Query ChromaDB for top 100 results
-        results = chroma_collection.query(
-            query_embeddings=[query_embedding],
-            n_results=100,  # Get top 100 for re-ranking
-            where=where_clause
-        )
-        
-        stage1_time = time.time() - stage1_start
-        print(f"[TIMING] Stage 1 (ChromaDB top 100): {stage1_time:.3f}s")
-        
-        # Map ChromaDB results back to full chunk objects
-        top_100_chunks = []
-        if results['ids'] and len(results['ids'][0]) > 0:
-            # Create mapping from chunk ID to full chunk data
-            chunk_map = {chunk.get('id'): chunk for chunk in dataset}
-            
-            # Get distances (ChromaDB returns distances, convert to similarities)
-            distances = results['distances'][0] if results.get('distances') else []
-            
-            # Debug: Check for unusual distances and log distribution
-            if distances:
-                min_dist = min(distances)
-                max_dist = max(distances)
-                distances_at_1 = sum(1 for d in distances if abs(d - 1.0) < 0.001)
-                if max_dist > 1.0:
-                    print(f"[WARNING] ChromaDB returned distances > 1.0: max={max_dist:.3f}, min={min_dist:.3f}")
-                if distances_at_1 > 0:
-                    print(f"[DEBUG] Found {distances_at_1} chunks with distance ~1.0 (similarity ~0.0)")
-            
-            for idx, chunk_id in enumerate(results['ids'][0]):
-                if chunk_id in chunk_map:
-                    chunk = chunk_map[chunk_id].copy()
-                    # Convert ChromaDB distance to cosine similarity
-                    # ChromaDB by default uses L2 (Euclidean) distance, not cosine distance
-                    # For normalized embeddings: L2_distance² = 2 * (1 - cosine_similarity)
-                    # So: cosine_similarity = 1 - (L2_distance² / 2)
-                    distance = distances[idx] if idx < len(distances) else 2.0
-                    # Convert L2 distance to cosine similarity
-                    similarity = 1.0 - ((distance ** 2) / 2.0)
-                    # Clamp to [0, 1] range
-                    similarity = max(0.0, min(1.0, similarity))
-                    chunk['similarity_score'] = float(similarity)
-                    top_100_chunks.append(chunk)
-        
-        if not top_100_chunks:
-            return []
-        
-        # STAGE 2: Re-rank top 100 with metadata boost
-        stage2_start = time.time()
-        scored_chunks = []
-        
-        for chunk in top_100_chunks:
-            base_score = chunk.get('similarity_score', 0.0)
-            metadata_boost = calculate_metadata_boost(chunk, analysis)
-            final_score = base_score + metadata_boost
-            
-            scored_chunks.append({
-                **chunk,
-                'similarity_score': float(base_score),
-                'metadata_boost': float(metadata_boost),
-                'final_score': float(final_score)
-            })
-        
-        # Sort by final score and return top 15
-        scored_chunks.sort(key=lambda x: x['final_score'], reverse=True)
-        top_15 = scored_chunks[:15]
-        
-        stage2_time = time.time() - stage2_start
-        total_time = time.time() - start_time
-        print(f"[TIMING] Stage 2 (Re-rank top 100): {stage2_time:.3f}s")
-        print(f"[TIMING] Total search time: {total_time:.3f}s")
-        
+        candidates, candidate_similarities = retrieve_candidates(query_embedding, selected_sources)
+        top_15 = rerank_candidates(candidates, candidate_similarities, analysis)
+        if top_15:
+            total_time = time.time() - start_time
+            print(f"[TIMING] Total search time: {total_time:.3f}s")
         return top_15
         
     except Exception as e:
@@ -524,115 +587,211 @@ def search_with_filters(query, query_embedding, analysis, selected_sources=None)
         traceback.print_exc()
         return []
 
-def calculate_metadata_boost(chunk, analysis):
-    """Calculate metadata-based relevance boost"""
-    boost = 0.0
-    metadata = chunk.get('metadata', {})
+async def retrieve_candidates_async(query, selected_sources=None):
+    """Embed the query and run retrieve_candidates in an executor
+    
+    Returns (query embedding or None, candidates, candidate similarities); retrieval errors are
+    logged and give no candidates, as in search_with_filters.
+    """
+    query_embedding = await get_embedding_async(query)
+    if not query_embedding:
+        return None, [], []
+    try:
+        loop = asyncio.get_event_loop()
+        candidates, candidate_similarities = await loop.run_in_executor(
+            None,
+            retrieve_candidates,
+            query_embedding,
+            selected_sources
+        )
+        return query_embedding, candidates, candidate_similarities
+    except Exception as e:
+        print(f"Error in retrieve_candidates: {e}")
+        import traceback
+        traceback.print_exc()
+        return query_embedding, [], []
+
+def normalize_scripture(ref):
+    """Normalize Scripture reference for comparison"""
+    if not ref:
+        return None
+    # Remove extra spaces, convert to lowercase
+    return _WHITESPACE_RE.sub(' ', str(ref).strip().lower())
+
+def prepare_metadata_boost(analysis):
+    """Normalize the analysis' suggested filters once, for scoring many chunks with calculate_metadata_boost"""
     suggested = analysis.get('suggested_filters', {})
+    suggested_scripture = [normalize_scripture(ref) for ref in suggested.get('scripture_references', [])]
+    return {
+        'scripture': set(suggested_scripture),
+        # "book chapter" of each suggested reference, e.g. "genesis 1" for "Genesis 1:1-5"
+        'scripture_chapters': [ref.split(':')[0].strip() for ref in suggested_scripture if ref],
+        # Book name (first word) of each suggested reference
+        'scripture_books': [ref.split()[0] for ref in suggested_scripture if ref and ref.split()],
+        'named_entities': set(suggested.get('named_entities', [])),
+        'concepts': set(suggested.get('concepts', [])),
+        'discourse_elements': set(suggested.get('discourse_elements', []))
+    }
+
+@dataclass(slots=True)
+class ChunkBoostFeatures:
+    """A chunk's metadata in the normalized form calculate_metadata_boost compares against"""
+    scripture: tuple  # normalize_scripture of each scripture reference
+    scripture_chapters: frozenset  # "book chapter" part of each normalized reference
+    named_entities: frozenset
+    concepts: frozenset
+    discourse_tags: frozenset
+
+def chunk_boost_features(chunk):
+    """Normalize a chunk's metadata for calculate_metadata_boost"""
+    metadata = chunk.get('metadata', {})
+    scripture = tuple(normalize_scripture(ref) for ref in metadata.get('scripture_references', []))
+    discourse_tags = metadata.get('discourse_tags', [])
+    # Fallback: extract from discourse_elements for backward compatibility
+    if not discourse_tags:
+        # Extract tag from format "[[Category/Element]] description"
+        discourse_tags = [tag_match.group(1) for tag_match in map(_DISCOURSE_TAG_RE.search, metadata.get('discourse_elements', [])) if tag_match]
+    return ChunkBoostFeatures(
+        scripture=scripture,
+        scripture_chapters=frozenset(ref.split(':')[0].strip() for ref in scripture if ref),
+        named_entities=frozenset(metadata.get('named_entities', [])),
+        concepts=frozenset(metadata.get('concepts', [])),
+        discourse_tags=frozenset(discourse_tags)
+    )
+
+def calculate_metadata_boost(chunk, analysis, prepared=None, features=None):
+    """Calculate metadata-based relevance boost
+    
+    prepared is prepare_metadata_boost(analysis); pass it when re-ranking many chunks
+    against the same analysis. features is chunk_boost_features(chunk), e.g. from
+    boost_features for dataset chunks.
+    """
+    if prepared is None:
+        prepared = prepare_metadata_boost(analysis)
+    if features is None:
+        features = chunk_boost_features(chunk)
+    boost = 0.0
     
     # SCRIPTURE REFERENCE MATCHING - Priority 3
     # Scripture references are precise metadata but lower priority than concepts/discourse
-    chunk_scripture = metadata.get('scripture_references', [])
-    suggested_scripture = suggested.get('scripture_references', [])
+    chunk_scripture_normalized = features.scripture
+    suggested_scripture = prepared['scripture']
     
-    if chunk_scripture and suggested_scripture:
-        # Normalize Scripture references for comparison
-        def normalize_scripture(ref):
-            """Normalize Scripture reference for comparison"""
-            if not ref:
-                return None
-            # Remove extra spaces, convert to lowercase
-            normalized = re.sub(r'\s+', ' ', str(ref).strip().lower())
-            return normalized
-        
-        chunk_scripture_normalized = [normalize_scripture(ref) for ref in chunk_scripture]
-        suggested_scripture_normalized = [normalize_scripture(ref) for ref in suggested_scripture]
-        
+    if chunk_scripture_normalized and suggested_scripture:
         # Check for exact matches first (highest priority)
-        exact_matches = set(chunk_scripture_normalized) & set(suggested_scripture_normalized)
+        exact_matches = suggested_scripture.intersection(chunk_scripture_normalized)
         if exact_matches:
             # Exact match gets very high boost (0.5 per match, up to 1.0 total)
             boost += min(len(exact_matches) * 0.5, 1.0)
         else:
             # Check for chapter-level matches (e.g., "Genesis 1" matches "Genesis 1:1-5")
-            for suggested_ref in suggested_scripture_normalized:
-                if not suggested_ref:
-                    continue
-                # Extract book and chapter from suggested reference
-                # Format: "book chapter" or "book chapter:verse"
-                parts = suggested_ref.split(':')
-                if len(parts) > 0:
-                    book_chapter = parts[0].strip()  # e.g., "genesis 1"
-                    # Check if any chunk reference starts with this book/chapter
-                    # Important: Use word boundary to avoid "genesis 1" matching "genesis 14"
-                    for chunk_ref in chunk_scripture_normalized:
-                        if chunk_ref:
-                            # Check for exact chapter match: chunk starts with "book chapter:" or equals "book chapter"
-                            if chunk_ref == book_chapter or chunk_ref.startswith(book_chapter + ':'):
-                                # Chapter-level match gets high boost (0.3 per match, up to 0.6 total)
-                                boost += 0.3
-                                break
-                            # Also check if chunk reference has the same book and chapter (handles variations)
-                            # Split chunk_ref to get its book_chapter part
-                            chunk_parts = chunk_ref.split(':')
-                            chunk_book_chapter = chunk_parts[0].strip() if chunk_parts else chunk_ref
-                            if chunk_book_chapter == book_chapter:
-                                boost += 0.3
-                                break
-                    if boost >= 0.6:
-                        break
+            # Compare whole "book chapter" parts so "genesis 1" does not match "genesis 14"
+            chunk_chapters = features.scripture_chapters
+            for book_chapter in prepared['scripture_chapters']:
+                if book_chapter in chunk_chapters:
+                    # Chapter-level match gets high boost (0.3 per match, up to 0.6 total)
+                    boost += 0.3
+                if boost >= 0.6:
+                    break
             
             # Check for book-level matches (e.g., "Genesis" matches "Genesis 1", "Genesis 3", etc.)
             if boost < 0.3:  # Only if no chapter match found
-                for suggested_ref in suggested_scripture_normalized:
-                    if not suggested_ref:
-                        continue
-                    # Extract book name (first word)
-                    book_name = suggested_ref.split()[0] if suggested_ref.split() else None
-                    if book_name:
-                        for chunk_ref in chunk_scripture_normalized:
-                            if chunk_ref and chunk_ref.startswith(book_name):
-                                # Book-level match gets moderate boost (0.15 per match, up to 0.3 total)
-                                boost += 0.15
-                                break
-                        if boost >= 0.3:
-                            break
+                for book_name in prepared['scripture_books']:
+                    if any(chunk_ref and chunk_ref.startswith(book_name) for chunk_ref in chunk_scripture_normalized):
+                        # Book-level match gets moderate boost (0.15 per match, up to 0.3 total)
+                        boost += 0.15
+                    if boost >= 0.3:
+                        break
     
     # NAMED ENTITY MATCHING - Priority 4
-    chunk_entities = metadata.get('named_entities', [])
-    suggested_entities = suggested.get('named_entities', [])
+    chunk_entities = features.named_entities
+    suggested_entities = prepared['named_entities']
     if chunk_entities and suggested_entities:
-        entity_overlap = len(set(chunk_entities) & set(suggested_entities))
+        entity_overlap = len(suggested_entities.intersection(chunk_entities))
         boost += entity_overlap * 0.1
     
     # CONCEPT MATCHING - HIGHEST PRIORITY (Priority 1)
-    chunk_concepts = metadata.get('concepts', [])
-    suggested_concepts = suggested.get('concepts', [])
+    chunk_concepts = features.concepts
+    suggested_concepts = prepared['concepts']
     if chunk_concepts and suggested_concepts:
-        concept_overlap = len(set(chunk_concepts) & set(suggested_concepts))
+        concept_overlap = len(suggested_concepts.intersection(chunk_concepts))
         boost += concept_overlap * 0.15  # Higher boost for concepts
     
     # DISCOURSE ELEMENT MATCHING - Priority 2
-    chunk_discourse_tags = metadata.get('discourse_tags', [])
-    # Fallback: extract from discourse_elements for backward compatibility
-    if not chunk_discourse_tags:
-        chunk_functions = metadata.get('discourse_elements', [])
-        if chunk_functions:
-            for func in chunk_functions:
-                # Extract tag from format "[[Category/Element]] description"
-                tag_match = re.search(r'\[\[([^\]]+)\]\]', func)
-                if tag_match:
-                    chunk_discourse_tags.append(tag_match.group(1))
-    
-    suggested_discourse = suggested.get('discourse_elements', [])
+    chunk_discourse_tags = features.discourse_tags
+    suggested_discourse = prepared['discourse_elements']
     if chunk_discourse_tags and suggested_discourse:
         # Match discourse tags (e.g., "Symbolic/Metaphor", "Logical/Claim")
-        discourse_overlap = len(set(chunk_discourse_tags) & set(suggested_discourse))
+        discourse_overlap = len(suggested_discourse.intersection(chunk_discourse_tags))
         boost += discourse_overlap * 0.12  # High boost for discourse elements
     
     # Cap boost at 1.5 (increased from 0.3 to allow Scripture reference boosts)
     return min(boost, 1.5)
 
+def renumber_citations(summary, old_to_new_mapping):
+    """Rewrite each citation number through old_to_new_mapping in one pass, keeping [n] or (n) form"""
+    def renumber(match):
+        new_citation_num = old_to_new_mapping.get(int(match.group(1)))
+        if new_citation_num is None:
+            return match.group(0)
+        citation = match.group(0)
+        # Preserve original format (brackets or parentheses)
+        if citation[0] == '(' and citation[-1] == ')':
+            return f'({new_citation_num})'
+        return f'[{new_citation_num}]'
+    
+    return _CITATION_RE.sub(renumber, summary)
+
+def relevance_explanation(chunk):
+    """Simple relevance explanation built from a chunk's metadata (no API call for speed)"""
+    similarity_score = chunk.get('similarity_score', 0)
+    metadata = chunk.get('metadata', {})
+    
+    explanation_parts = []
+    if metadata.get('scripture_references'):
+        refs = metadata['scripture_references'][:1]
+        explanation_parts.append(f"Scripture: {', '.join(refs)}")
+    if metadata.get('concepts'):
+        concepts = metadata['concepts'][:1]
+        explanation_parts.append(f"Concept: {', '.join(concepts)}")
+    if metadata.get('topics'):
+        topics = metadata['topics'][:1]
+        explanation_parts.append(f"Topic: {', '.join(topics)}")
+    
+    if explanation_parts:
+        return f"{' | '.join(explanation_parts)}. (similarity: {similarity_score:.3f})"
+    return f"Relevant content matching query. (similarity: {similarity_score:.3f})"
+
+def cite_sources(summary, prompt_chunks):
+    """Renumber a summary's citations to 1..n in order of source number and list the cited chunks
+    
+    Citation [k] or (k) refers to prompt_chunks[k - 1], as numbered in the prompt; numbers outside
+    that range are not source citations and are left as written. Returns (summary, sources_used).
+    """
+    cited_numbers = sorted({int(match.group(1)) for match in _CITATION_RE.finditer(summary)}
+                           .intersection(range(1, len(prompt_chunks) + 1)))
+    
+    sources_used = []
+    old_to_new_mapping = {}
+    for new_num, old_num in enumerate(cited_numbers, 1):
+        old_to_new_mapping[old_num] = new_num
+        chunk_index = old_num - 1
+        chunk = prompt_chunks[chunk_index]
+        sources_used.append({
+            'number': new_num,  # Add number field for frontend
+            'source': chunk.get('source', 'Unknown Source'),
+            'author': chunk.get('author', 'Unknown Author'),
+            'location': chunk.get('metadata', {}).get('structure_path', 'Unknown'),
+            'relevance_explanation': relevance_explanation(chunk),
+            'chunk_id': chunk.get('id', ''),
+            '_chunk_index': chunk.get('_chunk_index', chunk_index),
+            'metadata': chunk.get('metadata', {}),
+            'text': chunk.get('text', '')  # Include text for display
+        })
+    
+    # Preserve each citation's original format (brackets or parentheses)
+    return renumber_citations(summary, old_to_new_mapping), sources_used
+
 def generate_research_summary(query, analysis, chunks, existing_reasoning=None):
     """Generate comprehensive research summary with proper citations"""
     try:
@@ -644,8 +803,9 @@ def generate_research_summary(query, analysis, chunks, existing_reasoning=None):
             }
         
         # Prepare context for synthesis
+        prompt_chunks = chunks[:10]  # Use top 10 chunks
         sources_context = []
-        for i, chunk in enumerate(chunks[:10], 1):  # Use top 10 chunks
+        for i, chunk in enumerate(prompt_chunks, 1):
             source_info = f"[{i}] {chunk.get('source', 'Unknown')}"
             if chunk.get('author'):
                 source_info += f" by {chunk['author']}"
@@ -689,7 +849,7 @@ Guidelines:
 Available sources:
 {context_text}
 
-Create a comprehensive research summary with proper numbered citations. IMPORTANT: You MUST end the summary with a "Citations" section listing all cited sources as a numbered list."""
+Create a comprehensive research summary with proper numbered citations. Cite only the sources above, by their numbers [1] to [{len(prompt_chunks)}]. IMPORTANT: You MUST end the summary with a "Citations" section listing all cited sources as a numbered list."""
             }],
             temperature=0.5,
             max_tokens=1500
@@ -699,112 +859,11 @@ Create a comprehensive research summary with proper numbered citations. IMPORTAN
         
         summary = response.choices[0].message.content
         
-        # Extract citations and create source list
-        # Look for both square brackets [1] and parentheses (1)
-        citation_pattern = re.compile(r'[\[\(](\d+)[\]\)]')
-        cited_numbers = set()
-        for match in citation_pattern.finditer(summary):
-            try:
-                cited_numbers.add(int(match.group(1)))
-            except ValueError:
-                continue
-        
-        # Renumber citations to be sequential
-        old_to_new_mapping = {}
-        for new_num, old_num in enumerate(sorted(cited_numbers), 1):
-            old_to_new_mapping[old_num] = new_num
-        
-        # Build sources list with explanations (only for cited chunks)
-        # Batch generate relevance explanations for cited chunks
-        cited_chunks = []
-        cited_indices = []
-        for old_num in sorted(cited_numbers):
-            chunk_index = old_num - 1
-            if chunk_index < len(chunks):
-                cited_chunks.append(chunks[chunk_index])
-                cited_indices.append(chunk_index)
-        
-        # Generate simple relevance explanations (no API call for speed)
+        # Renumber citations sequentially and build the sources list (only for cited chunks)
         summary_explanation_start = time.time()
-        cited_explanations = []
-        for chunk in cited_chunks:
-            similarity_score = chunk.get('similarity_score', 0)
-            metadata = chunk.get('metadata', {})
-            
-            # Build simple explanation from metadata
-            explanation_parts = []
-            if metadata.get('scripture_references'):
-                refs = metadata['scripture_references'][:1]
-                explanation_parts.append(f"Scripture: {', '.join(refs)}")
-            if metadata.get('concepts'):
-                concepts = metadata['concepts'][:1]
-                explanation_parts.append(f"Concept: {', '.join(concepts)}")
-            if metadata.get('topics'):
-                topics = metadata['topics'][:1]
-                explanation_parts.append(f"Topic: {', '.join(topics)}")
-            
-            if explanation_parts:
-                explanation = f"{' | '.join(explanation_parts)}. (similarity: {similarity_score:.3f})"
-            else:
-                explanation = f"Relevant content matching query. (similarity: {similarity_score:.3f})"
-            
-            cited_explanations.append(explanation)
-        
+        fixed_summary, renumbered_sources = cite_sources(summary, prompt_chunks)
         summary_explanation_time = time.time() - summary_explanation_start
-        print(f"[TIMING] Simple summary explanations ({len(cited_chunks)} chunks): {summary_explanation_time:.3f}s")
-        
-        # Build sources list
-        renumbered_sources = []
-        for new_num, old_num in enumerate(sorted(cited_numbers), 1):
-            chunk_index = old_num - 1
-            if chunk_index < len(chunks):
-                chunk = chunks[chunk_index]
-                # Get explanation from batch results
-                # Find the position of this chunk_index in cited_indices
-                try:
-                    explanation_idx = cited_indices.index(chunk_index)
-                    explanation = cited_explanations[explanation_idx] if explanation_idx < len(cited_explanations) else f"Relevant content. (similarity: {chunk.get('similarity_score', 0):.3f})"
-                except ValueError:
-                    # Chunk not in cited_indices (shouldn't happen, but handle gracefully)
-                    explanation = f"Relevant content. (similarity: {chunk.get('similarity_score', 0):.3f})"
-                
-                source_entry = {
-                    'number': new_num,  # Add number field for frontend
-                    'source': chunk.get('source', 'Unknown Source'),
-                    'author': chunk.get('author', 'Unknown Author'),
-                    'location': chunk.get('metadata', {}).get('structure_path', 'Unknown'),
-                    'relevance_explanation': explanation,
-                    'chunk_id': chunk.get('id', ''),
-                    '_chunk_index': chunk.get('_chunk_index', chunk_index),
-                    'metadata': chunk.get('metadata', {}),
-                    'text': chunk.get('text', '')  # Include text for display
-                }
-                renumbered_sources.append(source_entry)
-        
-        # Fix citations in summary - preserve original format (brackets or parentheses)
-        # Extract all citations with their positions and formats
-        citation_matches = []
-        for match in citation_pattern.finditer(summary):
-            old_citation_num = int(match.group(1))
-            # Determine if it's brackets or parentheses
-            start_char = summary[match.start()]
-            end_char = summary[match.end() - 1]
-            citation_format = (start_char, end_char)  # e.g., ('[', ']') or ('(', ')')
-            citation_matches.append((match.start(), match.end(), old_citation_num, citation_format))
-        
-        # Sort by position in reverse to replace from end to start
-        citation_matches.sort(key=lambda x: x[0], reverse=True)
-        fixed_summary = summary
-        
-        for start_pos, end_pos, old_citation_num, citation_format in citation_matches:
-            if old_citation_num in old_to_new_mapping:
-                new_citation_num = old_to_new_mapping[old_citation_num]
-                # Preserve original format (brackets or parentheses)
-                if citation_format == ('(', ')'):
-                    new_citation = f'({new_citation_num})'
-                else:
-                    new_citation = f'[{new_citation_num}]'
-                fixed_summary = fixed_summary[:start_pos] + new_citation + fixed_summary[end_pos:]
+        print(f"[TIMING] Simple summary explanations ({len(renumbered_sources)} chunks): {summary_explanation_time:.3f}s")
         
         return {
             "summary": fixed_summary,
@@ -1183,58 +1242,37 @@ def search_only():
         if not dataset:
             return jsonify({"error": "Dataset not loaded"}), 500
         
-        # Step 1: Parallel async processing - query analysis + embedding generation
+        # Step 1: Parallel async processing - query analysis alongside embedding generation and
+        # Stage 1 retrieval (ChromaDB top 100), which does not depend on the analysis
         parallel_start = time.time()
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         try:
-            analysis, query_embedding = loop.run_until_complete(
+            analysis, (query_embedding, candidates, candidate_similarities) = loop.run_until_complete(
                 asyncio.gather(
                     analyze_query_async(query),
-                    get_embedding_async(query)
+                    retrieve_candidates_async(query, selected_sources)
                 )
             )
         finally:
             loop.close()
         parallel_time = time.time() - parallel_start
-        print(f"[TIMING] Parallel (analysis + embedding): {parallel_time:.2f}s")
+        print(f"[TIMING] Parallel (analysis + embedding + retrieval): {parallel_time:.2f}s")
         
         if not query_embedding:
             return jsonify({"error": "Failed to generate query embedding"}), 500
         
-        # Step 2: Search with filters and source selection (two-stage retrieval)
+        # Step 2: Re-rank the retrieved candidates with the analysis' metadata filters
         start_time = time.time()
-        chunks = search_with_filters(query, query_embedding, analysis, selected_sources)
+        chunks = rerank_candidates(candidates, candidate_similarities, analysis)
         search_time = time.time() - start_time
-        print(f"[TIMING] Two-stage search: {search_time:.2f}s")
+        print(f"[TIMING] Re-rank: {search_time:.2f}s")
         
         # Step 3: Generate relevance explanations - SKIPPED for faster response
         # Using simple similarity-based explanations instead of AI-generated ones
         # This reduces response time from ~18s to ~3-4s
         top_chunks = chunks[:15]  # Use top 15 chunks
-        relevance_explanations = []
-        for chunk in top_chunks:
-            similarity_score = chunk.get('similarity_score', 0)
-            metadata = chunk.get('metadata', {})
-            
-            # Build simple explanation from metadata (no API call)
-            explanation_parts = []
-            if metadata.get('scripture_references'):
-                refs = metadata['scripture_references'][:1]
-                explanation_parts.append(f"Scripture: {', '.join(refs)}")
-            if metadata.get('concepts'):
-                concepts = metadata['concepts'][:1]
-                explanation_parts.append(f"Concept: {', '.join(concepts)}")
-            if metadata.get('topics'):
-                topics = metadata['topics'][:1]
-                explanation_parts.append(f"Topic: {', '.join(topics)}")
-            
-            if explanation_parts:
-                explanation = f"{' | '.join(explanation_parts)}. (similarity: {similarity_score:.3f})"
-            else:
-                explanation = f"Relevant content matching query. (similarity: {similarity_score:.3f})"
-            
-            relevance_explanations.append(explanation)
+        relevance_explanations = [relevance_explanation(chunk) for chunk in top_chunks]
         
         print(f"[TIMING] Simple relevance explanations (no API): <0.01s")
         
@@ -1246,7 +1284,7 @@ def search_only():
                 'source': chunk.get('source', 'Unknown Source'),
                 'author': chunk.get('author', 'Unknown Author'),
                 'location': chunk.get('metadata', {}).get('structure_path', 'Unknown'),
-                'relevance_explanation': relevance_explanations[i-1] if i-1 < len(relevance_explanations) else f"Relevant content. (similarity: {chunk.get('similarity_score', 0):.3f})",
+                'relevance_explanation': relevance_explanations[i-1],
                 'chunk_id': chunk.get('id', ''),
                 '_chunk_index': chunk.get('_chunk_index', i-1),
                 'metadata': chunk.get('metadata', {}),
@@ -1370,8 +1408,9 @@ def generate_research_summary_stream(query, analysis, chunks, existing_reasoning
             return
         
         # Prepare context for synthesis
+        prompt_chunks = chunks[:10]  # Use top 10 chunks
         sources_context = []
-        for i, chunk in enumerate(chunks[:10], 1):  # Use top 10 chunks
+        for i, chunk in enumerate(prompt_chunks, 1):
             source_info = f"[{i}] {chunk.get('source', 'Unknown')}"
             if chunk.get('author'):
                 source_info += f" by {chunk['author']}"
@@ -1420,7 +1459,7 @@ Guidelines:
 Available sources:
 {context_text}
 
-Create a comprehensive research summary with proper numbered citations. IMPORTANT: You MUST end the summary with a "Citations" section listing all cited sources as a numbered list."""
+Create a comprehensive research summary with proper numbered citations. Cite only the sources above, by their numbers [1] to [{len(prompt_chunks)}]. IMPORTANT: You MUST end the summary with a "Citations" section listing all cited sources as a numbered list."""
             }],
             temperature=0.5,
             max_tokens=1500,
@@ -1438,95 +1477,8 @@ Create a comprehensive research summary with proper numbered citations. IMPORTAN
         summary_time = time.time() - summary_start
         print(f"[TIMING] Summary generation (streaming): {summary_time:.2f}s")
         
-        # Extract citations and create source list
-        citation_pattern = re.compile(r'[\[\(](\d+)[\]\)]')
-        cited_numbers = set()
-        for match in citation_pattern.finditer(full_summary):
-            try:
-                cited_numbers.add(int(match.group(1)))
-            except ValueError:
-                continue
-        
-        # Renumber citations to be sequential
-        old_to_new_mapping = {}
-        for new_num, old_num in enumerate(sorted(cited_numbers), 1):
-            old_to_new_mapping[old_num] = new_num
-        
-        # Build sources list with explanations (only for cited chunks)
-        cited_chunks = []
-        cited_indices = []
-        for old_num in sorted(cited_numbers):
-            chunk_index = old_num - 1
-            if chunk_index < len(chunks):
-                cited_chunks.append(chunks[chunk_index])
-                cited_indices.append(chunk_index)
-        
-        # Generate simple relevance explanations (no API call for speed)
-        cited_explanations = []
-        for chunk in cited_chunks:
-            similarity_score = chunk.get('similarity_score', 0)
-            metadata = chunk.get('metadata', {})
-            
-            explanation_parts = []
-            if metadata.get('scripture_references'):
-                refs = metadata['scripture_references'][:1]
-                explanation_parts.append(f"Scripture: {', '.join(refs)}")
-            if metadata.get('concepts'):
-                concepts = metadata['concepts'][:1]
-                explanation_parts.append(f"Concept: {', '.join(concepts)}")
-            if metadata.get('topics'):
-                topics = metadata['topics'][:1]
-                explanation_parts.append(f"Topic: {', '.join(topics)}")
-            
-            if explanation_parts:
-                explanation = f"{' | '.join(explanation_parts)}. (similarity: {similarity_score:.3f})"
-            else:
-                explanation = f"Relevant content matching query. (similarity: {similarity_score:.3f})"
-            
-            cited_explanations.append(explanation)
-        
-        # Build sources list
-        renumbered_sources = []
-        for new_num, old_num in enumerate(sorted(cited_numbers), 1):
-            chunk_index = old_num - 1
-            if chunk_index < len(chunks):
-                chunk = chunks[chunk_index]
-                explanation_idx = cited_indices.index(chunk_index) if chunk_index in cited_indices else -1
-                explanation = cited_explanations[explanation_idx] if explanation_idx >= 0 and explanation_idx < len(cited_explanations) else f"Relevant content. (similarity: {chunk.get('similarity_score', 0):.3f})"
-                
-                source_entry = {
-                    'number': new_num,
-                    'source': chunk.get('source', 'Unknown Source'),
-                    'author': chunk.get('author', 'Unknown Author'),
-                    'location': chunk.get('metadata', {}).get('structure_path', 'Unknown'),
-                    'relevance_explanation': explanation,
-                    'chunk_id': chunk.get('id', ''),
-                    '_chunk_index': chunk.get('_chunk_index', chunk_index),
-                    'metadata': chunk.get('metadata', {}),
-                    'text': chunk.get('text', '')
-                }
-                renumbered_sources.append(source_entry)
-        
-        # Fix citations in summary - preserve original format
-        citation_matches = []
-        for match in citation_pattern.finditer(full_summary):
-            old_citation_num = int(match.group(1))
-            start_char = full_summary[match.start()]
-            end_char = full_summary[match.end() - 1]
-            citation_format = (start_char, end_char)
-            citation_matches.append((match.start(), match.end(), old_citation_num, citation_format))
-        
-        citation_matches.sort(key=lambda x: x[0], reverse=True)
-        fixed_summary = full_summary
-        
-        for start_pos, end_pos, old_citation_num, citation_format in citation_matches:
-            if old_citation_num in old_to_new_mapping:
-                new_citation_num = old_to_new_mapping[old_citation_num]
-                if citation_format == ('(', ')'):
-                    new_citation = f'({new_citation_num})'
-                else:
-                    new_citation = f'[{new_citation_num}]'
-                fixed_summary = fixed_summary[:start_pos] + new_citation + fixed_summary[end_pos:]
+        # Renumber citations sequentially and build the sources list (only for cited chunks)
+        fixed_summary, renumbered_sources = cite_sources(full_summary, prompt_chunks)
         
         # Send final data
         yield f"data: {json.dumps({
@@ -1556,14 +1508,15 @@ def search():
         if not dataset:
             return jsonify({"error": "Dataset not loaded"}), 500
         
-        # Step 1: Parallel async processing - query analysis + embedding generation
+        # Step 1: Parallel async processing - query analysis alongside embedding generation and
+        # Stage 1 retrieval (ChromaDB top 100), which does not depend on the analysis
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         try:
-            analysis, query_embedding = loop.run_until_complete(
+            analysis, (query_embedding, candidates, candidate_similarities) = loop.run_until_complete(
                 asyncio.gather(
                     analyze_query_async(query),
-                    get_embedding_async(query)
+                    retrieve_candidates_async(query, selected_sources)
                 )
             )
         finally:
@@ -1572,8 +1525,8 @@ def search():
         if not query_embedding:
             return jsonify({"error": "Failed to generate query embedding"}), 500
         
-        # Step 2: Search with filters and source selection (two-stage retrieval)
-        chunks = search_with_filters(query, query_embedding, analysis, selected_sources)
+        # Step 2: Re-rank the retrieved candidates with the analysis' metadata filters
+        chunks = rerank_candidates(candidates, candidate_similarities, analysis)
         
         # Step 3: Generate research summary
         result = generate_research_summary(query, analysis, chunks)
@@ -1599,14 +1552,15 @@ def search_context():
         if not context_text:
             return jsonify({"error": "Context text is required"}), 400
         
-        # Parallel async processing - query analysis + embedding generation
+        # Parallel async processing - query analysis alongside embedding generation and
+        # Stage 1 retrieval (ChromaDB top 100), which does not depend on the analysis
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         try:
-            analysis, query_embedding = loop.run_until_complete(
+            analysis, (query_embedding, candidates, candidate_similarities) = loop.run_until_complete(
                 asyncio.gather(
                     analyze_query_async(context_text),
-                    get_embedding_async(context_text)
+                    retrieve_candidates_async(context_text, selected_sources)
                 )
             )
         finally:
@@ -1615,22 +1569,22 @@ def search_context():
         if not query_embedding:
             return jsonify({"error": "Failed to generate query embedding"}), 500
         
-        # Search with filters and source selection (two-stage retrieval)
-        chunks = search_with_filters(context_text, query_embedding, analysis, selected_sources)
+        # Re-rank the retrieved candidates with the analysis' metadata filters
+        chunks = rerank_candidates(candidates, candidate_similarities, analysis)
         
         # For draft mode, we don't need a research summary, just return the chunks
         # Format the response similar to research mode but without synthesis
         sources_used = []
         for i, chunk in enumerate(chunks[:10], 1):  # Use top 10 chunks
             # Generate a relevance explanation using AI
-            relevance_explanation = generate_relevance_explanation(context_text, chunk)
+            explanation = generate_relevance_explanation(context_text, chunk)
             
             source_info = {
                 "number": i,
                 "source": chunk.get('source', 'Unknown'),
                 "author": chunk.get('author', 'Unknown'),
                 "location": chunk.get('metadata', {}).get('structure_path', 'Unknown'),
-                "relevance": relevance_explanation
+                "relevance": explanation
             }
             sources_used.append(source_info)
         
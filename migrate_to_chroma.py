@@ -8,9 +8,20 @@ for faster vector similarity search. Run this once after installing ChromaDB.
 
 import json
 import chromadb
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from chromadb.config import Settings
 
+try:
+    import orjson  # Parses the embedding arrays several times faster than json
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
+
+# Chunks per collection.add call (capped at the client's maximum batch size)
+BATCH_SIZE = 1000
+
 def migrate_to_chroma():
     """Migrate existing chunks to ChromaDB"""
     
@@ -49,12 +60,15 @@ def migrate_to_chroma():
         print(f"Creating new collection: {collection_name}")
     
     # Create collection with cosine distance metric
-    # ChromaDB defaults to L2, but we want cosine for normalized embeddings
+    # ChromaDB defaults to (squared) L2, but we want cosine for normalized embeddings
     collection = client.create_collection(
         name=collection_name,
-        metadata={"description": "Theological corpus with embeddings"},
-        # Use cosine distance for normalized embeddings
-        # This makes distance = 1 - cosine_similarity
+        metadata={
+            "description": "Theological corpus with embeddings",
+            # Use cosine distance for normalized embeddings
+            # This makes distance = 1 - cosine_similarity
+            "hnsw:space": "cosine"
+        }
     )
     
     # Load chunks from JSONL files
@@ -75,13 +89,27 @@ def migrate_to_chroma():
     chunk_count = 0
     skipped_count = 0
     
+    batch_size = min(BATCH_SIZE, getattr(client, 'get_max_batch_size', lambda: BATCH_SIZE)())
+    loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+    
+    # Insert each batch on a background thread while the next one is parsed; at most
+    # one insert is in flight, and waiting on it re-raises any insert error
+    insert_executor = ThreadPoolExecutor(max_workers=1)
+    pending_insert = None
+    
+    def insert_batch(**batch):
+        nonlocal pending_insert
+        if pending_insert is not None:
+            pending_insert.result()
+        pending_insert = insert_executor.submit(collection.add, **batch)
+    
     for jsonl_file in jsonl_files:
         print(f"Processing {jsonl_file.name}...")
-        with open(jsonl_file, 'r', encoding='utf-8') as f:
+        with open(jsonl_file, 'rb') as f:
             for line in f:
                 if line.strip():
                     try:
-                        chunk = json.loads(line.strip())
+                        chunk = loads(line)
                         
                         # Validate chunk has required fields
                         if not chunk.get('text') or not chunk.get('embedding'):
@@ -111,34 +139,37 @@ def migrate_to_chroma():
                         
                         chunk_count += 1
                         
-                        # Batch insert every 1000 chunks
-                        if chunk_count % 1000 == 0:
+                        # Batch insert every batch_size chunks
+                        if chunk_count % batch_size == 0:
                             print(f"  Processed {chunk_count} chunks...")
-                            collection.add(
+                            insert_batch(
                                 ids=ids,
                                 embeddings=embeddings,
                                 documents=documents,
                                 metadatas=metadatas
                             )
-                            # Clear batches
+                            # Start new batches (the submitted lists belong to the insert)
                             ids = []
                             embeddings = []
                             documents = []
                             metadatas = []
                             
-                    except json.JSONDecodeError:
+                    except json.JSONDecodeError:  # orjson.JSONDecodeError subclasses it
                         skipped_count += 1
                         continue
     
     # Insert remaining chunks
     if ids:
         print(f"  Inserting final {len(ids)} chunks...")
-        collection.add(
+        insert_batch(
             ids=ids,
             embeddings=embeddings,
             documents=documents,
             metadatas=metadatas
         )
+    if pending_insert is not None:
+        pending_insert.result()
+    insert_executor.shutdown()
     
     print(f"\n✅ Migration complete!")
     print(f"   Total chunks migrated: {chunk_count}")
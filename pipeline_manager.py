@@ -15,23 +15,59 @@ Usage:
     python pipeline_manager.py --stage chunk --source orthodoxy.xml
     python pipeline_manager.py --stage annotate --source orthodoxy_chunks.jsonl
     python pipeline_manager.py --stage vectorize --source orthodoxy_annotated.jsonl
+    python pipeline_manager.py --stage batch --sources orthodoxy.xml heretics.xml --no-gate
 """
 
+import hashlib
+import itertools
 import json
+import mmap
 import os
 import sys
 import shutil
 import xml.etree.ElementTree as ET
 import re
+from io import BytesIO
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterable, List, Optional, Any, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime
 import argparse
+import asyncio
+from array import array
+import queue
+import sqlite3
+import threading
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
 
 from source_metadata_manager import SourceMetadataManager
 from ccel_xml_to_markdown import CCELThMLProcessor
 
+# orjson is a faster drop-in for JSONL encoding; fall back to the stdlib json module
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
+
+# numpy keeps embeddings as compact float32 arrays; without it they stay lists of Python floats
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+# Prefer lxml's error-tolerant C parser for ThML; fall back to regex cleaning + ElementTree
+try:
+    from lxml import etree as lxml_etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+    lxml_etree = None
+
 # Import enhanced processor for sources with nested structures
 try:
     # Import with path adjustment for scripts folder
@@ -46,6 +82,129 @@ except ImportError:
     ConfessionsProcessor = None
 
 
+# Single-pass ThML sanitizer. Each alternative maps (by group number) to its
+# replacement in _XML_CLEAN_REPLACEMENTS; None keeps the match unchanged.
+_XML_CLEAN_RE = re.compile(
+    r'(<style[^>]*>.*?</style>)'            # 1: style blocks
+    r'|(<style[^>]*>|</style>)'             # 2: stray style tags
+    r'|(<script[^>]*>.*?</script>)'         # 3: script blocks
+    r'|(<pb[^>]*/?>)'                       # 4: page breaks
+    r'|(<br\s*/?>)'                         # 5: br tags
+    r'|(&nbsp;)'                            # 6: undefined in XML
+    r'|(&(?:amp|lt|gt|quot|apos);)'         # 7: predefined XML entities
+    r'|(&)'                                 # 8: bare ampersands
+    r'|(<\?xml[^>]*\?>|<!DOCTYPE[^>]*>|<!--.*?-->)',  # 9: declarations/comments
+    re.DOTALL
+)
+_XML_CLEAN_REPLACEMENTS = (None, '', '', '', '', '<br/>', ' ', None, '&amp;', '')
+
+
+# ThML document regions, cleaned separately in the ElementTree fallback path
+_THML_HEAD_RE = re.compile(r'<ThML\.head>(.*?)</ThML\.head>', re.DOTALL)
+_THML_BODY_RE = re.compile(r'<ThML\.body>(.*?)</ThML\.body>', re.DOTALL)
+_THML_DC_RE = re.compile(r'<DC>.*?</DC>', re.DOTALL)
+
+
+# The entity handling of _clean_xml, applied to the raw bytes fed to lxml: &nbsp; becomes
+# a space and every other ampersand outside the predefined XML entities is escaped, so
+# the recovering parser keeps them as text instead of dropping them
+_XML_AMPERSAND_BYTES_RE = re.compile(rb'&(?:(nbsp;)|(?!(?:amp|lt|gt|quot|apos);))')
+
+
+def _escape_xml_ampersands(xml_bytes: bytes) -> bytes:
+    return _XML_AMPERSAND_BYTES_RE.sub(lambda m: b' ' if m.group(1) else b'&amp;', xml_bytes)
+
+
+def _clean_xml_match(match: re.Match) -> str:
+    replacement = _XML_CLEAN_REPLACEMENTS[match.lastindex]
+    return match.group(0) if replacement is None else replacement
+
+
+def _clean_xml(xml_content: str) -> str:
+    """Sanitize ThML so ElementTree can parse it, in a single regex pass."""
+    return _XML_CLEAN_RE.sub(_clean_xml_match, xml_content)
+
+
+def _stripped_length(text: str) -> int:
+    """len(text.strip()), without copying text when it has no surrounding whitespace."""
+    if text[:1].isspace() or text[-1:].isspace():
+        return len(text.strip())
+    return len(text)
+
+
+# Wiki-link patterns in the index files
+_CONCEPT_LINK_RE = re.compile(r'\[\[Concept/([^\]]+)\]\]')
+_FUNCTION_LINK_RE = re.compile(rb'\[\[([^/]+)/([^\]]+)\]\]')  # bytes: scanned over an mmap
+
+# A "field:: value" line in an annotation response, optionally bulleted
+_FIELD_LINE_RE = re.compile(r'^[\s*-]*([A-Za-z][\w-]*)::\s*(.*)$')
+
+# Value patterns applied within a parsed field
+_WIKI_LINK_RE = re.compile(r'\[\[([^\]]+)\]\]')
+# A bulleted discourse element line: "* [[Category/Element]] description" (description required)
+_DISCOURSE_LINE_RE = re.compile(r'^[^\S\n]*[*-][^\n]*?\[\[([^\]\n]+)\]\][^\S\n]*(.*\S)', re.MULTILINE)
+_STRUCTURE_REF_RE = re.compile(r'>|\b(?:chapter|part|section)\s+[ivxlcdm]+', re.IGNORECASE)  # structure path misfiled as scripture
+_VERSE_RE = re.compile(r'\d+:\d+|\d+\s+')
+_LEADING_BRACKETS_RE = re.compile(r'^\[\[')
+_TRAILING_BRACKETS_RE = re.compile(r'\]\]$')
+
+# Book names accepted as evidence of a scripture reference (matched case-insensitively as substrings)
+_BIBLE_BOOKS = frozenset({
+    'genesis', 'exodus', 'leviticus', 'numbers', 'deuteronomy', 'joshua', 'judges', 'ruth',
+    'samuel', 'kings', 'chronicles', 'ezra', 'nehemiah', 'esther', 'job', 'psalm', 'psalms',
+    'proverbs', 'ecclesiastes', 'song', 'isaiah', 'jeremiah', 'lamentations', 'ezekiel',
+    'daniel', 'hosea', 'joel', 'amos', 'obadiah', 'jonah', 'micah', 'nahum', 'habakkuk',
+    'zephaniah', 'haggai', 'zechariah', 'malachi', 'matthew', 'mark', 'luke', 'john',
+    'acts', 'romans', 'corinthians', 'galatians', 'ephesians', 'philippians', 'colossians',
+    'thessalonians', 'timothy', 'titus', 'philemon', 'hebrews', 'james', 'peter', 'jude', 'revelation'
+})
+_BIBLE_BOOK_RE = re.compile('|'.join(sorted(_BIBLE_BOOKS, key=len, reverse=True)), re.IGNORECASE)
+
+
+# Marks embedding cache rows holding raw float32 bytes rather than JSON
+_FLOAT32_BLOB_MAGIC = b'F32\x00'
+
+
+def _as_embedding_vector(embedding):
+    """Hold an embedding as a float32 array when numpy is available (a quarter of a float list's memory)."""
+    return np.asarray(embedding, dtype=np.float32) if NUMPY_AVAILABLE else embedding
+
+
+def _json_default(obj):
+    """json.dumps fallback for numpy arrays and scalars (orjson handles them natively)."""
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _split_annotation_fields(response_text: str) -> Dict[str, str]:
+    """Split a "field:: value" response into {field: value} in one pass over its lines.
+    
+    A field's value runs from its key line to the next key line, so multi-line
+    fields (discourse-elements, scripture-references) keep their continuation
+    lines. Field names are lowercased; the first occurrence of a field wins.
+    """
+    fields = {}
+    current = None
+    for line in response_text.splitlines():
+        # Most lines are values or descriptions; only lines containing '::' can open a field
+        match = _FIELD_LINE_RE.match(line) if '::' in line else None
+        if match:
+            key = match.group(1).lower()
+            if key in fields:
+                current = None
+            else:
+                current = fields[key] = [match.group(2)]
+        elif current is not None:
+            current.append(line)
+    return {key: '\n'.join(lines) for key, lines in fields.items()}
+
+
+def _first_line(field_value: str) -> str:
+    """The first non-blank line of a field - the whole value of a single-line field."""
+    return field_value.strip().split('\n', 1)[0].strip()
+
+
 @dataclass
 class ProcessingStage:
     stage_name: str
@@ -55,6 +214,19 @@ class ProcessingStage:
     requires_human_review: bool
 
 
+@dataclass
+class BatchTask:
+    """A source file moving through the batch chunk → annotate pipeline."""
+    source_file: str
+    chunks_file: str = ''
+    annotated_file: str = ''
+    error: Optional[str] = None
+
+
+# Queue sentinel signalling the batch producer has finished
+_BATCH_DONE = object()
+
+
 class TheologicalProcessingPipeline:
     """Manages staged processing of theological texts with human review checkpoints."""
     
@@ -62,19 +234,35 @@ class TheologicalProcessingPipeline:
         self.base_dir = Path(base_dir)
         self.stages = self._define_stages()
         
-        # Initialize components with validation
-        try:
-            self.metadata_manager = SourceMetadataManager()
-        except Exception as e:
-            raise RuntimeError(f"Failed to initialize SourceMetadataManager: {e}")
+        # Enhanced processor for nested (Book > Chapter) sources, created on first use
+        self._confessions_processor = None
         
-        try:
-            self.xml_processor = CCELThMLProcessor()
-        except Exception as e:
-            raise RuntimeError(f"Failed to initialize CCELThMLProcessor: {e}")
+        # Parsed index files, populated lazily by _load_indexes
+        self._indexes_cache: Optional[Dict[str, Any]] = None
+        self._indexes_cache_key: Optional[tuple] = None
         
-        # Create directory structure
-        self._setup_directories()
+        # processing.log is opened on first use and kept open; batch threads share it
+        self._log_handle = None
+        self._log_lock = threading.Lock()
+        
+        # Initialize components and create the directory structure concurrently
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            directories_future = executor.submit(self._setup_directories)
+            metadata_future = executor.submit(SourceMetadataManager)
+            processor_future = executor.submit(CCELThMLProcessor)
+            
+            # Initialize components with validation
+            try:
+                self.metadata_manager = metadata_future.result()
+            except Exception as e:
+                raise RuntimeError(f"Failed to initialize SourceMetadataManager: {e}")
+            
+            try:
+                self.xml_processor = processor_future.result()
+            except Exception as e:
+                raise RuntimeError(f"Failed to initialize CCELThMLProcessor: {e}")
+            
+            directories_future.result()
     
     def _define_stages(self) -> Dict[str, ProcessingStage]:
         """Define the processing stages."""
@@ -120,7 +308,8 @@ class TheologicalProcessingPipeline:
             'metadata',            # Source metadata files
             'logs',               # Processing logs
             'templates',          # Processing templates for different source types
-            'rejected'            # Files that failed processing
+            'rejected',           # Files that failed processing
+            'cache'               # Embedding cache (reused across runs)
         ]
         
         try:
@@ -165,10 +354,10 @@ class TheologicalProcessingPipeline:
         else:
             raise ValueError(f"Unsupported file type: {source_path.suffix}")
         
-        # Create basic chunks (no metadata yet)
-        basic_chunks = []
-        for i, chunk in enumerate(chunks):
-            basic_chunk = {
+        # Create basic chunks (no metadata yet), streamed straight to disk
+        processing_timestamp = datetime.now().isoformat()
+        basic_chunks = (
+            {
                 'id': f"{source_metadata.identification.source_id}_{i}",
                 'text': chunk['text'],
                 'source': source_metadata.identification.title,
@@ -176,13 +365,14 @@ class TheologicalProcessingPipeline:
                 'structure_path': chunk.get('structure_path', []),
                 'chunk_index': i,
                 'processing_stage': 'chunked',
-                'processing_timestamp': datetime.now().isoformat()
+                'processing_timestamp': processing_timestamp
             }
-            basic_chunks.append(basic_chunk)
+            for i, chunk in enumerate(chunks)
+        )
         
         # Save chunks-only JSONL
         output_file = self.base_dir / '02_chunked' / f"{source_metadata.identification.source_id}_chunks.jsonl"
-        self._save_jsonl(basic_chunks, output_file)
+        chunk_count = self._save_jsonl(basic_chunks, output_file)
         
         # Save source metadata separately
         metadata_file = self.base_dir / 'metadata' / f"{source_metadata.identification.source_id}_metadata.yaml"
@@ -190,19 +380,20 @@ class TheologicalProcessingPipeline:
             f.write(self.metadata_manager.save_metadata(source_metadata, 'yaml'))
         
         # Log processing
-        self._log_processing(source_path.name, 'chunked', len(basic_chunks), output_file)
+        self._log_processing(source_path.name, 'chunked', chunk_count, output_file)
         
-        print(f"✓ Created {len(basic_chunks)} chunks → {output_file}")
+        print(f"✓ Created {chunk_count} chunks → {output_file}")
         print(f"✓ Saved metadata → {metadata_file}")
         print(f"⚠️  HUMAN REVIEW REQUIRED: Check chunks in {output_file}")
         
         return str(output_file)
     
-    def process_stage_2_to_annotated(self, chunks_file: str, annotation_method: str = 'ai') -> str:
+    def process_stage_2_to_annotated(self, chunks_file: str, annotation_method: str = 'ai', require_approval: bool = True) -> str:
         """
         Stage 2→3: Add metadata to approved chunks.
         
         annotation_method: 'ai' (use LLM) or 'manual' (human annotation)
+        require_approval: skip the .approved check when False (batch --no-gate mode)
         """
         chunks_path = Path(chunks_file)
         if not chunks_path.exists():
@@ -212,7 +403,7 @@ class TheologicalProcessingPipeline:
         chunks = self._load_jsonl(chunks_path)
         
         # Check if human has approved these chunks
-        if not self._is_human_approved(chunks_path):
+        if require_approval and not self._is_human_approved(chunks_path):
             print(f"⚠️  Chunks not yet approved for annotation: {chunks_path}")
             print("   Create a .approved file to proceed:")
             print(f"   touch {chunks_path}.approved")
@@ -231,10 +422,10 @@ class TheologicalProcessingPipeline:
         
         # Save annotated JSONL
         output_file = self.base_dir / '03_annotated' / f"{source_id}_annotated.jsonl"
-        self._save_jsonl(annotated_chunks, output_file)
+        chunk_count = self._save_jsonl(annotated_chunks, output_file)
         
         # Log processing
-        self._log_processing(chunks_path.name, 'annotated', len(annotated_chunks), output_file)
+        self._log_processing(chunks_path.name, 'annotated', chunk_count, output_file)
         
         print(f"✓ Created annotated chunks → {output_file}")
         if annotation_method == 'manual':
@@ -270,10 +461,10 @@ class TheologicalProcessingPipeline:
         # Save complete JSONL
         source_id = chunks[0]['id'].rsplit('_', 1)[0]
         output_file = self.base_dir / '04_complete' / f"{source_id}_complete.jsonl"
-        self._save_jsonl(complete_chunks, output_file)
+        chunk_count = self._save_jsonl(complete_chunks, output_file)
         
         # Log processing
-        self._log_processing(annotated_path.name, 'complete', len(complete_chunks), output_file)
+        self._log_processing(annotated_path.name, 'complete', chunk_count, output_file)
         
         print(f"✓ Created complete chunks with vectors → {output_file}")
         print(f"✓ Ready for deployment!")
@@ -296,8 +487,18 @@ class TheologicalProcessingPipeline:
         
         print(f"Deploying {complete_path.name} → production...")
         
-        # Copy to deployed folder
+        # Copy to deployed folder (copy2 uses the kernel's sendfile/fcopyfile fast path)
         deployed_file = self.base_dir / '05_deployed' / complete_path.name
+        
+        # Skip the copy if this exact file is already deployed (copy2 preserves mtime)
+        source_stat = complete_path.stat()
+        if deployed_file.exists():
+            deployed_stat = deployed_file.stat()
+            if (deployed_stat.st_size == source_stat.st_size and
+                    deployed_stat.st_mtime_ns == source_stat.st_mtime_ns):
+                print(f"✓ Already deployed and unchanged → {deployed_file}")
+                return str(deployed_file)
+        
         shutil.copy2(complete_path, deployed_file)
         
         # Log deployment
@@ -307,6 +508,52 @@ class TheologicalProcessingPipeline:
         
         return str(deployed_file)
     
+    def run_batch(self, source_files: List[str], annotation_method: str = 'ai', require_approval: bool = True) -> List[BatchTask]:
+        """
+        Chunk and annotate several sources with the two stages overlapped.
+        
+        A producer thread chunks each source and hands it to a consumer thread
+        through a bounded queue, so parsing file N+1 runs while file N is being
+        annotated. With require_approval=True the usual .approved gate still
+        applies, so only already-approved chunk files get annotated.
+        """
+        tasks = [BatchTask(source_file=source_file) for source_file in source_files]
+        handoff = queue.Queue(maxsize=4)
+        
+        def produce():
+            try:
+                for task in tasks:
+                    try:
+                        task.chunks_file = self.process_stage_1_to_chunks(task.source_file)
+                    except Exception as e:
+                        task.error = f"Chunking failed: {e}"
+                    handoff.put(task)
+            finally:
+                handoff.put(_BATCH_DONE)
+        
+        def consume():
+            while True:
+                task = handoff.get()
+                if task is _BATCH_DONE:
+                    break
+                if task.error:
+                    print(f"⚠️  Skipping annotation for {task.source_file}: {task.error}")
+                    continue
+                try:
+                    task.annotated_file = self.process_stage_2_to_annotated(
+                        task.chunks_file, annotation_method, require_approval=require_approval
+                    )
+                except Exception as e:
+                    task.error = f"Annotation failed: {e}"
+        
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            producer = executor.submit(produce)
+            consumer = executor.submit(consume)
+            producer.result()
+            consumer.result()
+        
+        return tasks
+    
     def _process_xml_source(self, source_path: Path, custom_template: Optional[str]) -> tuple:
         """Process XML source file using CCELThMLProcessor's robust XML handling."""
         
@@ -315,79 +562,24 @@ class TheologicalProcessingPipeline:
             # Load and apply custom processing template
             pass
         
-        # Standard XML processing using robust XML cleaning
-        processor = CCELThMLProcessor()
-        
-        
         # Read XML file
         try:
-            with open(source_path, 'r', encoding='utf-8') as f:
-                xml_content = f.read()
+            with open(source_path, 'rb') as f:
+                xml_bytes = f.read()
         except Exception as e:
             raise ValueError(f"Failed to read XML file {source_path}: {e}")
         
-        # Extract body and head BEFORE cleaning to avoid issues with malformed head section
-        import re
-        body_match = re.search(r'<ThML\.body>(.*?)</ThML\.body>', xml_content, re.DOTALL)
-        head_match = re.search(r'<ThML\.head>(.*?)</ThML\.head>', xml_content, re.DOTALL)
-        
-        if body_match and head_match:
-            # Extract and clean head content
-            head_content = head_match.group(1)
-            body_content = body_match.group(1)
-            
-            # Clean head content - remove problematic tags
-            head_content = re.sub(r'<style[^>]*>.*?</style>', '', head_content, flags=re.DOTALL)
-            head_content = re.sub(r'<style[^>]*>', '', head_content)
-            head_content = re.sub(r'</style>', '', head_content)
-            head_content = re.sub(r'<script[^>]*>.*?</script>', '', head_content, flags=re.DOTALL)
-            
-            # Clean body content
-            body_content = re.sub(r'<pb[^>]*/?>', '', body_content)
-            body_content = re.sub(r'<br\s*/?>', '<br/>', body_content)
-            
-            # Fix ampersands in both
-            head_content = re.sub(r'&(amp|lt|gt|quot|apos|nbsp);', '___ENTITY_\1___', head_content)
-            head_content = head_content.replace('&', '&amp;')
-            head_content = re.sub(r'___ENTITY_(\w+)___', r'&\1;', head_content)
-            head_content = head_content.replace('&nbsp;', ' ')
-            
-            body_content = re.sub(r'&(amp|lt|gt|quot|apos|nbsp);', '___ENTITY_\1___', body_content)
-            body_content = body_content.replace('&', '&amp;')
-            body_content = re.sub(r'___ENTITY_(\w+)___', r'&\1;', body_content)
-            body_content = body_content.replace('&nbsp;', ' ')
-            
-            # Reconstruct clean XML
-            xml_content = f"""<ThML>
-<ThML.head>
-{head_content}
-</ThML.head>
-<ThML.body>
-{body_content}
-</ThML.body>
-</ThML>"""
+        # Stream body div1s through lxml's recovering parser when available, otherwise
+        # clean and parse the whole document with ElementTree
+        if LXML_AVAILABLE:
+            root, div1_elements = self._iterparse_xml_with_lxml(xml_bytes, source_path)
         else:
-            # Fallback: clean the whole XML as before
-            xml_content = re.sub(r'<\?xml[^>]*\?>', '', xml_content)
-            xml_content = re.sub(r'<!DOCTYPE[^>]*>', '', xml_content)
-            xml_content = re.sub(r'<!--.*?-->', '', xml_content, flags=re.DOTALL)
-            xml_content = re.sub(r'<style[^>]*>.*?</style>', '', xml_content, flags=re.DOTALL)
-            xml_content = re.sub(r'<style[^>]*>', '', xml_content)
-            xml_content = re.sub(r'</style>', '', xml_content)
-            xml_content = re.sub(r'<pb[^>]*/?>', '', xml_content)
-            xml_content = re.sub(r'<br\s*/?>', '<br/>', xml_content)
-            xml_content = re.sub(r'&(amp|lt|gt|quot|apos|nbsp);', '___ENTITY_\1___', xml_content)
-            xml_content = xml_content.replace('&', '&amp;')
-            xml_content = re.sub(r'___ENTITY_(\w+)___', r'&\1;', xml_content)
-            xml_content = xml_content.replace('&nbsp;', ' ')
-        
-        # Parse the cleaned XML
-        try:
-            root = ET.fromstring(xml_content)
-        except ET.ParseError as e:
-            raise ValueError(f"Failed to parse XML file {source_path} after cleaning: {e}")
+            root = self._parse_xml_with_cleaning(xml_bytes.decode('utf-8'), source_path)
+            body = root.find('.//ThML.body')
+            div1_elements = body.iterfind('div1') if body is not None else iter(())
+        del xml_bytes
         
-        # Extract metadata
+        # Extract metadata (when streaming, only the head has been parsed at this point)
         try:
             source_metadata = self.metadata_manager.extract_from_ccel_xml(root)
         except Exception as e:
@@ -406,58 +598,138 @@ class TheologicalProcessingPipeline:
         # Use enhanced processor if available and needed
         if needs_enhanced_processor and CONFESSIONS_PROCESSOR_AVAILABLE:
             print(f"Detected nested structure (Books > Chapters), using enhanced processor...")
-            processor = ConfessionsProcessor()
+            if self._confessions_processor is None:
+                self._confessions_processor = ConfessionsProcessor()
+            processor = self._confessions_processor
         else:
-            processor = CCELThMLProcessor()
+            processor = self.xml_processor
         
         # Process sections and create chunks
         try:
-            sections = processor.process_div1_sections(root)
+            sections = processor.process_div1_elements(div1_elements)
             chunks = []
             
             for section in sections:
                 section_chunks = processor.chunk_text(section['full_text'])
                 structure_path = processor.build_structure_path(section['title'], section['headings'])
                 
-                for chunk_text in section_chunks:
-                    if len(chunk_text.strip()) > 100:
-                        chunks.append({
-                            'text': chunk_text,
-                            'structure_path': [structure_path] if structure_path else []
-                        })
+                structure_path_list = [structure_path] if structure_path else []
+                chunks.extend(
+                    {'text': chunk_text, 'structure_path': list(structure_path_list)}
+                    for chunk_text in section_chunks
+                    if _stripped_length(chunk_text) > 100
+                )
         except Exception as e:
             raise ValueError(f"Failed to process XML sections: {e}")
         
+        # Re-extract now that the streamed tree holds every div1 (as attribute-only shells),
+        # so content characteristics such as chapter_count see the whole body
+        if LXML_AVAILABLE:
+            try:
+                source_metadata = self.metadata_manager.extract_from_ccel_xml(root)
+            except Exception as e:
+                raise ValueError(f"Failed to extract metadata from XML: {e}")
+        
         return chunks, source_metadata
     
-    def _clean_xml_content(self, xml_content: str) -> str:
-        """Clean XML content similar to CCELThMLProcessor with robust error handling."""
-        import re
-        
-        # Remove XML processing instructions and DOCTYPE
-        xml_content = re.sub(r'<\?xml[^>]*\?>', '', xml_content)
-        xml_content = re.sub(r'<!DOCTYPE[^>]*>', '', xml_content)
-        xml_content = re.sub(r'<!--.*?-->', '', xml_content, flags=re.DOTALL)
-        
-        # Remove style elements which often contain problematic content
-        xml_content = re.sub(r'<style[^>]*>.*?</style>', '', xml_content, flags=re.DOTALL)
+    def _iterparse_xml_with_lxml(self, xml_bytes: bytes, source_path: Path) -> tuple:
+        """Incrementally parse ThML with lxml's recovering C parser.
         
-        # Handle problematic elements
-        xml_content = re.sub(r'<pb[^>]*/?>', '', xml_content)  # Remove page breaks
-        xml_content = re.sub(r'<br\s*/?>', '<br/>', xml_content)  # Fix br tags
+        Parsing stops once ThML.head is complete and returns (root, div1_elements),
+        where div1_elements lazily continues the parse and yields each top-level
+        body div1. A div1 is emptied once the consumer pulls the next one, so peak
+        memory is bounded by the largest div1 rather than the whole document.
+        """
+        # &nbsp; and ThML's other entities are undefined without its DTD - handle them
+        # as _clean_xml does rather than letting recover mode drop them
+        context = lxml_etree.iterparse(
+            BytesIO(_escape_xml_ampersands(xml_bytes)),
+            events=('end',),
+            tag=('ThML.head', 'div1'),
+            recover=True,
+            huge_tree=True,
+            remove_comments=True,
+            remove_pis=True,
+            resolve_entities=False
+        )
         
-        # Fix ampersands that aren't part of entities
-        # First, protect existing entities
-        xml_content = re.sub(r'&(amp|lt|gt|quot|apos|nbsp);', '___ENTITY_\1___', xml_content)
-        # Then escape remaining ampersands
-        xml_content = xml_content.replace('&', '&amp;')
-        # Restore protected entities
-        xml_content = re.sub(r'___ENTITY_(\w+)___', r'&\1;', xml_content)
+        try:
+            for _, elem in context:
+                if elem.tag == 'ThML.head':
+                    self._strip_non_content(elem)
+                    return elem.getroottree().getroot(), self._iter_body_div1s(context)
+                if self._is_body_div1(elem):
+                    # Body before head - finish the parse and hand back the whole tree
+                    break
+            for _ in context:
+                pass
+        except lxml_etree.XMLSyntaxError as e:
+            raise ValueError(f"Failed to parse XML file {source_path}: {e}")
+        
+        root = context.root
+        if root is None:
+            raise ValueError(f"Failed to parse XML file {source_path}: no root element recovered")
+        self._strip_non_content(root)
+        body = root.find('.//ThML.body')
+        return root, body.iterfind('div1') if body is not None else iter(())
+    
+    def _iter_body_div1s(self, context) -> Iterable:
+        """Yield top-level body div1s from a running iterparse, emptying each after use."""
+        for _, elem in context:
+            if not self._is_body_div1(elem):
+                continue
+            self._strip_non_content(elem)
+            yield elem
+            # Keep an attribute-only shell so metadata extraction can still count div1s
+            del elem[:]
+            elem.text = None
+    
+    @staticmethod
+    def _is_body_div1(elem) -> bool:
+        parent = elem.getparent()
+        return elem.tag == 'div1' and parent is not None and parent.tag == 'ThML.body'
+    
+    @staticmethod
+    def _strip_non_content(elem) -> None:
+        """Drop non-content elements and unresolved entity references (keeping their tail text)."""
+        lxml_etree.strip_elements(elem, 'style', 'script', 'pb', with_tail=False)
+        lxml_etree.strip_elements(elem, lxml_etree.Entity, with_tail=False)
+    
+    def _parse_xml_with_cleaning(self, xml_content: str, source_path: Path) -> ET.Element:
+        """Regex-clean ThML and parse it with ElementTree (used when lxml is unavailable)."""
+        # Extract body and head BEFORE cleaning to avoid issues with malformed head section
+        body_match = _THML_BODY_RE.search(xml_content)
+        head_match = _THML_HEAD_RE.search(xml_content)
         
-        # Handle common HTML entities that might not be defined
-        xml_content = xml_content.replace('&nbsp;', ' ')
+        if body_match and head_match:
+            # Metadata extraction only reads DC.* elements, so keep just the <DC> block(s)
+            # from the head rather than cleaning its styles and descriptions
+            dc_blocks = _THML_DC_RE.findall(head_match.group(1))
+            head_content = _clean_xml('\n'.join(dc_blocks) if dc_blocks else head_match.group(1))
+            body_content = _clean_xml(body_match.group(1))
+            
+            # Reconstruct clean XML
+            xml_content = f"""<ThML>
+<ThML.head>
+{head_content}
+</ThML.head>
+<ThML.body>
+{body_content}
+</ThML.body>
+</ThML>"""
+        else:
+            # Fallback: clean the whole XML as before
+            xml_content = _clean_xml(xml_content)
         
-        return xml_content
+        # Parse the cleaned XML
+        try:
+            return ET.fromstring(xml_content)
+        except ET.ParseError as e:
+            raise ValueError(f"Failed to parse XML file {source_path} after cleaning: {e}")
+    
+    def _clean_xml_content(self, xml_content: str) -> str:
+        """Clean XML content similar to CCELThMLProcessor with robust error handling."""
+        return _clean_xml(xml_content)
     
     def _process_pdf_source(self, source_path: Path, custom_template: Optional[str]) -> tuple:
         """Process PDF source file.
@@ -476,7 +748,24 @@ class TheologicalProcessingPipeline:
         raise NotImplementedError("DOCX processing not yet implemented. Use python-docx library first.")
     
     def _load_indexes(self) -> Dict[str, Any]:
-        """Load all index files needed for annotation."""
+        """Load all index files needed for annotation.
+        
+        Results are cached on the instance and reused until one of the index
+        files changes on disk.
+        """
+        base_dir = Path(__file__).parent
+        concepts_file = base_dir / 'Index: Concepts.md'
+        function_file = base_dir / 'Index: Function.md'
+        topics_file = base_dir / 'Index: Topics.md'
+        terms_file = base_dir / 'Index: Terms.md'
+        
+        cache_key = tuple(
+            index_file.stat().st_mtime if index_file.exists() else None
+            for index_file in (concepts_file, function_file, topics_file, terms_file)
+        )
+        if self._indexes_cache is not None and self._indexes_cache_key == cache_key:
+            return self._indexes_cache
+        
         indexes = {
             'concepts': [],
             'discourse_elements': [],
@@ -484,89 +773,81 @@ class TheologicalProcessingPipeline:
             'terms': []
         }
         
-        base_dir = Path(__file__).parent
-        
         # Load Concepts Index
-        concepts_file = base_dir / 'Index: Concepts.md'
         if concepts_file.exists():
             with open(concepts_file, 'r', encoding='utf-8') as f:
                 for line in f:
                     line = line.strip()
                     if line.startswith('- [[') and 'Concept/' in line:
                         # Extract concept name
-                        match = re.search(r'\[\[Concept/([^\]]+)\]\]', line)
+                        match = _CONCEPT_LINK_RE.search(line)
                         if match:
                             indexes['concepts'].append(match.group(1))
         
-        # Store as set for quick lookup during validation
-        indexes['concepts_set'] = set(indexes['concepts']) if indexes['concepts'] else set()
+        # Store as frozenset for quick lookup during validation (shared read-only across chunks)
+        indexes['concepts_set'] = frozenset(indexes['concepts'])
         
         # Load Discourse Elements (Function index)
-        function_file = base_dir / 'Index: Function.md'
-        if function_file.exists():
-            with open(function_file, 'r', encoding='utf-8') as f:
-                content = f.read()
+        if function_file.exists() and function_file.stat().st_size > 0:
+            # Scan the memory-mapped file directly instead of reading it into a string
+            with open(function_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
                 # Extract all discourse elements in [[Category/Element]] format
-                pattern = r'\[\[([^/]+)/([^\]]+)\]\]'
-                matches = re.findall(pattern, content)
-                for category, element in matches:
-                    full_name = f"{category}/{element}"
-                    indexes['discourse_elements'].append(full_name)
+                for match in _FUNCTION_LINK_RE.finditer(content):
+                    category, element = match.group(1).decode('utf-8'), match.group(2).decode('utf-8')
+                    indexes['discourse_elements'].append(f"{category}/{element}")
         
-        # Store as set for quick lookup during validation (always initialize even if file missing)
-        indexes['discourse_elements_set'] = set(indexes['discourse_elements']) if indexes['discourse_elements'] else set()
+        # Store as frozenset for quick lookup during validation (always initialize even if file missing)
+        indexes['discourse_elements_set'] = frozenset(indexes['discourse_elements'])
         
         # Load Topics and Terms (if they exist and have content)
-        topics_file = base_dir / 'Index: Topics.md'
         if topics_file.exists():
             with open(topics_file, 'r', encoding='utf-8') as f:
                 content = f.read()
                 if len(content.strip()) > 10:  # Has meaningful content
                     indexes['topics'] = content
         
-        terms_file = base_dir / 'Index: Terms.md'
         if terms_file.exists():
             with open(terms_file, 'r', encoding='utf-8') as f:
                 content = f.read()
                 if len(content.strip()) > 10:  # Has meaningful content
                     indexes['terms'] = content
         
+        self._add_prompt_blocks(indexes)
+        
+        self._indexes_cache = indexes
+        self._indexes_cache_key = cache_key
         return indexes
     
-    def _build_annotation_prompt(self, chunk_text: str, chunk_structure_path: List[str], indexes: Dict[str, Any], source_metadata: Optional[Dict] = None) -> str:
-        """Build the annotation prompt for a single chunk."""
-        
-        # Convert structure_path from array to breadcrumb format
-        structure_path_str = ""
-        if chunk_structure_path and len(chunk_structure_path) > 0:
-            # Join array elements into breadcrumb format
-            path_text = chunk_structure_path[0] if isinstance(chunk_structure_path, list) else str(chunk_structure_path)
-            structure_path_str = f"[[{path_text}]]" if path_text else ""
+    @property
+    def _indexes(self) -> Dict[str, Any]:
+        """The loaded indexes, without re-checking index file mtimes once they are cached.
         
+        Used by per-chunk fallbacks; entry points call _load_indexes() once per run
+        so edits to the index files are still picked up between runs.
+        """
+        if self._indexes_cache is None:
+            return self._load_indexes()
+        return self._indexes_cache
+    
+    def _add_prompt_blocks(self, indexes: Dict[str, Any]):
+        """Pre-format the fixed concept and discourse element lists and the static annotation prompt prefix."""
         # Get ALL concepts for prompt (they are fixed, so AI needs to see them all)
-        concepts_list = ', '.join([f'[[Concept/{c}]]' for c in indexes['concepts']])
+        indexes['concepts_prompt_block'] = ', '.join(f'[[Concept/{c}]]' for c in indexes['concepts'])
         
         # Get all discourse elements for prompt (grouped by category)
         discourse_elements_by_category = {}
         for de in indexes['discourse_elements']:
             category, element = de.split('/', 1)
-            if category not in discourse_elements_by_category:
-                discourse_elements_by_category[category] = []
-            discourse_elements_by_category[category].append(element)
+            discourse_elements_by_category.setdefault(category, []).append(element)
         
         discourse_elements_list = ""
         for category in ['Semantic', 'Logical', 'Narrative', 'Personal', 'Practical', 'Symbolic', 'Reference', 'Structural']:
             if category in discourse_elements_by_category:
-                elements = [f'[[{category}/{e}]]' for e in discourse_elements_by_category[category]]
-                discourse_elements_list += f"\n{category}: {', '.join(elements)}"
+                elements = ', '.join(f'[[{category}/{e}]]' for e in discourse_elements_by_category[category])
+                discourse_elements_list += f"\n{category}: {elements}"
+        indexes['discourse_elements_prompt_block'] = discourse_elements_list
         
-        prompt = f"""You are helping to create high-quality metadata for theological text chunks to improve RAG (Retrieval Augmented Generation) performance. Your task is to analyze a text chunk and provide structured metadata following specific guidelines.
-
-## Text Chunk
-{chunk_text}
-
-## Current Structure Path
-{structure_path_str if structure_path_str else "(to be determined)"}
+        indexes['annotation_prompt_prefix'] = f"""You are helping to create high-quality metadata for theological text chunks to improve RAG (Retrieval Augmented Generation) performance. Your task is to analyze a text chunk and provide structured metadata following specific guidelines. The text chunk and its structure path follow these instructions.
 
 ## Metadata Structure
 For this chunk, provide metadata in this exact format:
@@ -577,14 +858,14 @@ For this chunk, provide metadata in this exact format:
   * [[Category/Element]] Description or quote
   * [[Category/Element]] Description or quote
 * scripture-references:: [Bible references if any, standardized format]
-* structure-path:: {structure_path_str if structure_path_str else "Breadcrumb format (e.g. [[Section > Subsection]])"}
+* structure-path:: Breadcrumb format (e.g. [[Section > Subsection]]), see Structure Path below
 * named-entities:: [[Person/Entity]], [[Place/Entity]], [[Event/Entity]], [[Ideology/Entity]], [[Period/Entity]], [[Work/Entity]], [[Group/Entity]]
 
 ## Critical Constraints
 
 ### Concepts Index (Fixed)
 Use ONLY concepts from this EXACT list (NO additions allowed, NO substitutions):
-{concepts_list}
+{indexes['concepts_prompt_block']}
 
 **CRITICAL**: You must use concepts from the list above. If a concept is not in the list, do NOT use it. Better to leave blank than use an invalid concept.
 
@@ -621,7 +902,7 @@ Examples:
 
 ### Discourse Elements (Fixed)
 Use ONLY elements from this EXACT list (NO additions allowed, NO substitutions):
-{discourse_elements_list}
+{indexes['discourse_elements_prompt_block']}
 
 Format each as: `[[Category/Element]]` followed by a description or quote.
 
@@ -632,9 +913,6 @@ Every chunk must have at least one discourse element. Typically 3-5 per chunk.
 ### Scripture References (Fixed)
 Only add if a verse, chapter, or book is mentioned. Normalize format: "John 3:16" becomes [[John 3]] and [[John 3:16]].
 
-### Structure Path (Flexible)
-{('Use the provided structure path: ' + structure_path_str if structure_path_str else 'Determine the hierarchical location in breadcrumb format: [[Section > Subsection]]')}
-
 ### Named Entities (Class Fixed, Entity Flexible)
 Use namespaced format: `[[Class/Entity]]`
 Classes: Person, Place, Event, Group, Work, Period, Ideology
@@ -651,8 +929,36 @@ discourse-elements::
 scripture-references:: [[Book Chapter:Verse]] (if any)
 structure-path:: [[Section > Subsection]]
 named-entities:: [[Person/Name]], [[Work/Title]] (if any)"""
+    
+    def _build_annotation_prompt(self, chunk_text: str, chunk_structure_path: List[str], indexes: Dict[str, Any], source_metadata: Optional[Dict] = None) -> Tuple[str, str]:
+        """Build the annotation prompt for a single chunk as (static_prefix, chunk_suffix).
+        
+        The prefix (instructions and the fixed index lists) is identical for every
+        chunk in a run and is formatted once per index load, so it can be sent as a
+        cached prompt block; only the suffix is built per chunk.
+        """
+        
+        # Convert structure_path from array to breadcrumb format
+        structure_path_str = ""
+        if chunk_structure_path and len(chunk_structure_path) > 0:
+            # Join array elements into breadcrumb format
+            path_text = chunk_structure_path[0] if isinstance(chunk_structure_path, list) else str(chunk_structure_path)
+            structure_path_str = f"[[{path_text}]]" if path_text else ""
+        
+        # Fixed instructions and index lists are formatted once per index load
+        if 'annotation_prompt_prefix' not in indexes:
+            self._add_prompt_blocks(indexes)
+        
+        suffix = f"""## Text Chunk
+{chunk_text}
+
+## Current Structure Path
+{structure_path_str if structure_path_str else "(to be determined)"}
+
+## Structure Path (Flexible)
+{('Use the provided structure path: ' + structure_path_str if structure_path_str else 'Determine the hierarchical location in breadcrumb format: [[Section > Subsection]]')}"""
         
-        return prompt
+        return indexes['annotation_prompt_prefix'], suffix
     
     def _extract_discourse_tags(self, discourse_elements: List[str]) -> List[str]:
         """Extract unique discourse tags from discourse_elements strings.
@@ -668,7 +974,7 @@ named-entities:: [[Person/Name]], [[Work/Title]] (if any)"""
         
         for element in discourse_elements:
             # Extract tag from brackets (e.g., "[[Logical/Claim]] description" -> "Logical/Claim")
-            match = re.search(r'\[\[([^\]]+)\]\]', element)
+            match = _WIKI_LINK_RE.search(element)
             if match:
                 tag = match.group(1)
                 tags.add(tag)
@@ -689,19 +995,26 @@ named-entities:: [[Person/Name]], [[Work/Title]] (if any)"""
             'named_entities': []
         }
         
+        # Validate with O(1) set membership even if a caller passes a list of valid values
+        if valid_concepts is not None and not isinstance(valid_concepts, (set, frozenset)):
+            valid_concepts = frozenset(valid_concepts)
+        if valid_discourse_elements is not None and not isinstance(valid_discourse_elements, (set, frozenset)):
+            valid_discourse_elements = frozenset(valid_discourse_elements)
+        
+        fields = _split_annotation_fields(response_text)
+        
         # Extract concepts
-        concepts_match = re.search(r'concepts::\s*(.+)', response_text, re.IGNORECASE | re.MULTILINE)
-        if concepts_match:
-            concepts_str = concepts_match.group(1).strip()
+        if 'concepts' in fields:
+            concepts_str = _first_line(fields['concepts'])
             # Try both formats: [[Concept/Name]] and [[Name]] (fallback)
-            extracted_concepts = re.findall(r'\[\[Concept/([^\]]+)\]\]', concepts_str)
+            extracted_concepts = _CONCEPT_LINK_RE.findall(concepts_str)
             if not extracted_concepts:
                 # Fallback: try without Concept/ prefix
-                extracted_concepts = re.findall(r'\[\[([^\]]+)\]\]', concepts_str)
+                extracted_concepts = _WIKI_LINK_RE.findall(concepts_str)
             # Validate against fixed list
             if valid_concepts is None:
                 # Fallback: load if not provided
-                valid_concepts = self._load_indexes().get('concepts_set', set())
+                valid_concepts = self._indexes['concepts_set']
             # Only keep concepts that are in the fixed list
             metadata['concepts'] = [c for c in extracted_concepts if c in valid_concepts]
         
@@ -725,91 +1038,71 @@ named-entities:: [[Person/Name]], [[Work/Title]] (if any)"""
                 metadata['concepts'] = list(derived_concepts)
         
         # Extract topics
-        topics_match = re.search(r'topics::\s*(.+)', response_text, re.IGNORECASE | re.MULTILINE)
-        if topics_match:
-            topics_str = topics_match.group(1).strip()
-            metadata['topics'] = re.findall(r'\[\[([^\]]+)\]\]', topics_str)
+        if 'topics' in fields:
+            topics_str = _first_line(fields['topics'])
+            metadata['topics'] = _WIKI_LINK_RE.findall(topics_str)
         
         # Extract terms
-        terms_match = re.search(r'terms::\s*(.+)', response_text, re.IGNORECASE | re.MULTILINE)
-        if terms_match:
-            terms_str = terms_match.group(1).strip()
-            metadata['terms'] = re.findall(r'\[\[([^\]]+)\]\]', terms_str)
+        if 'terms' in fields:
+            terms_str = _first_line(fields['terms'])
+            metadata['terms'] = _WIKI_LINK_RE.findall(terms_str)
         
         # Extract discourse elements
-        discourse_match = re.search(r'discourse-elements::\s*(.+?)(?=\n\w+::|\Z)', response_text, re.IGNORECASE | re.MULTILINE | re.DOTALL)
-        if discourse_match:
-            discourse_text = discourse_match.group(1)
-            # Extract each element with its description
-            lines = discourse_text.split('\n')
+        if 'discourse-elements' in fields:
+            discourse_text = fields['discourse-elements']
             if valid_discourse_elements is None:
                 # Fallback: load if not provided
-                valid_discourse_elements = self._load_indexes().get('discourse_elements_set', set())
-            for line in lines:
-                line = line.strip()
-                if line.startswith('*') or line.startswith('-'):
-                    line = line.lstrip('*-').strip()
-                    element_match = re.search(r'\[\[([^\]]+)\]\]\s*(.+)', line)
-                    if element_match:
-                        element_full = element_match.group(1)
-                        # Validate against fixed list
-                        if element_full in valid_discourse_elements:
-                            desc = element_match.group(2).strip()
-                            metadata['discourse_elements'].append(f"[[{element_full}]] {desc}")
-                        # If invalid, skip it (don't add to metadata)
+                valid_discourse_elements = self._indexes['discourse_elements_set']
+            # Extract each bulleted element with its description in one scan of the field
+            for element_match in _DISCOURSE_LINE_RE.finditer(discourse_text):
+                element_full, desc = element_match.groups()
+                # Validate against fixed list (invalid elements are skipped)
+                if element_full in valid_discourse_elements:
+                    metadata['discourse_elements'].append(f"[[{element_full}]] {desc}")
         
         # Extract discourse_tags from discourse_elements (for efficient filtering)
         metadata['discourse_tags'] = self._extract_discourse_tags(metadata['discourse_elements'])
         
-        # Extract scripture references - stop at next field (structure-path, named-entities, or any new field)
-        # Use non-greedy match that stops at next field or end of string
-        scripture_match = re.search(r'scripture-references::\s*(.+?)(?=\n(?:structure-path|named-entities|\w+)::|\Z)', response_text, re.IGNORECASE | re.MULTILINE | re.DOTALL)
-        if scripture_match:
-            scripture_str = scripture_match.group(1).strip()
+        # Extract scripture references (the field ends at the next field line)
+        if 'scripture-references' in fields:
+            scripture_str = fields['scripture-references'].strip()
             if scripture_str and scripture_str.lower() not in ['none', 'n/a', '']:
                 # Only extract if it looks like a Bible reference (contains book names or chapter/verse patterns)
-                refs = re.findall(r'\[\[([^\]]+)\]\]', scripture_str)
+                refs = _WIKI_LINK_RE.findall(scripture_str)
                 # Basic validation: check if it contains Bible book names or chapter/verse patterns
                 # This will filter out structure_path content that got misclassified
-                bible_books = ['genesis', 'exodus', 'leviticus', 'numbers', 'deuteronomy', 'joshua', 'judges', 'ruth', 
-                              'samuel', 'kings', 'chronicles', 'ezra', 'nehemiah', 'esther', 'job', 'psalm', 'psalms',
-                              'proverbs', 'ecclesiastes', 'song', 'isaiah', 'jeremiah', 'lamentations', 'ezekiel',
-                              'daniel', 'hosea', 'joel', 'amos', 'obadiah', 'jonah', 'micah', 'nahum', 'habakkuk',
-                              'zephaniah', 'haggai', 'zechariah', 'malachi', 'matthew', 'mark', 'luke', 'john',
-                              'acts', 'romans', 'corinthians', 'galatians', 'ephesians', 'philippians', 'colossians',
-                              'thessalonians', 'timothy', 'titus', 'philemon', 'hebrews', 'james', 'peter', 'jude', 'revelation']
                 validated_refs = []
                 for ref in refs:
-                    ref_lower = ref.lower()
                     # Check if it contains a book name or chapter/verse pattern
                     # Also check that it doesn't look like a structure path (contains > or chapter/roman numerals pattern)
-                    is_structure_path = '>' in ref or re.search(r'\bchapter\s+[ivxlcdm]+\b', ref_lower) or re.search(r'\b(chapter|part|section)\s+[ivxlcdm]+', ref_lower)
-                    if not is_structure_path and (any(book in ref_lower for book in bible_books) or re.search(r'\d+:\d+|\d+\s+', ref)):
+                    is_structure_path = _STRUCTURE_REF_RE.search(ref) is not None
+                    if not is_structure_path and (_BIBLE_BOOK_RE.search(ref) or _VERSE_RE.search(ref)):
                         validated_refs.append(ref)
                 metadata['scripture_references'] = validated_refs
         
         # Extract structure path
-        structure_match = re.search(r'structure-path::\s*(.+)', response_text, re.IGNORECASE | re.MULTILINE)
-        if structure_match:
-            structure_str = structure_match.group(1).strip()
+        if 'structure-path' in fields:
+            structure_str = _first_line(fields['structure-path'])
             if structure_str:
                 # Remove surrounding brackets if present
-                structure_str = re.sub(r'^\[\[', '', structure_str)
-                structure_str = re.sub(r'\]\]$', '', structure_str)
+                structure_str = _LEADING_BRACKETS_RE.sub('', structure_str)
+                structure_str = _TRAILING_BRACKETS_RE.sub('', structure_str)
                 metadata['structure_path'] = structure_str
         
         # Extract named entities
-        entities_match = re.search(r'named-entities::\s*(.+)', response_text, re.IGNORECASE | re.MULTILINE)
-        if entities_match:
-            entities_str = entities_match.group(1).strip()
+        if 'named-entities' in fields:
+            entities_str = _first_line(fields['named-entities'])
             if entities_str and entities_str.lower() not in ['none', 'n/a', '']:
-                metadata['named_entities'] = re.findall(r'\[\[([^\]]+)\]\]', entities_str)
+                metadata['named_entities'] = _WIKI_LINK_RE.findall(entities_str)
         
         return metadata
     
-    def _annotate_chunks_with_ai(self, chunks: List[Dict], metadata_file: Path) -> List[Dict]:
-        """Annotate chunks using Anthropic Claude API."""
-        import anthropic
+    def _annotate_chunks_with_ai(self, chunks: List[Dict], metadata_file: Path, max_concurrency: int = 16) -> List[Dict]:
+        """Annotate chunks using Anthropic Claude API.
+        
+        Up to max_concurrency requests are kept in flight at once; the SDK
+        retries rate-limited (429) and transient errors with exponential backoff.
+        """
         import os
         from dotenv import load_dotenv
         
@@ -821,9 +1114,6 @@ named-entities:: [[Person/Name]], [[Work/Title]] (if any)"""
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY not found. Please set it in your .env file or as an environment variable.")
         
-        # Initialize Anthropic client
-        client = anthropic.Anthropic(api_key=api_key)
-        
         # Load indexes
         print("Loading index files...")
         indexes = self._load_indexes()
@@ -836,121 +1126,150 @@ named-entities:: [[Person/Name]], [[Work/Title]] (if any)"""
             # You might want to parse YAML here if needed
             pass
         
-        annotated_chunks = []
         total_chunks = len(chunks)
         
-        print(f"\nAnnotating {total_chunks} chunks using Anthropic Claude API...")
+        print(f"\nAnnotating {total_chunks} chunks using Anthropic Claude API ({max_concurrency} concurrent requests)...")
         print("(This may take several minutes and incur API costs)\n")
         
+        annotated_chunks = asyncio.run(
+            self._annotate_chunks_async(chunks, api_key, indexes, source_metadata, max_concurrency)
+        )
+        
+        print(f"\n✓ Completed annotation of {total_chunks} chunks")
+        return annotated_chunks
+    
+    async def _annotate_chunks_async(self, chunks: List[Dict], api_key: str, indexes: Dict[str, Any],
+                                     source_metadata: Optional[Dict], max_concurrency: int) -> List[Dict]:
+        """Annotate all chunks concurrently, returning results in input order."""
+        import anthropic
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        processing_timestamp = datetime.now().isoformat()
+        
+        # Empty chunks pass through unchanged; only chunks with text are sent to the API
+        annotated_chunks: List[Optional[Dict]] = [None] * len(chunks)
+        pending_chunks = []
         for idx, chunk in enumerate(chunks, 1):
-            chunk_text = chunk.get('text', '')
-            chunk_structure_path = chunk.get('structure_path', [])
-            
-            if not chunk_text:
+            if chunk.get('text', ''):
+                pending_chunks.append((idx, chunk))
+            else:
                 print(f"⚠️  Skipping chunk {idx}: empty text")
-                annotated_chunks.append(chunk.copy())
-                continue
-            
+                annotated_chunks[idx - 1] = chunk.copy()
+        
+        total_chunks = len(pending_chunks)
+        completed = 0
+        
+        async def annotate_chunk(idx: int, chunk: Dict, client) -> Dict:
+            nonlocal completed
             try:
-                # Build prompt
-                prompt = self._build_annotation_prompt(chunk_text, chunk_structure_path, indexes, source_metadata)
-                
-                # Call Anthropic API
-                message = client.messages.create(
-                    model="claude-sonnet-4-20250514",
-                    max_tokens=4000,
-                    temperature=0.3,
-                    messages=[{
-                        "role": "user",
-                        "content": prompt
-                    }]
-                )
-                
-                # Parse response
-                response_text = message.content[0].text
-                metadata = self._parse_annotation_response(
-                    response_text, 
-                    valid_discourse_elements=indexes['discourse_elements_set'],
-                    valid_concepts=indexes['concepts_set']
-                )
-                
-                # Create annotated chunk
-                annotated_chunk = chunk.copy()
-                
-                # Remove the top-level structure_path since it will be in metadata
-                # (it was only there during the chunking stage for reference)
-                if 'structure_path' in annotated_chunk:
-                    del annotated_chunk['structure_path']
-                
-                # Convert structure_path from array to string format
-                structure_path_str = ""
-                if chunk_structure_path and len(chunk_structure_path) > 0:
-                    path_text = chunk_structure_path[0] if isinstance(chunk_structure_path, list) else str(chunk_structure_path)
-                    structure_path_str = f"[[{path_text}]]"
-                elif metadata.get('structure_path'):
-                    structure_path_str = f"[[{metadata['structure_path']}]]"
-                
-                annotated_chunk.update({
-                    'metadata': {
-                        'concepts': metadata['concepts'],
-                        'topics': metadata['topics'],
-                        'terms': metadata['terms'],
-                        'discourse_elements': metadata['discourse_elements'],
-                        'discourse_tags': metadata['discourse_tags'],  # Extracted tags for filtering
-                        'scripture_references': metadata['scripture_references'],
-                        'structure_path': structure_path_str,
-                        'named_entities': metadata['named_entities']
-                    },
-                    'processing_stage': 'annotated',
-                    'annotation_method': 'anthropic_claude',
-                    'annotation_model': 'claude-sonnet-4-20250514',
-                    'processing_timestamp': datetime.now().isoformat()
-                })
-                
-                annotated_chunks.append(annotated_chunk)
-                
-                # Progress indicator
-                if idx % 10 == 0 or idx == total_chunks:
-                    print(f"  ✓ Annotated {idx}/{total_chunks} chunks")
-                
+                annotated_chunk = await self._annotate_one_chunk(client, semaphore, chunk, indexes, source_metadata, processing_timestamp)
             except Exception as e:
                 print(f"⚠️  Error annotating chunk {idx}: {e}")
                 # Add chunk with empty metadata on error
-                annotated_chunk = chunk.copy()
-                # Remove the top-level structure_path since it will be in metadata
-                if 'structure_path' in annotated_chunk:
-                    del annotated_chunk['structure_path']
-                
-                # Convert structure_path from array to string format for metadata
-                structure_path_str = ""
-                if chunk_structure_path and len(chunk_structure_path) > 0:
-                    path_text = chunk_structure_path[0] if isinstance(chunk_structure_path, list) else str(chunk_structure_path)
-                    structure_path_str = f"[[{path_text}]]"
-                
-                annotated_chunk.update({
-                    'metadata': {
-                        'concepts': [],
-                        'topics': [],
-                        'terms': [],
-                        'discourse_elements': [],
-                        'discourse_tags': [],  # Empty tags on error
-                        'scripture_references': [],
-                        'structure_path': structure_path_str,
-                        'named_entities': []
-                    },
-                    'processing_stage': 'annotated',
-                    'annotation_method': 'anthropic_claude_failed',
-                    'annotation_error': str(e),
-                    'processing_timestamp': datetime.now().isoformat()
-                })
-                annotated_chunks.append(annotated_chunk)
+                annotated_chunk = self._build_annotated_chunk(chunk, None, processing_timestamp, error=e)
+            
+            # Progress indicator
+            completed += 1
+            if completed % 10 == 0 or completed == total_chunks:
+                print(f"  ✓ Annotated {completed}/{total_chunks} chunks")
+            
+            return annotated_chunk
         
-        print(f"\n✓ Completed annotation of {total_chunks} chunks")
+        async with anthropic.AsyncAnthropic(api_key=api_key, max_retries=5) as client:
+            results = await asyncio.gather(*(
+                annotate_chunk(idx, chunk, client) for idx, chunk in pending_chunks
+            ))
+        
+        for (idx, _), annotated_chunk in zip(pending_chunks, results):
+            annotated_chunks[idx - 1] = annotated_chunk
         return annotated_chunks
     
+    async def _annotate_one_chunk(self, client, semaphore: asyncio.Semaphore, chunk: Dict,
+                                  indexes: Dict[str, Any], source_metadata: Optional[Dict],
+                                  processing_timestamp: str) -> Dict:
+        """Annotate a single non-empty chunk; API and parsing errors propagate to the caller."""
+        chunk_text = chunk['text']
+        chunk_structure_path = chunk.get('structure_path', [])
+        
+        # Build prompt
+        prompt_prefix, prompt_suffix = self._build_annotation_prompt(chunk_text, chunk_structure_path, indexes, source_metadata)
+        
+        # Call Anthropic API (the shared prefix is marked for prompt caching)
+        async with semaphore:
+            message = await client.messages.create(
+                model="claude-sonnet-4-20250514",
+                max_tokens=4000,
+                temperature=0.3,
+                messages=[{
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt_prefix, "cache_control": {"type": "ephemeral"}},
+                        {"type": "text", "text": prompt_suffix}
+                    ]
+                }]
+            )
+        
+        # Parse response
+        response_text = message.content[0].text
+        metadata = self._parse_annotation_response(
+            response_text, 
+            valid_discourse_elements=indexes['discourse_elements_set'],
+            valid_concepts=indexes['concepts_set']
+        )
+        
+        return self._build_annotated_chunk(chunk, metadata, processing_timestamp)
+    
+    def _build_annotated_chunk(self, chunk: Dict, metadata: Optional[Dict[str, Any]],
+                               processing_timestamp: str, error: Optional[Exception] = None) -> Dict:
+        """Copy a chunk into its annotated form.
+        
+        Pass the parsed response metadata on success, or metadata=None and the
+        error on failure (the chunk then gets empty metadata fields).
+        """
+        chunk_structure_path = chunk.get('structure_path', [])
+        fields = metadata or {}
+        
+        # Create annotated chunk
+        annotated_chunk = chunk.copy()
+        
+        # Remove the top-level structure_path since it will be in metadata
+        # (it was only there during the chunking stage for reference)
+        if 'structure_path' in annotated_chunk:
+            del annotated_chunk['structure_path']
+        
+        # Convert structure_path from array to string format
+        structure_path_str = ""
+        if chunk_structure_path and len(chunk_structure_path) > 0:
+            path_text = chunk_structure_path[0] if isinstance(chunk_structure_path, list) else str(chunk_structure_path)
+            structure_path_str = f"[[{path_text}]]"
+        elif fields.get('structure_path'):
+            structure_path_str = f"[[{fields['structure_path']}]]"
+        
+        annotated_chunk['metadata'] = {
+            'concepts': fields.get('concepts', []),
+            'topics': fields.get('topics', []),
+            'terms': fields.get('terms', []),
+            'discourse_elements': fields.get('discourse_elements', []),
+            'discourse_tags': fields.get('discourse_tags', []),  # Extracted tags for filtering
+            'scripture_references': fields.get('scripture_references', []),
+            'structure_path': structure_path_str,
+            'named_entities': fields.get('named_entities', [])
+        }
+        annotated_chunk['processing_stage'] = 'annotated'
+        if error is None:
+            annotated_chunk['annotation_method'] = 'anthropic_claude'
+            annotated_chunk['annotation_model'] = 'claude-sonnet-4-20250514'
+        else:
+            annotated_chunk['annotation_method'] = 'anthropic_claude_failed'
+            annotated_chunk['annotation_error'] = str(error)
+        annotated_chunk['processing_timestamp'] = processing_timestamp
+        
+        return annotated_chunk
+    
     def _create_annotation_template(self, chunks: List[Dict], metadata_file: Path) -> List[Dict]:
         """Create annotation template for manual completion."""
         annotated_chunks = []
+        processing_timestamp = datetime.now().isoformat()
         
         for chunk in chunks:
             annotated_chunk = chunk.copy()
@@ -966,23 +1285,24 @@ named-entities:: [[Person/Name]], [[Work/Title]] (if any)"""
                 },
                 'processing_stage': 'annotated',
                 'annotation_method': 'manual_pending',
-                'processing_timestamp': datetime.now().isoformat()
+                'processing_timestamp': processing_timestamp
             })
             annotated_chunks.append(annotated_chunk)
         
         return annotated_chunks
     
-    def _add_embeddings(self, chunks: List[Dict], embedding_model: str = 'openai') -> List[Dict]:
+    def _add_embeddings(self, chunks: List[Dict], embedding_model: str = 'openai', batch_size: int = 256) -> List[Dict]:
         """Add vector embeddings to chunks using OpenAI API.
         
         Only the 'text' field of each chunk is embedded, not metadata or other fields.
+        Texts are sent batch_size at a time (the API accepts up to 2048 inputs per request);
+        the SDK retries rate-limited (429) and transient errors with exponential backoff.
         
         embedding_model: 'openai' (uses text-embedding-3-small) or model name
         """
-        from openai import OpenAI
+        from openai import OpenAI, BadRequestError
         import os
         from dotenv import load_dotenv
-        import time
         
         # Load environment variables
         load_dotenv()
@@ -993,7 +1313,7 @@ named-entities:: [[Person/Name]], [[Work/Title]] (if any)"""
             raise ValueError("OPENAI_API_KEY not found. Please set it in your .env file or as an environment variable.")
         
         # Initialize OpenAI client
-        client = OpenAI(api_key=api_key)
+        client = OpenAI(api_key=api_key, max_retries=5)
         
         # Determine model name
         if embedding_model == 'openai':
@@ -1001,95 +1321,215 @@ named-entities:: [[Person/Name]], [[Work/Title]] (if any)"""
         else:
             model_name = embedding_model
         
-        complete_chunks = []
+        complete_chunks = [chunk.copy() for chunk in chunks]
         total_chunks = len(chunks)
+        processing_timestamp = datetime.now().isoformat()
         
         print(f"\nGenerating embeddings for {total_chunks} chunks using {model_name}...")
         print("(Only embedding the 'text' field of each chunk)")
         print("(This may take several minutes and incur API costs)\n")
         
-        for idx, chunk in enumerate(chunks, 1):
-            complete_chunk = chunk.copy()
-            chunk_text = chunk.get('text', '')
-            
-            if not chunk_text:
-                print(f"⚠️  Skipping chunk {idx}: empty text")
-                complete_chunk.update({
-                    'embedding': None,
-                    'processing_stage': 'complete',
-                    'embedding_model': model_name,
-                    'embedding_error': 'empty_text',
-                    'processing_timestamp': datetime.now().isoformat()
-                })
-                complete_chunks.append(complete_chunk)
+        # Empty chunks are marked up front; only chunks with text are sent to the API
+        pending_chunks = []
+        for idx, complete_chunk in enumerate(complete_chunks, 1):
+            if complete_chunk.get('text', ''):
+                pending_chunks.append(complete_chunk)
                 continue
             
-            try:
-                # Get embedding from OpenAI - ONLY embedding the text field
-                response = client.embeddings.create(
-                    model=model_name,
-                    input=chunk_text
-                )
-                embedding = response.data[0].embedding
-                
+            print(f"⚠️  Skipping chunk {idx}: empty text")
+            self._mark_embedding_failed(complete_chunk, model_name, 'empty_text', processing_timestamp)
+        
+        # Group chunks by text hash so repeated passages (scripture, creeds) are embedded once
+        chunks_by_hash = {}
+        for complete_chunk in pending_chunks:
+            text_hash = hashlib.blake2b(complete_chunk['text'].encode('utf-8'), digest_size=16).hexdigest()
+            chunks_by_hash.setdefault(text_hash, []).append(complete_chunk)
+        
+        def apply_embedding(text_hash: str, embedding: List[float]):
+            for complete_chunk in chunks_by_hash[text_hash]:
                 complete_chunk.update({
                     'embedding': embedding,
                     'processing_stage': 'complete',
                     'embedding_model': model_name,
-                    'processing_timestamp': datetime.now().isoformat()
+                    'processing_timestamp': processing_timestamp
                 })
-                complete_chunks.append(complete_chunk)
-                
-                # Progress indicator
-                if idx % 10 == 0 or idx == total_chunks:
-                    print(f"  ✓ Generated embeddings for {idx}/{total_chunks} chunks")
-                
-                # Rate limiting - small delay every 100 requests to avoid hitting limits
-                if idx % 100 == 0:
-                    time.sleep(1)
-                    
+        
+        def apply_error(text_hash: str, error: Exception):
+            for complete_chunk in chunks_by_hash[text_hash]:
+                self._mark_embedding_failed(complete_chunk, model_name, str(error), processing_timestamp)
+        
+        def request_embeddings(batch_hashes: List[str]) -> Dict[str, List[float]]:
+            # Get embeddings from OpenAI - ONLY embedding the text field
+            response = client.embeddings.create(
+                model=model_name,
+                input=[chunks_by_hash[text_hash][0]['text'] for text_hash in batch_hashes]
+            )
+            return {batch_hashes[item.index]: _as_embedding_vector(item.embedding) for item in response.data}
+        
+        # Reuse embeddings cached by earlier runs
+        cached_embeddings = self._get_cached_embeddings(model_name, list(chunks_by_hash))
+        for text_hash, embedding in cached_embeddings.items():
+            apply_embedding(text_hash, embedding)
+        
+        uncached_hashes = [text_hash for text_hash in chunks_by_hash if text_hash not in cached_embeddings]
+        print(f"  ✓ {len(chunks_by_hash)} unique texts: {len(cached_embeddings)} cached, {len(uncached_hashes)} to embed")
+        
+        for start in range(0, len(uncached_hashes), batch_size):
+            batch_hashes = uncached_hashes[start:start + batch_size]
+            
+            new_embeddings = {}
+            try:
+                new_embeddings = request_embeddings(batch_hashes)
+            except BadRequestError as e:
+                # A single bad input rejects the whole request - retry the batch one text at a time
+                print(f"⚠️  Batch rejected for texts {start + 1}-{start + len(batch_hashes)}: {e}")
+                print("   Retrying this batch one text at a time...")
+                for text_hash in batch_hashes:
+                    try:
+                        new_embeddings.update(request_embeddings([text_hash]))
+                    except Exception as item_error:
+                        apply_error(text_hash, item_error)
             except Exception as e:
-                print(f"⚠️  Error generating embedding for chunk {idx}: {e}")
-                complete_chunk.update({
-                    'embedding': None,
-                    'processing_stage': 'complete',
-                    'embedding_model': model_name,
-                    'embedding_error': str(e),
-                    'processing_timestamp': datetime.now().isoformat()
-                })
-                complete_chunks.append(complete_chunk)
+                print(f"⚠️  Error generating embeddings for texts {start + 1}-{start + len(batch_hashes)}: {e}")
+                for text_hash in batch_hashes:
+                    apply_error(text_hash, e)
+            
+            for text_hash, embedding in new_embeddings.items():
+                apply_embedding(text_hash, embedding)
+            if new_embeddings:
+                self._store_cached_embeddings(model_name, new_embeddings)
+            
+            # Progress indicator
+            print(f"  ✓ Generated embeddings for {start + len(batch_hashes)}/{len(uncached_hashes)} texts")
         
         print(f"\n✓ Completed embedding generation for {total_chunks} chunks")
         return complete_chunks
     
+    @staticmethod
+    def _mark_embedding_failed(complete_chunk: Dict, model_name: str, error: str, processing_timestamp: str):
+        """Record a chunk that could not be embedded (empty text or an API error)."""
+        complete_chunk.update({
+            'embedding': None,
+            'processing_stage': 'complete',
+            'embedding_model': model_name,
+            'embedding_error': error,
+            'processing_timestamp': processing_timestamp
+        })
+    
+    def _open_embedding_cache(self) -> sqlite3.Connection:
+        """Open the on-disk embedding cache, keyed by (model, blake2b hash of chunk text)."""
+        connection = sqlite3.connect(self.base_dir / 'cache' / 'embeddings.sqlite')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS embeddings ('
+            'model TEXT NOT NULL, text_hash TEXT NOT NULL, embedding BLOB NOT NULL, '
+            'PRIMARY KEY (model, text_hash))'
+        )
+        return connection
+    
+    def _get_cached_embeddings(self, model_name: str, text_hashes: List[str]) -> Dict[str, Any]:
+        """Return cached embeddings for whichever of text_hashes are present."""
+        cached = {}
+        with closing(self._open_embedding_cache()) as connection:
+            # Query in slices to stay under SQLite's bound-parameter limit
+            for start in range(0, len(text_hashes), 500):
+                hash_slice = text_hashes[start:start + 500]
+                placeholders = ', '.join('?' * len(hash_slice))
+                rows = connection.execute(
+                    f'SELECT text_hash, embedding FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})',
+                    [model_name, *hash_slice]
+                )
+                for text_hash, embedding in rows:
+                    cached[text_hash] = self._decode_cached_embedding(embedding)
+        return cached
+    
+    def _store_cached_embeddings(self, model_name: str, embeddings: Dict[str, Any]):
+        """Persist newly generated embeddings so later runs can reuse them.
+        
+        Embeddings are stored as raw float32 bytes (behind a short magic prefix)
+        when numpy is available, otherwise as JSON.
+        """
+        if NUMPY_AVAILABLE:
+            encode = lambda embedding: _FLOAT32_BLOB_MAGIC + np.asarray(embedding, dtype=np.float32).tobytes()
+        else:
+            encode = orjson.dumps if ORJSON_AVAILABLE else json.dumps
+        with closing(self._open_embedding_cache()) as connection, connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO embeddings (model, text_hash, embedding) VALUES (?, ?, ?)',
+                [(model_name, text_hash, encode(embedding)) for text_hash, embedding in embeddings.items()]
+            )
+    
+    @staticmethod
+    def _decode_cached_embedding(blob) -> Any:
+        """Decode a cache row written either as raw float32 bytes or as JSON (text or bytes)."""
+        if isinstance(blob, bytes) and blob.startswith(_FLOAT32_BLOB_MAGIC):
+            if NUMPY_AVAILABLE:
+                return np.frombuffer(blob, dtype=np.float32, offset=len(_FLOAT32_BLOB_MAGIC))
+            return array('f', blob[len(_FLOAT32_BLOB_MAGIC):]).tolist()
+        loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+        return _as_embedding_vector(loads(blob))
+    
     def _is_human_approved(self, file_path: Path) -> bool:
         """Check if file has been human-approved for next stage."""
         approval_file = Path(str(file_path) + '.approved')
         return approval_file.exists()
     
-    def _save_jsonl(self, data: List[Dict], output_file: Path):
-        """Save data as JSONL file."""
-        with open(output_file, 'w', encoding='utf-8') as f:
-            for item in data:
-                f.write(json.dumps(item, ensure_ascii=False) + '\n')
+    def _save_jsonl(self, data: Iterable[Dict], output_file: Path) -> int:
+        """Stream records to a JSONL file and return the number written.
+        
+        Records go to a temporary sibling file that replaces output_file only
+        once fully written, so a crash never leaves a truncated JSONL behind.
+        """
+        temp_file = Path(str(output_file) + '.tmp')
+        # zip stops on the exhausted data before drawing from the counter, so its next value is the record count
+        counter = itertools.count()
+        items = (item for item, _ in zip(data, counter))
+        try:
+            if ORJSON_AVAILABLE:
+                option = orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY
+                with open(temp_file, 'wb', buffering=1024 * 1024) as f:
+                    f.writelines(orjson.dumps(item, option=option) for item in items)
+            else:
+                with open(temp_file, 'w', encoding='utf-8', buffering=1024 * 1024) as f:
+                    f.writelines(json.dumps(item, ensure_ascii=False, default=_json_default) + '\n' for item in items)
+            os.replace(temp_file, output_file)
+        except BaseException:
+            temp_file.unlink(missing_ok=True)
+            raise
+        return next(counter)
     
     def _load_jsonl(self, file_path: Path) -> List[Dict]:
-        """Load JSONL file."""
+        """Load JSONL file (memory-mapped, decoded with orjson when available)."""
+        loads = orjson.loads if ORJSON_AVAILABLE else json.loads
         data = []
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                if line.strip():
-                    data.append(json.loads(line))
+        with open(file_path, 'rb') as f:
+            # Empty files cannot be memory-mapped
+            if os.fstat(f.fileno()).st_size == 0:
+                return data
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                for line in iter(content.readline, b''):
+                    # isspace() skips blank lines without allocating a stripped copy
+                    if not line.isspace():
+                        data.append(loads(line))
         return data
     
     def _log_processing(self, source_file: str, stage: str, chunk_count: int, output_file: Path):
         """Log processing step."""
-        log_file = self.base_dir / 'logs' / 'processing.log'
         timestamp = datetime.now().isoformat()
         log_entry = f"{timestamp} | {stage.upper()} | {source_file} → {chunk_count} chunks → {output_file.name}\n"
         
-        with open(log_file, 'a', encoding='utf-8') as f:
-            f.write(log_entry)
+        with self._log_lock:
+            if self._log_handle is None:
+                # Line-buffered so each entry reaches the file as soon as it is logged
+                log_file = self.base_dir / 'logs' / 'processing.log'
+                self._log_handle = open(log_file, 'a', encoding='utf-8', buffering=1)
+            self._log_handle.write(log_entry)
+    
+    def close(self):
+        """Close the processing log if it has been opened."""
+        with self._log_lock:
+            if self._log_handle is not None:
+                self._log_handle.close()
+                self._log_handle = None
     
     def status_report(self) -> Dict[str, int]:
         """Generate processing status report."""
@@ -1098,15 +1538,16 @@ named-entities:: [[Person/Name]], [[Work/Title]] (if any)"""
         for stage_name, stage in self.stages.items():
             folder = self.base_dir / stage.input_folder
             if folder.exists():
-                jsonl_files = list(folder.glob('*.jsonl'))
-                xml_files = list(folder.glob('*.xml'))
-                pdf_files = list(folder.glob('*.pdf'))
-                all_files = jsonl_files + xml_files + pdf_files
+                # One directory listing per stage; approval markers are looked up by name
+                with os.scandir(folder) as entries:
+                    names = {entry.name for entry in entries}
+                all_files = [name for name in names if name.endswith(('.jsonl', '.xml', '.pdf'))]
+                approved_count = sum(1 for name in all_files if name + '.approved' in names)
                 
                 status[stage_name] = {
                     'total_files': len(all_files),
-                    'approved_files': len([f for f in all_files if Path(str(f) + '.approved').exists()]),
-                    'pending_review': len([f for f in all_files if not Path(str(f) + '.approved').exists()])
+                    'approved_files': approved_count,
+                    'pending_review': len(all_files) - approved_count
                 }
         
         return status
@@ -1132,9 +1573,12 @@ named-entities:: [[Person/Name]], [[Work/Title]] (if any)"""
 
 def main():
     parser = argparse.ArgumentParser(description='Staged Theological Text Processing Pipeline')
-    parser.add_argument('--stage', choices=['chunk', 'annotate', 'vectorize', 'deploy', 'status'], 
+    parser.add_argument('--stage', choices=['chunk', 'annotate', 'vectorize', 'deploy', 'status', 'batch'], 
                        required=True, help='Processing stage to run')
     parser.add_argument('--source', help='Source file to process')
+    parser.add_argument('--sources', nargs='+', help='Source files to chunk and annotate (batch stage)')
+    parser.add_argument('--no-gate', action='store_true',
+                       help='Batch stage: annotate new chunks without waiting for .approved files')
     parser.add_argument('--annotation-method', choices=['ai', 'manual'], default='ai',
                        help='Annotation method (default: ai)')
     parser.add_argument('--base-dir', default='./theological_processing',
@@ -1143,7 +1587,14 @@ def main():
     args = parser.parse_args()
     
     pipeline = TheologicalProcessingPipeline(args.base_dir)
-    
+    try:
+        run_stage(pipeline, args)
+    finally:
+        pipeline.close()
+
+
+def run_stage(pipeline: TheologicalProcessingPipeline, args: argparse.Namespace):
+    """Run the CLI stage selected in args."""
     if args.stage == 'status':
         status = pipeline.status_report()
         print("\n=== PROCESSING PIPELINE STATUS ===")
@@ -1195,6 +1646,21 @@ def main():
         output_file = pipeline.process_stage_4_to_deployed(args.source)
         if output_file:
             print(f"\n✓ Successfully deployed to production: {output_file}")
+    
+    elif args.stage == 'batch':
+        if not args.sources:
+            print("Error: --sources required for batch stage")
+            return
+        
+        tasks = pipeline.run_batch(args.sources, args.annotation_method, require_approval=not args.no_gate)
+        print("\n=== BATCH RESULTS ===")
+        for task in tasks:
+            if task.error:
+                print(f"✗ {task.source_file}: {task.error}")
+            elif task.annotated_file:
+                print(f"✓ {task.source_file} → {task.annotated_file}")
+            else:
+                print(f"⚠️  {task.source_file} → {task.chunks_file} (awaiting chunk approval)")
 
 
 if __name__ == '__main__':
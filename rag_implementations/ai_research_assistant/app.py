@@ -1,15 +1,49 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response
 import json
 import openai
 from openai import OpenAI
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import os
+import base64
+import bisect
+import functools
+import hashlib
+import itertools
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from dotenv import load_dotenv
 
+# orjson parses the embedding-heavy JSONL and encodes responses much faster; fall back to the stdlib json module
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
+
+# faiss provides an HNSW index so large corpora are not scanned linearly for every query
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+    faiss = None
+
+# simsimd scores the int8 embedding matrix with SIMD int8 dot products; fall back to dequantized BLAS blocks
+try:
+    import simsimd
+    SIMSIMD_AVAILABLE = True
+except ImportError:
+    SIMSIMD_AVAILABLE = False
+    simsimd = None
+
 # Load environment variables from .env file (look in parent directories too)
 env_path = Path(__file__).parent.parent.parent / '.env'
 load_dotenv(env_path)
@@ -24,10 +58,75 @@ client = OpenAI(api_key=api_key)
 
 # Global variable to store the dataset
 dataset = []
+# Row-normalized float32 embeddings, one row per dataset chunk
+# (a QuantizedEmbeddingMatrix when EMBEDDING_QUANTIZATION=int8)
+embedding_matrix = None
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", "").lower()
+
+# HNSW shortlist for the vector score. ANN_SEARCH=auto (default) builds it for corpora of
+# ANN_MIN_CHUNKS or more when faiss is installed, 1 always builds it, 0 keeps the exact linear scan
+ann_index = None
+ANN_SEARCH = os.getenv("ANN_SEARCH", "auto").lower()
+ANN_MIN_CHUNKS = 50000
+ANN_CANDIDATES = 200
+
+# Lowercased chunk text, aligned with dataset, for exact phrase matching
+chunk_texts_lower = []
+
+# Inverted indexes over chunk metadata for the recommended filters
+metadata_filter_index = None
+
+# Chunk fields copied into search results (the UI and the summary prompt use these)
+RESULT_CHUNK_FIELDS = ('id', 'source', 'author', 'text', 'metadata')
+
+# Map recommended filter type names to metadata field names
+FILTER_METADATA_FIELDS = {
+    'function': 'discourse_elements',  # Legacy name compatibility
+    'authors': None,  # Handled at top level, not in metadata
+    'topics': 'topics',
+    'concepts': 'concepts',
+    'terms': 'terms',
+    'scripture_references': 'scripture_references',
+    'structure_paths': 'structure_path',
+    'discourse_elements': 'discourse_elements',
+    'named_entities': 'named_entities'
+}
+
+_DISCOURSE_ELEMENT_RE = re.compile(r'\[\[([^\]]+)\]\]')
+_WHITESPACE_RE = re.compile(r'\s+')
+_CITATION_RE = re.compile(r'\[(\d+)\]')
+# A whitespace-delimited word minus leading/trailing .,!?;:"()[]{} (inner punctuation such as "14:6" is kept)
+_QUERY_WORD_RE = re.compile(r'[^\s.,!?;:"()\[\]{}](?:\S*[^\s.,!?;:"()\[\]{}])?')
+# Words dropped from queries before building key phrases
+_COMMON_WORDS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'can', 'what', 'how', 'why', 'when', 'where', 'who', 'which', 'that', 'this', 'these', 'those'})
+
+# Parsed dataset cached as chunks.jsonl (no embeddings) + embeddings.npy (memory-mapped on load)
+DATASET_SNAPSHOT_DIR = Path(__file__).parent / '.cache' / 'dataset'
+DATASET_SNAPSHOT_VERSION = 1
+
+# Embedding model for queries; it must match the model that embedded the deployed chunks
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Chat model for query analysis and research summaries
+CHAT_MODEL = "gpt-4o-mini"
+
+# Query embeddings and analyses persist across restarts here (second tier behind the in-memory LRUs)
+QUERY_CACHE_PATH = Path(__file__).parent / '.cache' / 'query_cache.sqlite'
+
+# Set DEBUG_SEARCH=1 to log the recommended filters of every search
+DEBUG_SEARCH = os.getenv("DEBUG_SEARCH", "").lower() in ("1", "true", "yes")
+
+# Set BATCH_QUERY_EMBEDDINGS=1 to coalesce concurrent query embeddings into one API call
+BATCH_QUERY_EMBEDDINGS = os.getenv("BATCH_QUERY_EMBEDDINGS", "").lower() in ("1", "true", "yes")
+
+# /search responses are reused for repeats of the same query. Set SEMANTIC_RESPONSE_CACHE=1 to
+# also reuse them for queries whose embedding is within the threshold of a cached one; off by
+# default, since queries such as "Romans 5" and "Romans 6" embed almost identically
+SEMANTIC_RESPONSE_CACHE = os.getenv("SEMANTIC_RESPONSE_CACHE", "").lower() in ("1", "true", "yes")
+SEMANTIC_RESPONSE_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_RESPONSE_CACHE_THRESHOLD", "0.98"))
 
 def load_dataset():
     """Load the theological chunks dataset from deployed sources."""
-    global dataset
+    global dataset, embedding_matrix, chunk_texts_lower, metadata_filter_index, ann_index
     from pathlib import Path
     
     dataset = []
@@ -41,53 +140,447 @@ def load_dataset():
         return False
     
     try:
-        # Load all JSONL files from the deployed directory
-        jsonl_files = list(deployed_dir.glob('*.jsonl'))
+        # Load all JSONL files from the deployed directory, in a stable order so the
+        # snapshot signature (and chunk order) does not depend on directory listing order
+        jsonl_files = sorted(deployed_dir.glob('*.jsonl'))
         
         if not jsonl_files:
             print(f"Warning: No JSONL files found in {deployed_dir}")
             return False
         
-        for jsonl_file in jsonl_files:
-            print(f"Loading {jsonl_file.name}...")
-            with open(jsonl_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    if line.strip():
-                        chunk = json.loads(line.strip())
-                        dataset.append(chunk)
+        # Reuse the snapshot from a previous start unless a source file changed
+        source_signature = [[f.name, f.stat().st_size, f.stat().st_mtime_ns] for f in jsonl_files]
+        snapshot = load_dataset_snapshot(source_signature)
+        if snapshot is not None:
+            dataset, embedding_matrix = snapshot
+            print(f"Loaded dataset snapshot from {DATASET_SNAPSHOT_DIR}")
+        else:
+            embedding_rows = []
+            for jsonl_file, (chunks, rows) in zip(jsonl_files, parse_jsonl_files(jsonl_files)):
+                print(f"Loaded {jsonl_file.name} ({len(chunks)} chunks)")
+                dataset.extend(chunks)
+                embedding_rows.extend(rows)
+            
+            embedding_matrix = build_embedding_matrix(embedding_rows)
+            save_dataset_snapshot(source_signature, dataset, embedding_matrix)
         
+        # A saved HNSW graph is only trusted alongside the snapshot it was built from
+        ann_index = build_ann_index(embedding_matrix, reuse_saved=snapshot is not None)
+        if EMBEDDING_QUANTIZATION == 'int8':
+            embedding_matrix = build_quantized_matrix(embedding_matrix, reuse_saved=snapshot is not None)
+        chunk_texts_lower = [chunk.get("text", "").lower() for chunk in dataset]
+        metadata_filter_index = MetadataFilterIndex(dataset)
         print(f"Loaded {len(dataset)} chunks from {len(jsonl_files)} file(s)")
         return True
     except Exception as e:
         print(f"Error loading dataset: {e}")
         return False
 
-def get_query_embedding(query: str) -> List[float]:
-    """Get embedding for the query using OpenAI."""
+def parse_jsonl_file(path: Path) -> Tuple[List[Dict[str, Any]], List[Optional[np.ndarray]]]:
+    """Parse one deployed JSONL file into chunk dicts and their float32 embedding rows."""
+    loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+    chunks = []
+    rows = []
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.isspace():
+                chunk = loads(line)
+                # Keep the embedding only as a float32 row; the dict holds text and metadata
+                embedding = chunk.pop("embedding", None)
+                rows.append(np.asarray(embedding, dtype=np.float32) if embedding else None)
+                chunks.append(chunk)
+    return chunks, rows
+
+def parse_jsonl_files(paths: List[Path]) -> List[Tuple[List[Dict[str, Any]], List[Optional[np.ndarray]]]]:
+    """Parse several JSONL files, one worker process per file when there is more than one.
+    
+    Decoding the thousands of embedding floats per line is pure Python work that holds
+    the GIL, so threads would not help; workers send back compact float32 rows instead.
+    Results come back in the order of paths.
+    """
+    workers = min(len(paths), os.cpu_count() or 1)
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # Largest files first, so a big file queued last does not leave the other
+                # workers idle while it parses alone
+                futures = {path: executor.submit(parse_jsonl_file, path)
+                           for path in sorted(paths, key=lambda p: p.stat().st_size, reverse=True)}
+                return [futures[path].result() for path in paths]
+        except (OSError, BrokenProcessPool) as e:
+            print(f"Parallel load unavailable ({e}); parsing files sequentially")
+    return [parse_jsonl_file(path) for path in paths]
+
+def load_dataset_snapshot(source_signature: List[List[Any]]):
+    """Return (chunks, memory-mapped embedding matrix) if the snapshot matches the source files, else None."""
+    manifest_path = DATASET_SNAPSHOT_DIR / 'manifest.json'
     try:
-        response = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=query
-        )
-        return response.data[0].embedding
-    except Exception as e:
-        print(f"Error getting query embedding: {e}")
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != DATASET_SNAPSHOT_VERSION or manifest.get('sources') != source_signature:
+            return None
+        
+        loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+        with open(DATASET_SNAPSHOT_DIR / 'chunks.jsonl', 'rb') as f:
+            chunks = [loads(line) for line in f]
+        matrix = np.load(DATASET_SNAPSHOT_DIR / 'embeddings.npy', mmap_mode='r')
+        if matrix.shape[0] != len(chunks):
+            return None
+        return chunks, matrix
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable dataset snapshot: {e}")
         return None
 
-def cosine_similarity_score(vec1: List[float], vec2: List[float]) -> float:
-    """Calculate cosine similarity between two vectors."""
+def save_dataset_snapshot(source_signature: List[List[Any]], chunks: List[Dict[str, Any]], matrix: np.ndarray):
+    """Write chunks (without embeddings), the normalized embedding matrix and a manifest of the source files."""
     try:
-        return cosine_similarity([vec1], [vec2])[0][0]
-    except:
-        return 0.0
+        DATASET_SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+        # Files derived from the previous embeddings (HNSW graph, int8 copy) are rebuilt on demand
+        for derived_name in ('hnsw.faiss', 'hnsw_sq8.faiss', 'embeddings.int8.npy', 'embeddings.scales.npy'):
+            (DATASET_SNAPSHOT_DIR / derived_name).unlink(missing_ok=True)
+        chunks_tmp = DATASET_SNAPSHOT_DIR / 'chunks.jsonl.tmp'
+        with open(chunks_tmp, 'wb') as f:
+            if ORJSON_AVAILABLE:
+                f.writelines(orjson.dumps(chunk, option=orjson.OPT_APPEND_NEWLINE) for chunk in chunks)
+            else:
+                f.writelines((json.dumps(chunk, ensure_ascii=False) + '\n').encode('utf-8') for chunk in chunks)
+        embeddings_tmp = DATASET_SNAPSHOT_DIR / 'embeddings.npy.tmp'
+        with open(embeddings_tmp, 'wb') as f:
+            np.save(f, matrix)
+        os.replace(chunks_tmp, DATASET_SNAPSHOT_DIR / 'chunks.jsonl')
+        os.replace(embeddings_tmp, DATASET_SNAPSHOT_DIR / 'embeddings.npy')
+        
+        # The manifest goes last so a half-written snapshot is never treated as current
+        manifest_tmp = DATASET_SNAPSHOT_DIR / 'manifest.json.tmp'
+        with open(manifest_tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': DATASET_SNAPSHOT_VERSION, 'sources': source_signature}, f)
+        os.replace(manifest_tmp, DATASET_SNAPSHOT_DIR / 'manifest.json')
+    except OSError as e:
+        print(f"Could not write dataset snapshot: {e}")
 
-def analyze_query(query: str) -> Dict[str, Any]:
-    """Analyze the query to determine search strategy and filters."""
+def build_embedding_matrix(rows: List[Any]) -> np.ndarray:
+    """Stack per-chunk embedding rows into an (N, D) float32 matrix with unit-length rows.
+
+    Missing (None) or mis-sized rows become zero rows so they score 0 against any query.
+    Consumes `rows`: each entry is cleared once copied, so the matrix is the only embedding
+    storage left and the per-chunk arrays are freed while it fills rather than afterwards.
+    """
+    dimension = next((row.shape[0] for row in rows if row is not None), 0)
+    matrix = np.zeros((len(rows), dimension), dtype=np.float32)
+    for index, row in enumerate(rows):
+        if row is not None and row.shape == (dimension,):
+            matrix[index] = row
+        rows[index] = None
     
-    analysis_prompt = f"""
-You are a research assistant. Analyze this query and determine the best search strategy using the available metadata filters.
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
 
-Query: "{query}"
+def build_ann_index(matrix: np.ndarray, reuse_saved: bool = False):
+    """faiss HNSW inner-product index over the normalized embeddings, or None if ANN search is off.
+    
+    The graph is saved in the dataset snapshot directory; with reuse_saved it is read back
+    from there (when it matches the matrix) instead of being rebuilt, which dominates startup
+    on the corpora large enough to need it. With EMBEDDING_QUANTIZATION=int8 the index stores
+    8-bit scalar-quantized vectors too, so it does not keep a float32 copy of the corpus.
+    """
+    if not FAISS_AVAILABLE or ANN_SEARCH in ('0', 'false', 'no') or matrix.shape[1] == 0:
+        return None
+    if ANN_SEARCH == 'auto' and matrix.shape[0] < ANN_MIN_CHUNKS:
+        return None
+    
+    quantized = EMBEDDING_QUANTIZATION == 'int8'
+    index_path = DATASET_SNAPSHOT_DIR / ('hnsw_sq8.faiss' if quantized else 'hnsw.faiss')
+    if reuse_saved and index_path.exists():
+        try:
+            index = faiss.read_index(str(index_path))
+            if index.ntotal == matrix.shape[0] and index.d == matrix.shape[1]:
+                index.hnsw.efSearch = 2 * ANN_CANDIDATES
+                print(f"Loaded HNSW index from {index_path}")
+                return index
+        except RuntimeError as e:
+            print(f"Ignoring unreadable HNSW index: {e}")
+    
+    vectors = np.ascontiguousarray(matrix, dtype=np.float32)
+    if quantized:
+        index = faiss.IndexHNSWSQ(matrix.shape[1], faiss.ScalarQuantizer.QT_8bit, 32, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+    else:
+        index = faiss.IndexHNSWFlat(matrix.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efSearch = 2 * ANN_CANDIDATES
+    index.add(vectors)
+    print(f"Built HNSW index over {matrix.shape[0]} embeddings")
+    
+    try:
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        index_tmp = index_path.with_name(index_path.name + '.tmp')
+        faiss.write_index(index, str(index_tmp))
+        os.replace(index_tmp, index_path)
+    except (OSError, RuntimeError) as e:
+        print(f"Could not save HNSW index: {e}")
+    return index
+
+def build_quantized_matrix(matrix: np.ndarray, reuse_saved: bool = False) -> 'QuantizedEmbeddingMatrix':
+    """int8 form of the embedding matrix, saved in the snapshot directory and memory-mapped back with reuse_saved.
+    
+    Reusing the saved codes skips quantizing at startup and leaves the float32 snapshot unread.
+    """
+    codes_path = DATASET_SNAPSHOT_DIR / 'embeddings.int8.npy'
+    scales_path = DATASET_SNAPSHOT_DIR / 'embeddings.scales.npy'
+    if reuse_saved:
+        try:
+            codes = np.load(codes_path, mmap_mode='r')
+            scales = np.load(scales_path)
+            if codes.shape == matrix.shape and scales.shape == (matrix.shape[0],):
+                return QuantizedEmbeddingMatrix(codes, scales)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable int8 embeddings: {e}")
+    
+    quantized = QuantizedEmbeddingMatrix.quantize(matrix)
+    try:
+        DATASET_SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+        for path, array in ((codes_path, quantized.codes), (scales_path, quantized.scales)):
+            array_tmp = path.with_name(path.name + '.tmp')
+            with open(array_tmp, 'wb') as f:
+                np.save(f, array)
+            os.replace(array_tmp, path)
+    except OSError as e:
+        print(f"Could not save int8 embeddings: {e}")
+    return quantized
+
+class QuantizedEmbeddingMatrix:
+    """int8 copy of a row-normalized embedding matrix with one float32 scale per row.
+    
+    Holds a quarter of the float32 matrix's memory. Each scale brings its dequantized
+    row back to unit length, so scores remain cosines of unit vectors. With simsimd,
+    `matrix @ query` quantizes the query as well and takes int8 dot products directly;
+    otherwise it dequantizes one block of rows at a time so the product still runs
+    through BLAS. Either way scores stay within about 2e-3 of the float32 ones.
+    """
+    
+    block_rows = 4096
+    
+    def __init__(self, codes: np.ndarray, scales: np.ndarray):
+        self.codes = codes
+        self.scales = scales
+        self.shape = codes.shape
+    
+    @classmethod
+    def quantize(cls, matrix: np.ndarray) -> 'QuantizedEmbeddingMatrix':
+        steps = np.abs(matrix).max(axis=1) / 127.0
+        codes = np.rint(matrix / np.where(steps > 0, steps, 1.0)[:, None]).astype(np.int8)
+        code_norms = np.sqrt(np.einsum('ij,ij->i', codes, codes, dtype=np.int64))
+        scales = np.divide(1.0, code_norms, out=np.zeros(len(code_norms)), where=code_norms > 0).astype(np.float32)
+        return cls(codes, scales)
+    
+    def __matmul__(self, vector: np.ndarray) -> np.ndarray:
+        if SIMSIMD_AVAILABLE:
+            step = np.abs(vector).max() / 127.0
+            if step == 0:
+                return np.zeros(self.shape[0], dtype=np.float32)
+            query_codes = np.rint(vector / step).astype(np.int8).reshape(1, -1)
+            products = np.asarray(simsimd.cdist(self.codes, query_codes, metric='dot'))[:, 0]
+            return (products * (self.scales * step)).astype(np.float32)
+        
+        scores = np.empty(self.shape[0], dtype=np.float32)
+        for start in range(0, self.shape[0], self.block_rows):
+            block = self.codes[start:start + self.block_rows]
+            np.matmul(block.astype(np.float32), vector, out=scores[start:start + len(block)])
+        scores *= self.scales
+        return scores
+    
+    def __getitem__(self, index) -> np.ndarray:
+        """Dequantized row (int index) or rows (index array)."""
+        return self.codes[index].astype(np.float32) * np.expand_dims(self.scales[index], -1)
+
+class QueryCacheStore:
+    """SQLite table of per-query values keyed by a SHA-256 hex digest; subclasses pick the table and encoding."""
+    
+    table = None
+    column = None
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+        self._disabled = False
+    
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None and not self._disabled:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                # Flask serves requests on several threads; access is serialized by self._lock
+                self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+                # WAL without a sync per commit: a new entry costs no fsync, and losing the
+                # last few entries in a power cut only means recomputing them
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.table} (key TEXT PRIMARY KEY, {self.column} BLOB NOT NULL)"
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"Query cache {self.table} disabled: {e}")
+                self._disabled = True
+                self._conn = None
+        return self._conn
+    
+    def _get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return None
+            row = conn.execute(f"SELECT {self.column} FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def _put(self, key: str, value: bytes):
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                conn.execute(f"INSERT OR REPLACE INTO {self.table} (key, {self.column}) VALUES (?, ?)", (key, value))
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error writing query cache {self.table}: {e}")
+
+class QueryEmbeddingStore(QueryCacheStore):
+    """float32 query embeddings keyed by SHA-256 of the model and normalized query."""
+    
+    table = 'query_embeddings'
+    column = 'vector'
+    
+    def get(self, key: str) -> Optional[np.ndarray]:
+        value = self._get(key)
+        return np.frombuffer(value, dtype=np.float32) if value is not None else None
+    
+    def put(self, key: str, vector: np.ndarray):
+        self._put(key, vector.astype(np.float32).tobytes())
+
+class QueryAnalysisStore(QueryCacheStore):
+    """JSON text of query analyses keyed by SHA-256 of the model and full analysis prompt."""
+    
+    table = 'query_analyses'
+    column = 'analysis'
+    
+    def get(self, key: str) -> Optional[str]:
+        value = self._get(key)
+        return value.decode('utf-8') if value is not None else None
+    
+    def put(self, key: str, content: str):
+        self._put(key, content.encode('utf-8'))
+
+query_embedding_store = QueryEmbeddingStore(QUERY_CACHE_PATH)
+query_analysis_store = QueryAnalysisStore(QUERY_CACHE_PATH)
+
+class EmbeddingBatcher:
+    """Coalesces concurrent query embedding requests into one OpenAI call.
+    
+    Callers block on a Future while a background thread collects whatever arrives
+    within `window` seconds of the first request (up to `max_batch` texts) and
+    embeds the batch with a single list-input call.
+    """
+    
+    def __init__(self, window: float = 0.015, max_batch: int = 32):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+    
+    def embed(self, text: str) -> np.ndarray:
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+    
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            try:
+                response = client.embeddings.create(
+                    model=EMBEDDING_MODEL,
+                    input=[text for text, _ in batch],
+                    encoding_format="base64"
+                )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            for (_, future), item in zip(batch, sorted(response.data, key=lambda item: item.index)):
+                future.set_result(decode_embedding(item.embedding))
+
+embedding_batcher = EmbeddingBatcher() if BATCH_QUERY_EMBEDDINGS else None
+
+def decode_embedding(embedding) -> np.ndarray:
+    """float32 vector from an embeddings item requested with encoding_format="base64".
+    
+    The base64 payload is the raw little-endian float32 buffer, so it decodes with one copy
+    instead of building 1536 Python floats; plain lists are accepted too.
+    """
+    if isinstance(embedding, str):
+        return np.frombuffer(base64.b64decode(embedding), dtype='<f4')
+    return np.asarray(embedding, dtype=np.float32)
+
+def request_query_embedding(text: str) -> np.ndarray:
+    """Embed one query with the OpenAI API, through the batcher when it is enabled."""
+    if embedding_batcher is not None:
+        return embedding_batcher.embed(text)
+    response = client.embeddings.create(
+        model=EMBEDDING_MODEL,
+        input=text,
+        encoding_format="base64"
+    )
+    return decode_embedding(response.data[0].embedding)
+
+def get_query_embedding(query: str) -> Optional[np.ndarray]:
+    """Get the unit-length float32 embedding for the query, cached in memory and on disk."""
+    try:
+        # Only whitespace is normalized: the key is also the text that gets embedded,
+        # and case-sensitive terms ("Word"/"word", "Lord") should embed as typed
+        return _cached_query_embedding(' '.join(query.split()))
+    except Exception as e:
+        print(f"Error getting query embedding: {e}")
+        return None
+
+@functools.lru_cache(maxsize=1024)
+def _cached_query_embedding(normalized_query: str) -> np.ndarray:
+    # Failures raise instead of returning None so lru_cache never remembers them
+    # The model is part of the key so switching models never serves stale vectors
+    key = hashlib.sha256(f"{EMBEDDING_MODEL}\0{normalized_query}".encode('utf-8')).hexdigest()
+    vector = query_embedding_store.get(key)
+    if vector is None:
+        vector = request_query_embedding(normalized_query)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+        query_embedding_store.put(key, vector)
+    
+    # Shared by every request that hits the cache, so make it immutable
+    vector.flags.writeable = False
+    return vector
+
+# Static instructions for query analysis; the query itself is the user message, so this
+# prefix is identical on every call
+ANALYSIS_SYSTEM_PROMPT = """You are a research assistant. Analyze the user's query and determine the best search strategy using the available metadata filters.
 
 Available metadata filters:
 - Topics: Various theological topics (format: "Concept/Topic", e.g., "Apologetics/Personal vs Systematic")
@@ -99,11 +592,11 @@ Available metadata filters:
 - Structure Path: Document structure (e.g., "Chapter I > I. INTRODUCTION IN DEFENCE OF EVERYTHING ELSE")
 - Authors: Source authors (e.g., "Gilbert K. Chesterton", "John Calvin")
 
-Analyze the query and respond with a JSON object containing:
+Respond with a JSON object containing:
 1. "query_type": The type of question (definition, comparison, historical, doctrinal, exegetical, etc.)
 2. "theological_concepts": List of theological concepts identified
 3. "search_strategy": Description of how to search (vector similarity + specific filters)
-4. "recommended_filters": Object with specific filter recommendations
+4. "recommended_filters": Object with specific filter recommendations, keyed by authors, topics, concepts, terms, discourse_elements, scripture_references, named_entities or structure_paths
 5. "reasoning": Explanation of why these filters were chosen
 
 IMPORTANT: Be intelligent about detecting metadata matches:
@@ -115,80 +608,25 @@ IMPORTANT: Be intelligent about detecting metadata matches:
 - If the query mentions specific theological terms or phrases → filter by terms (e.g., "justification by faith", "divine sovereignty")
 - If the query mentions people, works, places → filter by named_entities (format: "Class/Entity")
 
-Example responses:
-
-For "What are some metaphors for sanctification?":
-{{
-    "query_type": "doctrinal",
-    "theological_concepts": ["sanctification", "spiritual growth", "transformation"],
-    "search_strategy": "Search for chunks about sanctification using vector similarity, then filter by discourse_elements containing Symbolic/Metaphor to find metaphorical language",
-    "recommended_filters": {{
-        "discourse_elements": ["Symbolic/Metaphor"],
-        "concepts": ["Sanctification", "Spiritual Growth"],
-        "topics": ["Sanctification/Spiritual Growth", "Spiritual Growth/Transformation"]
-    }},
-    "reasoning": "The query specifically asks for metaphors, so I'm prioritizing discourse_elements with Symbolic/Metaphor to find sources with metaphorical language about sanctification."
-}}
-
-For "What does Calvin say about predestination?":
-{{
-    "query_type": "historical",
-    "theological_concepts": ["predestination", "election", "divine sovereignty"],
-    "search_strategy": "Search for chunks about predestination using vector similarity, then filter by Calvin as author and topics related to predestination",
-    "recommended_filters": {{
-        "authors": ["John Calvin"],
-        "topics": ["Predestination/Divine Sovereignty", "Election/Predestination"],
-        "concepts": ["Divine Sovereignty", "Election"]
-    }},
-    "reasoning": "The query specifically asks about Calvin's views, so I'm filtering by Calvin as author and topics/concepts related to predestination."
-}}
-
-For "What are the logical arguments for the Trinity?":
-{{
-    "query_type": "doctrinal",
-    "theological_concepts": ["trinity", "three persons", "one God"],
-    "search_strategy": "Search for chunks about the Trinity using vector similarity, then filter by discourse_elements containing Logical/Claim to find argumentative content",
-    "recommended_filters": {{
-        "discourse_elements": ["Logical/Claim"],
-        "topics": ["Trinity/Doctrine", "God/Trinity"],
-        "concepts": ["God", "Trinity"]
-    }},
-    "reasoning": "The query asks for logical arguments, so I'm prioritizing discourse_elements with Logical/Claim to find sources with argumentative content about the Trinity."
-}}
-
-For "What passages from Augustine's Confessions talk about John 14:6?":
-{{
+Example response for "What passages from Augustine's Confessions talk about John 14:6?":
+{
     "query_type": "exegetical",
     "theological_concepts": ["Jesus Christ", "Incarnation", "Scripture"],
     "search_strategy": "Search for chunks about John 14:6 using vector similarity, then filter by Augustine as author and scripture_references containing John 14:6",
-    "recommended_filters": {{
+    "recommended_filters": {
         "authors": ["St. Augustine", "Augustine"],
         "scripture_references": ["John 14:6"],
         "topics": ["Jesus Christ/Mediator", "Incarnation/Word Made Flesh"],
         "concepts": ["Jesus Christ", "Scripture"]
-    }},
+    },
     "reasoning": "The query specifically asks about John 14:6 in Augustine's Confessions, so I'm filtering by scripture_references containing John 14:6 and by Augustine as the author to find relevant passages."
-}}
-
-Respond with only the JSON object, no other text.
-"""
+}"""
 
+def analyze_query(query: str) -> Dict[str, Any]:
+    """Analyze the query to determine search strategy and filters."""
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": analysis_prompt}],
-            temperature=0.3
-        )
-        
-        # Extract JSON from response
-        content = response.choices[0].message.content.strip()
-        # Remove any markdown formatting
-        if content.startswith("```json"):
-            content = content[7:]
-        if content.endswith("```"):
-            content = content[:-3]
-        
-        return json.loads(content)
+        content = _cached_query_analysis(query)
+        return orjson.loads(content) if ORJSON_AVAILABLE else json.loads(content)
     except Exception as e:
         print(f"Error analyzing query: {e}")
         return {
@@ -199,212 +637,385 @@ Respond with only the JSON object, no other text.
             "reasoning": "Error in analysis, using general search"
         }
 
-def search_with_filters(query: str, analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
-    """Search the dataset using hybrid approach: exact phrase matching + vector similarity + metadata filters."""
+@functools.lru_cache(maxsize=1024)
+def _cached_query_analysis(query: str) -> str:
+    """JSON text of the model's analysis for this query, cached in memory and on disk."""
+    # Keyed by the prompt as well, so editing it retires old analyses; failures raise
+    # instead of returning the fallback so neither cache remembers them
+    key = hashlib.sha256(f"{CHAT_MODEL}\0{ANALYSIS_SYSTEM_PROMPT}\0{query}".encode('utf-8')).hexdigest()
+    content = query_analysis_store.get(key)
+    if content is None:
+        response = client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=[
+                {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+                {"role": "user", "content": query}
+            ],
+            # JSON mode: the reply is a bare JSON object, never fenced or wrapped in prose
+            response_format={"type": "json_object"},
+            # Deterministic output, so a cached analysis is the one the model would give again
+            temperature=0
+        )
+        content = response.choices[0].message.content
+        
+        # Only valid JSON is cached
+        json.loads(content)
+        query_analysis_store.put(key, content)
+    return content
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first; equal scores keep their original order.
+    
+    Finds the k-th largest score with a linear-time partition and only sorts the k winners.
+    """
+    if scores.size <= k:
+        return np.argsort(-scores, kind='stable')
+    
+    kth_score = np.partition(scores, scores.size - k)[scores.size - k]
+    above = np.flatnonzero(scores > kth_score)
+    # Fill the remaining places with the earliest chunks tied at the cut-off
+    ties = np.flatnonzero(scores == kth_score)[:k - above.size]
+    selected = np.concatenate((above, ties))
+    return selected[np.argsort(-scores[selected], kind='stable')]
+
+class _SortedPostings:
+    """Posting lists for exactly matched values, kept sorted so prefix matches are a bisect away."""
+    
+    def __init__(self, index: Dict[str, List[int]]):
+        self.postings = {value: np.asarray(positions, dtype=np.int32) for value, positions in index.items()}
+        self.sorted_values = sorted(self.postings)
+    
+    def with_prefix(self, prefix: str) -> List[str]:
+        start = end = bisect.bisect_left(self.sorted_values, prefix)
+        while end < len(self.sorted_values) and self.sorted_values[end].startswith(prefix):
+            end += 1
+        return self.sorted_values[start:end]
+    
+    def discourse_matches(self, filter_lower: str) -> List[str]:
+        """Exact match or namespace match (e.g., "Symbolic" matches "Symbolic" and "Symbolic/Metaphor")."""
+        matches = [filter_lower] if filter_lower in self.postings else []
+        if '/' not in filter_lower:
+            matches += self.with_prefix(filter_lower + '/')
+        return matches
+
+class _ScripturePostings(_SortedPostings):
+    """Normalized scripture references, also grouped by chapter (the part before ':')."""
+    
+    def __init__(self, index: Dict[str, List[int]]):
+        super().__init__(index)
+        self.verses_by_chapter = {}
+        for ref in self.sorted_values:
+            if ':' in ref:
+                self.verses_by_chapter.setdefault(ref.split(':')[0], []).append(ref)
+    
+    def matches(self, filter_ref: str) -> List[str]:
+        """References matching exactly, by parent chapter of a verse filter, or as verses of a chapter filter."""
+        # If filter is a verse (has ':'), match exact verse or parent chapter
+        # (e.g., "John 10:1" matches "John 10" or "John 10:1-7")
+        if ':' in filter_ref:
+            return self.with_prefix(filter_ref.split(':')[0])
+        # If filter is a chapter (no ':'), match it exactly or any verse in that chapter
+        exact = [filter_ref] if filter_ref in self.postings else []
+        return exact + self.verses_by_chapter.get(filter_ref, [])
+
+class _SubstringPostings:
+    """Posting lists for one field's distinct lowercased values, searchable by substring.
+    
+    The values are joined with NUL separators so each filter is located with str.find
+    in C, jumping to the next value after every hit, instead of testing every distinct
+    value in Python.
+    """
+    
+    def __init__(self, index: Dict[str, List[int]]):
+        self.values = list(index)
+        self.positions = [np.asarray(index[value], dtype=np.int32) for value in self.values]
+        self.text = '\0'.join(self.values)
+        self.starts = []
+        offset = 0
+        for value in self.values:
+            self.starts.append(offset)
+            offset += len(value) + 1
+    
+    def containing(self, needles: List[str]) -> List[np.ndarray]:
+        """Posting lists of the values that contain at least one of the needles."""
+        found = set()
+        for needle in needles:
+            if not needle or '\0' in needle:
+                found.update(i for i, value in enumerate(self.values) if needle in value)
+                continue
+            pos = self.text.find(needle)
+            while pos != -1:
+                value_id = bisect.bisect_right(self.starts, pos) - 1
+                found.add(value_id)
+                if value_id + 1 == len(self.starts):
+                    break
+                pos = self.text.find(needle, self.starts[value_id + 1])
+        return [self.positions[i] for i in found]
+
+class MetadataFilterIndex:
+    """Inverted indexes from lowercased metadata values to dataset positions.
+    
+    Built once at load so a query only looks up the values its filters can match,
+    instead of walking every chunk's metadata. Positions repeat when a chunk holds
+    the same value more than once, because list fields score once per matching value.
+    """
+    
+    def __init__(self, chunks: List[Dict[str, Any]]):
+        self.size = len(chunks)
+        authors = {}
+        discourse_tags = {}       # chunks that carry a discourse_tags list
+        discourse_elements = {}   # older chunks: elements parsed from "[[Category/Element]] description"
+        scripture_references = {}
+        fields = {}
+        
+        for position, chunk in enumerate(chunks):
+            authors.setdefault(chunk.get("author", "").lower(), []).append(position)
+            
+            metadata = chunk.get("metadata", {})
+            for field, chunk_values in metadata.items():
+                if field == 'discourse_elements':
+                    tags = metadata.get('discourse_tags', [])
+                    if tags and isinstance(tags, list):
+                        for tag in set(tag.lower() for tag in tags):
+                            discourse_tags.setdefault(tag, []).append(position)
+                    elif isinstance(chunk_values, list):
+                        for chunk_val in chunk_values:
+                            element_match = _DISCOURSE_ELEMENT_RE.search(chunk_val) if isinstance(chunk_val, str) else None
+                            if element_match:
+                                discourse_elements.setdefault(element_match.group(1).lower(), []).append(position)
+                elif field == 'scripture_references':
+                    if isinstance(chunk_values, list):
+                        for chunk_val in chunk_values:
+                            reference = _WHITESPACE_RE.sub(' ', str(chunk_val).lower().strip())
+                            scripture_references.setdefault(reference, []).append(position)
+                elif isinstance(chunk_values, (list, str)):
+                    # A string field (like structure_path) behaves as a one-value list
+                    values = fields.setdefault(field, {})
+                    for chunk_val in (chunk_values if isinstance(chunk_values, list) else [chunk_values]):
+                        values.setdefault(str(chunk_val).lower(), []).append(position)
+        
+        self.authors = _SubstringPostings(authors)
+        self.discourse_tags = _SortedPostings(discourse_tags)
+        self.discourse_elements = _SortedPostings(discourse_elements)
+        self.scripture_references = _ScripturePostings(scripture_references)
+        self.fields = {field: _SubstringPostings(values) for field, values in fields.items()}
+    
+    def _bincount(self, hits: List[np.ndarray]) -> np.ndarray:
+        """Per-chunk number of hits across the given posting lists."""
+        if not hits:
+            return np.zeros(self.size, dtype=np.int64)
+        return np.bincount(np.concatenate(hits), minlength=self.size)
+    
+    def _count_values(self, postings: _SortedPostings, values) -> np.ndarray:
+        """Per-chunk number of the given (distinct) indexed values."""
+        return self._bincount([postings.postings[value] for value in values])
+    
+    def _count_containing(self, postings: Optional[_SubstringPostings], filters_lower: List[str]) -> np.ndarray:
+        """Per-chunk number of indexed values containing any of the filters."""
+        return self._bincount(postings.containing(filters_lower) if postings is not None else [])
+    
+    def score(self, recommended_filters: Dict[str, Any]) -> np.ndarray:
+        """Filter match score for every chunk: one point per matching filter type, or per matching list value."""
+        scores = np.zeros(self.size, dtype=np.int64)
+        for filter_type, filter_values in recommended_filters.items():
+            filters_lower = [filter_val.lower() for filter_val in filter_values]
+            
+            # Check author filter (top-level field)
+            if filter_type == 'authors':
+                scores += np.minimum(self._count_containing(self.authors, filters_lower), 1)
+                continue
+            
+            # Get the actual metadata field name
+            metadata_field = FILTER_METADATA_FIELDS.get(filter_type, filter_type)
+            if not metadata_field:
+                continue
+            
+            if metadata_field == 'discourse_elements':
+                # discourse_tags chunks score once; older chunks score per matching element
+                tags = {tag for f in filters_lower for tag in self.discourse_tags.discourse_matches(f)}
+                elements = {element for f in filters_lower for element in self.discourse_elements.discourse_matches(f)}
+                scores += np.minimum(self._count_values(self.discourse_tags, tags), 1)
+                scores += self._count_values(self.discourse_elements, elements)
+            elif metadata_field == 'scripture_references':
+                # Normalize scripture references (remove extra spaces, handle variations)
+                filter_refs = [_WHITESPACE_RE.sub(' ', f.strip()) for f in filters_lower]
+                refs = {ref for f in filter_refs for ref in self.scripture_references.matches(f)}
+                scores += np.minimum(self._count_values(self.scripture_references, refs), 1)
+            else:
+                scores += self._count_containing(self.fields.get(metadata_field), filters_lower)
+        return scores
+
+def count_key_phrase_matches(key_phrases: List[str]) -> np.ndarray:
+    """Number of distinct key phrases contained in each chunk's lowercased text.
     
-    # Get query embedding
-    query_embedding = get_query_embedding(query)
-    if not query_embedding:
+    Single words are tested against every chunk. A multi-word phrase can only occur in
+    chunks that contain each of its words, so it is only tested against those.
+    """
+    chunk_count = len(chunk_texts_lower)
+    counts = np.zeros(chunk_count, dtype=np.int64)
+    word_hits = {}
+    
+    # Fewest words first, so the word hits are known before the phrases built from them
+    # (extract_key_phrases already yields that order, which keeps this sort linear)
+    for phrase in sorted(key_phrases, key=lambda phrase: phrase.count(' ')):
+        words = phrase.split(' ')
+        if len(words) == 1 or not all(word in word_hits for word in words):
+            hits = np.fromiter((phrase in text for text in chunk_texts_lower), dtype=bool, count=chunk_count)
+        else:
+            candidates = np.flatnonzero(np.logical_and.reduce([word_hits[word] for word in words])).tolist()
+            hits = np.zeros(chunk_count, dtype=bool)
+            hits[candidates] = [phrase in chunk_texts_lower[index] for index in candidates]
+        if len(words) == 1:
+            word_hits[phrase] = hits
+        counts += hits
+    return counts
+
+def score_exact_matches(query: str) -> np.ndarray:
+    """Exact phrase matching: one count per key phrase of the query found in each chunk's text."""
+    return count_key_phrase_matches(extract_key_phrases(query.lower()))
+
+def search_with_filters(query: str, analysis: Dict[str, Any], query_vector: Optional[np.ndarray],
+                        include_embedding: bool = False,
+                        exact_match_scores: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """Search the dataset using hybrid approach: exact phrase matching + vector similarity + metadata filters.
+    
+    Returns copies of the top chunks carrying only RESULT_CHUNK_FIELDS plus their scores
+    (and the normalized embedding when include_embedding is set, for debugging).
+    exact_match_scores may be passed in from score_exact_matches(query), which does not
+    need the analysis and can run while it is pending.
+    """
+    
+    if query_vector is None:
         return []
     
-    # Extract key phrases from query for exact matching
-    query_lower = query.lower()
-    key_phrases = extract_key_phrases(query_lower)
+    chunk_count = len(dataset)
     
-    # Search results
-    search_results = []
     recommended_filters = analysis.get("recommended_filters", {})
     
     # Debug logging for filter extraction
+    if DEBUG_SEARCH:
+        if recommended_filters:
+            print(f"DEBUG: Recommended filters from query analysis: {json.dumps(recommended_filters, indent=2)}")
+            if 'scripture_references' in recommended_filters:
+                print(f"DEBUG: Scripture references filter: {recommended_filters['scripture_references']}")
+        else:
+            print("DEBUG: No recommended filters found in query analysis")
+    
+    # 1. Exact phrase matching: one count per key phrase found in the chunk text
+    if exact_match_scores is None:
+        exact_match_scores = score_exact_matches(query)
+    
+    # 2. Metadata filtering
     if recommended_filters:
-        print(f"DEBUG: Recommended filters from query analysis: {json.dumps(recommended_filters, indent=2)}")
-        if 'scripture_references' in recommended_filters:
-            print(f"DEBUG: Scripture references filter: {recommended_filters['scripture_references']}")
+        filter_match_scores = metadata_filter_index.score(recommended_filters)
     else:
-        print("DEBUG: No recommended filters found in query analysis")
+        # If no specific filters, give all chunks a base filter score
+        filter_match_scores = np.full(chunk_count, 0.5)
     
-    for chunk in dataset:
-        chunk_text = chunk.get("text", "").lower()
-        chunk_metadata = chunk.get("metadata", {})
-        
-        # Calculate scores
-        exact_match_score = 0
-        vector_similarity_score = 0
-        filter_match_score = 0
-        
-        # 1. Exact phrase matching
-        for phrase in key_phrases:
-            if phrase in chunk_text:
-                exact_match_score += 1
-        
-        # 2. Vector similarity
-        if chunk.get("embedding"):
-            vector_similarity_score = cosine_similarity_score(query_embedding, chunk["embedding"])
-        
-        # 3. Metadata filtering
+    # 3. Vector similarity: cosine is a dot product because both sides are unit length
+    scored = None  # None means every chunk got a vector score
+    if embedding_matrix is None or query_vector.shape[0] != embedding_matrix.shape[1]:
+        vector_scores = np.zeros(chunk_count)
+    elif ann_index is not None:
+        # Score the HNSW shortlist plus every chunk already matched by phrase or filter. Any other
+        # chunk differs from shortlisted ones only by a lower vector score, so it cannot outrank them
+        _, neighbours = ann_index.search(query_vector.reshape(1, -1), ANN_CANDIDATES)
+        matched = exact_match_scores > 0
         if recommended_filters:
-            for filter_type, filter_values in recommended_filters.items():
-                # Map filter type names to metadata field names
-                metadata_field_map = {
-                    'function': 'discourse_elements',  # Legacy name compatibility
-                    'authors': None,  # Handled at top level, not in metadata
-                    'topics': 'topics',
-                    'concepts': 'concepts',
-                    'terms': 'terms',
-                    'scripture_references': 'scripture_references',
-                    'structure_paths': 'structure_path',
-                    'discourse_elements': 'discourse_elements',
-                    'named_entities': 'named_entities'
-                }
-                
-                # Check author filter (top-level field)
-                if filter_type == 'authors':
-                    chunk_author = chunk.get("author", "")
-                    for filter_val in filter_values:
-                        if filter_val.lower() in chunk_author.lower():
-                            filter_match_score += 1
-                            break
-                else:
-                    # Get the actual metadata field name
-                    metadata_field = metadata_field_map.get(filter_type, filter_type)
-                    
-                    if metadata_field and metadata_field in chunk_metadata:
-                        chunk_values = chunk_metadata[metadata_field]
-                        
-                        # Handle discourse_elements specially - use discourse_tags if available (more efficient)
-                        if metadata_field == 'discourse_elements':
-                            # First try discourse_tags (direct tag matching - faster and more reliable)
-                            discourse_tags = chunk_metadata.get('discourse_tags', [])
-                            if discourse_tags and isinstance(discourse_tags, list):
-                                for filter_val in filter_values:
-                                    filter_lower = filter_val.lower()
-                                    # Exact match or namespace match (e.g., "Symbolic" matches "Symbolic" and "Symbolic/Metaphor")
-                                    for tag in discourse_tags:
-                                        tag_lower = tag.lower()
-                                        if tag_lower == filter_lower or (not '/' in filter_lower and tag_lower.startswith(filter_lower + '/')):
-                                            filter_match_score += 1
-                                            break
-                                    if filter_match_score > 0:  # Already matched, no need to continue
-                                        break
-                            # Fallback: extract from discourse_elements strings (for backward compatibility)
-                            else:
-                                if isinstance(chunk_values, list):
-                                    for chunk_val in chunk_values:
-                                        # Extract category/element from format "[[Category/Element]] description"
-                                        element_match = re.search(r'\[\[([^\]]+)\]\]', chunk_val)
-                                        if element_match:
-                                            element = element_match.group(1)
-                                            for filter_val in filter_values:
-                                                filter_lower = filter_val.lower()
-                                                element_lower = element.lower()
-                                                if filter_lower == element_lower or (not '/' in filter_lower and element_lower.startswith(filter_lower + '/')):
-                                                    filter_match_score += 1
-                                                    break
-                        # Handle scripture_references with exact or normalized matching
-                        elif metadata_field == 'scripture_references':
-                            if isinstance(chunk_values, list):
-                                for filter_val in filter_values:
-                                    filter_lower = filter_val.lower().strip()
-                                    # Normalize scripture references (remove extra spaces, handle variations)
-                                    filter_normalized = re.sub(r'\s+', ' ', filter_lower)
-                                    matched = False
-                                    for chunk_val in chunk_values:
-                                        chunk_val_str = str(chunk_val).lower().strip()
-                                        chunk_normalized = re.sub(r'\s+', ' ', chunk_val_str)
-                                        # Debug logging for scripture references
-                                        if 'john 14:6' in filter_normalized or 'john 14:6' in chunk_normalized:
-                                            print(f"DEBUG scripture_references: Filter='{filter_normalized}', Chunk='{chunk_normalized}', Match={filter_normalized == chunk_normalized}")
-                                        # Exact match (preferred)
-                                        if filter_normalized == chunk_normalized:
-                                            filter_match_score += 1
-                                            matched = True
-                                            if 'john 14:6' in filter_normalized:
-                                                print(f"DEBUG: Exact match found for {filter_normalized}")
-                                            break
-                                        # If filter is a verse (has ':'), match exact verse or parent chapter
-                                        elif ':' in filter_normalized:
-                                            filter_chapter = filter_normalized.split(':')[0]
-                                            # Match if chunk starts with same chapter (e.g., "John 10:1" matches "John 10" or "John 10:1-7")
-                                            if chunk_normalized.startswith(filter_chapter):
-                                                filter_match_score += 1
-                                                matched = True
-                                                if 'john 14:6' in filter_normalized:
-                                                    print(f"DEBUG: Chapter match found - Filter chapter: {filter_chapter}, Chunk: {chunk_normalized}")
-                                                break
-                                        # If filter is a chapter (no ':'), match any verse in that chapter
-                                        elif ':' in chunk_normalized:
-                                            chunk_chapter = chunk_normalized.split(':')[0]
-                                            if chunk_chapter == filter_normalized:
-                                                filter_match_score += 1
-                                                matched = True
-                                                if 'john 14' in filter_normalized:
-                                                    print(f"DEBUG: Chapter-to-verse match found - Filter: {filter_normalized}, Chunk: {chunk_normalized}")
-                                                break
-                                    if matched:  # Already matched, no need to check other filter values
-                                        break
-                        elif isinstance(chunk_values, list):
-                            # Regular list matching
-                            for chunk_val in chunk_values:
-                                for filter_val in filter_values:
-                                    if filter_val.lower() in str(chunk_val).lower():
-                                        filter_match_score += 1
-                                        break
-                        elif isinstance(chunk_values, str):
-                            # Handle string fields like structure_path
-                            for filter_val in filter_values:
-                                if filter_val.lower() in chunk_values.lower():
-                                    filter_match_score += 1
-                                    break
-        else:
-            # If no specific filters, give all chunks a base filter score
-            filter_match_score = 0.5
-        
-        # Calculate combined score
-        # Weight exact matches heavily, then vector similarity, then filters (increased from 0.5 to 2.0)
-        # This ensures chunks with perfect filter matches rank higher
-        combined_score = (exact_match_score * 2.0) + (vector_similarity_score * 1.5) + (filter_match_score * 2.0)
-        
-        # Boost chunks that match any filters (prioritize filter matches)
-        if filter_match_score > 0:
-            combined_score += 1.0  # Additional boost for filter matches
-        
-        # Only include chunks with some relevance
-        if combined_score > 0.1 or exact_match_score > 0:
-            chunk["similarity_score"] = combined_score
-            chunk["exact_match_score"] = exact_match_score
-            chunk["vector_score"] = vector_similarity_score
-            chunk["filter_score"] = filter_match_score
-            search_results.append(chunk)
+            matched |= filter_match_scores > 0
+        rows = np.union1d(neighbours[0][neighbours[0] >= 0], np.flatnonzero(matched))
+        vector_scores = np.zeros(chunk_count)
+        vector_scores[rows] = embedding_matrix[rows] @ query_vector
+        scored = np.zeros(chunk_count, dtype=bool)
+        scored[rows] = True
+    else:
+        # One matrix-vector product over the whole corpus
+        vector_scores = (embedding_matrix @ query_vector).astype(np.float64)
+    
+    # Calculate combined score
+    # Weight exact matches heavily, then vector similarity, then filters (increased from 0.5 to 2.0)
+    # This ensures chunks with perfect filter matches rank higher
+    combined_scores = (exact_match_scores * 2.0) + (vector_scores * 1.5) + (filter_match_scores * 2.0)
+    
+    # Boost chunks that match any filters (prioritize filter matches)
+    combined_scores += filter_match_scores > 0
     
-    # Sort by combined score
-    search_results.sort(key=lambda x: x.get("similarity_score", 0), reverse=True)
+    # Only include chunks with some relevance
+    relevant = (combined_scores > 0.1) | (exact_match_scores > 0)
+    if scored is not None:
+        relevant &= scored
+    candidates = np.flatnonzero(relevant)
     
-    # Return top 15 results (increased from 10 to catch more relevant material)
-    return search_results[:15]
+    # Return top 15 results by combined score (increased from 10 to catch more relevant material)
+    top_indices = candidates[top_k_indices(combined_scores[candidates], 15)]
+    
+    # Build lightweight result copies; the shared dataset dicts are never mutated
+    search_results = []
+    for index in top_indices.tolist():
+        chunk = dataset[index]
+        result = {field: chunk[field] for field in RESULT_CHUNK_FIELDS if field in chunk}
+        result["similarity_score"] = float(combined_scores[index])
+        result["exact_match_score"] = int(exact_match_scores[index])
+        result["vector_score"] = float(vector_scores[index])
+        result["filter_score"] = int(filter_match_scores[index]) if recommended_filters else 0.5
+        if include_embedding:
+            result["embedding"] = np.asarray(embedding_matrix[index], dtype=np.float32).tolist()
+        search_results.append(result)
+    
+    return search_results
 
 def extract_key_phrases(query: str) -> List[str]:
-    """Extract key phrases from the query for exact matching."""
+    """Extract key phrases from the query for exact matching, single words first."""
     # Remove common words and extract meaningful phrases
-    common_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'can', 'what', 'how', 'why', 'when', 'where', 'who', 'which', 'that', 'this', 'these', 'those'}
-    
-    # Split into words and filter out common words
-    words = query.split()
-    meaningful_words = [word.strip('.,!?;:"()[]{}') for word in words if word.lower() not in common_words]
-    
-    # Create phrases of 1-3 words
-    phrases = []
-    for i in range(len(meaningful_words)):
-        # Single words
-        phrases.append(meaningful_words[i])
-        # Two-word phrases
-        if i < len(meaningful_words) - 1:
-            phrases.append(f"{meaningful_words[i]} {meaningful_words[i+1]}")
-        # Three-word phrases
-        if i < len(meaningful_words) - 2:
-            phrases.append(f"{meaningful_words[i]} {meaningful_words[i+1]} {meaningful_words[i+2]}")
-    
-    # Remove duplicates and return
-    return list(set(phrases))
+    # Split into words with edge punctuation trimmed (one regex pass), then filter out common words
+    meaningful_words = [word for word in _QUERY_WORD_RE.findall(query) if word.lower() not in _COMMON_WORDS]
+    
+    # Create phrases of 1-3 words, deduplicated in query order
+    return list(dict.fromkeys(itertools.chain(
+        meaningful_words,
+        (' '.join(pair) for pair in zip(meaningful_words, meaningful_words[1:])),
+        (' '.join(triple) for triple in zip(meaningful_words, meaningful_words[1:], meaningful_words[2:]))
+    )))
+
+# Static instructions for the research summary; the query, analysis and chunks follow
+# in the user message
+SUMMARY_SYSTEM_PROMPT = """You are a research assistant. Based on the query analysis and retrieved chunks, provide a comprehensive research summary.
+
+Instructions:
+1. Write a comprehensive summary that directly addresses the query
+2. Use numbered citations [1], [2], etc. for each source
+3. Synthesize information from multiple sources when relevant
+4. Be specific and cite particular claims or arguments - use direct quotes and specific details from the sources
+5. Pay special attention to exact phrases and key terms found in the sources
+6. If information is limited, acknowledge this and work with what's available
+7. Maintain accuracy and nuance appropriate to the domain
+8. CRITICAL: Don't paraphrase key concepts - use the exact language from the sources when it's more precise
+9. IMPORTANT: Fully utilize the content from each retrieved chunk - don't just mention sources in passing, but engage deeply with their arguments and examples
+
+Format your response as JSON:
+{
+    "summary": "Your comprehensive research summary with numbered citations",
+    "sources_used": [
+        {
+            "number": 1,
+            "chunk_id": "ORTHODOX_CHESTE_0",
+            "source": "Source Name",
+            "author": "Author Name",
+            "location": "Structure Path",
+            "relevance": "Brief explanation of why this source was relevant"
+        }
+    ],
+    "reasoning_transparency": "Explanation of the search strategy and filter choices made"
+}
+
+IMPORTANT: Include the "chunk_id" field exactly as shown in [Source X] for each source you reference.
+
+CRITICAL CITATION RULES:
+1. The citation numbers in your summary MUST correspond exactly to the source numbers in your sources_used array
+2. If you have 3 sources numbered 1, 2, 3, you can ONLY use citations [1], [2], [3] in your summary
+3. Do NOT skip numbers or use numbers that don't exist in your sources_used array
+4. Do NOT use citations like [9], [10], [11], [13] unless those exact numbers exist in your sources_used array
+5. Count your sources_used array first, then use only those numbers in your citations"""
 
 def generate_research_summary(query: str, analysis: Dict[str, Any], chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
     """Generate a research summary with citations."""
@@ -437,10 +1048,7 @@ Similarity Score: {chunk.get("similarity_score", 0):.3f}
 ---
 """
     
-    synthesis_prompt = f"""
-You are a research assistant. Based on the query analysis and retrieved chunks, provide a comprehensive research summary.
-
-Query: "{query}"
+    synthesis_prompt = f"""Query: "{query}"
 
 Query Analysis:
 - Type: {analysis.get('query_type', 'general')}
@@ -449,70 +1057,29 @@ Query Analysis:
 - Reasoning: {analysis.get('reasoning', '')}
 
 Retrieved Chunks:
-{chunks_text}
-
-Instructions:
-1. Write a comprehensive summary that directly addresses the query
-2. Use numbered citations [1], [2], etc. for each source
-3. Synthesize information from multiple sources when relevant
-4. Be specific and cite particular claims or arguments - use direct quotes and specific details from the sources
-5. Pay special attention to exact phrases and key terms found in the sources
-6. If information is limited, acknowledge this and work with what's available
-7. Maintain accuracy and nuance appropriate to the domain
-8. CRITICAL: Don't paraphrase key concepts - use the exact language from the sources when it's more precise
-9. IMPORTANT: Fully utilize the content from each retrieved chunk - don't just mention sources in passing, but engage deeply with their arguments and examples
-
-Format your response as JSON:
-{{
-    "summary": "Your comprehensive research summary with numbered citations",
-    "sources_used": [
-        {{
-            "number": 1,
-            "chunk_id": "ORTHODOX_CHESTE_0",
-            "source": "Source Name",
-            "author": "Author Name", 
-            "location": "Structure Path",
-            "relevance": "Brief explanation of why this source was relevant"
-        }}
-    ],
-    "reasoning_transparency": "Explanation of the search strategy and filter choices made"
-}}
-
-IMPORTANT: Include the "chunk_id" field exactly as shown in [Source X] for each source you reference.
-
-CRITICAL CITATION RULES:
-1. The citation numbers in your summary MUST correspond exactly to the source numbers in your sources_used array
-2. If you have 3 sources numbered 1, 2, 3, you can ONLY use citations [1], [2], [3] in your summary
-3. Do NOT skip numbers or use numbers that don't exist in your sources_used array
-4. Do NOT use citations like [9], [10], [11], [13] unless those exact numbers exist in your sources_used array
-5. Count your sources_used array first, then use only those numbers in your citations
-
-Respond with only the JSON object, no other text.
-"""
+{chunks_text}"""
 
     try:
         response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": synthesis_prompt}],
+            model=CHAT_MODEL,
+            messages=[
+                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                {"role": "user", "content": synthesis_prompt}
+            ],
+            response_format={"type": "json_object"},
             temperature=0.3
         )
         
-        content = response.choices[0].message.content.strip()
-        if content.startswith("```json"):
-            content = content[7:]
-        if content.endswith("```"):
-            content = content[:-3]
+        content = response.choices[0].message.content
         
-        result = json.loads(content)
+        result = orjson.loads(content) if ORJSON_AVAILABLE else json.loads(content)
         
         # Validate and fix citation mismatches
         sources_used = result.get("sources_used", [])
         summary = result.get("summary", "")
         
         # FIRST: Find which sources are actually cited in the summary
-        import re
-        citation_pattern = re.compile(r'\[(\d+)\]')
-        citations_in_summary = set(int(num) for num in citation_pattern.findall(summary) if num.isdigit())
+        citations_in_summary = set(int(num) for num in _CITATION_RE.findall(summary))
         
         # Keep all sources but will renumber them sequentially
         # Sort by original number to preserve order
@@ -580,27 +1147,17 @@ Respond with only the JSON object, no other text.
                 # Log warning for debugging
                 print(f"⚠️  Warning: Could not map source {source_num} (ID: {chunk_id}) to chunk index. Source: {source.get('source')}, Author: {source.get('author')}, Location: {source.get('location')}")
         
-        # Update all citations in summary to match new sequential numbering
-        citation_matches = list(citation_pattern.finditer(summary))
-        fixed_summary = summary
-        
-        # Replace from end to start to preserve string positions
-        for match in reversed(citation_matches):
+        # Update all citations in summary to match new sequential numbering, in one pass
+        def renumber_citation(match):
             old_citation_num = int(match.group(1))
             if old_citation_num in old_to_new_mapping:
-                new_citation_num = old_to_new_mapping[old_citation_num]
-                start_pos = match.start()
-                end_pos = match.end()
-                fixed_summary = fixed_summary[:start_pos] + f'[{new_citation_num}]' + fixed_summary[end_pos:]
-            else:
-                # Citation doesn't map to any source - remove it
-                start_pos = match.start()
-                end_pos = match.end()
-                fixed_summary = fixed_summary[:start_pos] + fixed_summary[end_pos:]
-                print(f"⚠️  Removed unmapped citation [{old_citation_num}]")
+                return f'[{old_to_new_mapping[old_citation_num]}]'
+            # Citation doesn't map to any source - remove it
+            print(f"⚠️  Removed unmapped citation [{old_citation_num}]")
+            return ''
         
         # Update the summary with fixed citations
-        result["summary"] = fixed_summary
+        result["summary"] = _CITATION_RE.sub(renumber_citation, summary)
         
         # Log the renumbering
         if old_to_new_mapping and len(old_to_new_mapping) > 0:
@@ -615,6 +1172,98 @@ Respond with only the JSON object, no other text.
             "reasoning_transparency": "Error in synthesis process"
         }
 
+class ResponseCache:
+    """Serialized /search responses keyed by query text.
+    
+    get() matches the whitespace-normalized query exactly. When semantic_threshold is
+    set, get_similar() also reuses the response of a cached query whose embedding has
+    cosine similarity above it, so paraphrases skip analysis, search and synthesis.
+    The least recently used entry is evicted once the cache is full.
+    """
+    
+    def __init__(self, capacity: int = 512, semantic_threshold: Optional[float] = None):
+        self.capacity = capacity
+        self.semantic_threshold = semantic_threshold
+        self._slots = {}  # query key -> slot
+        self._keys = []
+        self._bodies = []
+        self._vectors = None  # (capacity, D) float32, allocated on first store when semantic
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._clock = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(query: str) -> str:
+        return ' '.join(query.split())
+    
+    def _touch(self, slot: int):
+        self._clock += 1
+        self._last_used[slot] = self._clock
+    
+    def get(self, query: str) -> Optional[bytes]:
+        with self._lock:
+            slot = self._slots.get(self.key(query))
+            if slot is None:
+                return None
+            self._touch(slot)
+            return self._bodies[slot]
+    
+    def get_similar(self, query_vector: np.ndarray) -> Optional[bytes]:
+        if self.semantic_threshold is None:
+            return None
+        with self._lock:
+            if not self._bodies or self._vectors is None or query_vector.shape[0] != self._vectors.shape[1]:
+                return None
+            similarities = self._vectors[:len(self._bodies)] @ query_vector
+            best = int(np.argmax(similarities))
+            if similarities[best] <= self.semantic_threshold:
+                return None
+            self._touch(best)
+            return self._bodies[best]
+    
+    def store(self, query: str, query_vector: Optional[np.ndarray], body: bytes):
+        key = self.key(query)
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is not None:
+                self._bodies[slot] = body
+            elif len(self._bodies) < self.capacity:
+                slot = len(self._bodies)
+                self._keys.append(key)
+                self._bodies.append(body)
+            else:
+                slot = int(np.argmin(self._last_used))
+                del self._slots[self._keys[slot]]
+                self._keys[slot] = key
+                self._bodies[slot] = body
+            self._slots[key] = slot
+            
+            if self.semantic_threshold is not None:
+                if self._vectors is None and query_vector is not None:
+                    self._vectors = np.zeros((self.capacity, query_vector.shape[0]), dtype=np.float32)
+                if self._vectors is not None:
+                    # A zero row never passes the threshold, so unembedded entries only match exactly
+                    if query_vector is not None and query_vector.shape[0] == self._vectors.shape[1]:
+                        self._vectors[slot] = query_vector
+                    else:
+                        self._vectors[slot] = 0
+            self._touch(slot)
+
+response_cache = ResponseCache(
+    semantic_threshold=SEMANTIC_RESPONSE_CACHE_THRESHOLD if SEMANTIC_RESPONSE_CACHE else None
+)
+
+# Runs per-request work (query analysis) concurrently with the request thread
+request_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="search")
+
+def json_response(payload: Dict[str, Any], status: int = 200) -> Response:
+    """JSON response encoded with orjson when available (several times faster than jsonify on /search payloads)."""
+    if ORJSON_AVAILABLE:
+        return Response(orjson.dumps(payload), status=status, mimetype='application/json')
+    response = jsonify(payload)
+    response.status_code = status
+    return response
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -622,33 +1271,64 @@ def index():
 @app.route('/search', methods=['POST'])
 def search():
     try:
-        data = request.get_json()
+        body = request.get_data()
+        data = orjson.loads(body) if ORJSON_AVAILABLE else json.loads(body)
         query = data.get('query', '').strip()
         
         if not query:
-            return jsonify({"error": "Query is required"}), 400
+            return json_response({"error": "Query is required"}, 400)
         
         if not dataset:
-            return jsonify({"error": "Dataset not loaded"}), 500
+            return json_response({"error": "Dataset not loaded"}, 500)
+        
+        # ?include_embedding=1 adds each chunk's embedding to the response (debug only, never cached)
+        include_embedding = request.args.get('include_embedding') == '1'
+        
+        # Pass "no_cache": true to force a fresh search and summary
+        use_cache = not data.get('no_cache', False) and not include_embedding
+        
+        # Repeats of a cached query are answered before any API call
+        if use_cache:
+            cached_body = response_cache.get(query)
+            if cached_body is not None:
+                return Response(cached_body, mimetype='application/json')
+        
+        # Step 1: Analyze the query in the background while embedding it here;
+        # both only need the query text, so the embedding latency overlaps the LLM call
+        analysis_future = request_executor.submit(analyze_query, query)
+        query_vector = get_query_embedding(query)
+        
+        # Step 2: With SEMANTIC_RESPONSE_CACHE=1, serve near-duplicate queries from the cache
+        # (the pending analysis is discarded)
+        if use_cache and query_vector is not None:
+            cached_body = response_cache.get_similar(query_vector)
+            if cached_body is not None:
+                analysis_future.cancel()
+                return Response(cached_body, mimetype='application/json')
         
-        # Step 1: Analyze the query
-        analysis = analyze_query(query)
+        # Phrase matching only needs the query, so it runs while the analysis is still pending
+        exact_match_scores = score_exact_matches(query) if query_vector is not None else None
+        analysis = analysis_future.result()
         
-        # Step 2: Search with filters
-        chunks = search_with_filters(query, analysis)
+        # Step 3: Search with filters
+        chunks = search_with_filters(query, analysis, query_vector, include_embedding, exact_match_scores)
         
-        # Step 3: Generate research summary
+        # Step 4: Generate research summary
         result = generate_research_summary(query, analysis, chunks)
         
         # Add the analysis and chunks to the result
         result["query_analysis"] = analysis
         result["chunks"] = chunks
         
-        return jsonify(result)
+        response = json_response(result)
+        # Only cache answers that actually cite sources (failed syntheses return none)
+        if use_cache and result.get("sources_used"):
+            response_cache.store(query, query_vector, response.get_data())
+        return response
         
     except Exception as e:
         print(f"Error in search: {e}")
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}, 500)
 
 if __name__ == '__main__':
     # Load dataset on startup
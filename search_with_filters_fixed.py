@@ -1,126 +1,239 @@
-def search_with_filters(query, query_embedding, analysis, selected_sources=None):
-    """Perform intelligent two-stage search: ChromaDB top 100 → re-rank with metadata → top 15"""
-    try:
-        if not query_embedding:
-            return []
+import os
+import time
+
+import numpy as np
+
+try:
+    import simsimd  # SIMD dot-product kernels for the fallback similarity scan
+    SIMSIMD_AVAILABLE = True
+except ImportError:
+    simsimd = None
+    SIMSIMD_AVAILABLE = False
+
+try:
+    import hnswlib  # Approximate nearest-neighbour index for large fallback corpora
+    HNSWLIB_AVAILABLE = True
+except ImportError:
+    hnswlib = None
+    HNSWLIB_AVAILABLE = False
+
+# Set EMBEDDING_QUANTIZATION=int8 to scan fallback candidates over int8 codes (needs simsimd);
+# the top 100 are always rescored against the float32 embeddings
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", "").lower()
+# int8 candidates rescored exactly per top-100 slot
+INT8_OVERSAMPLE = 2
+# Corpora with at least this many chunks are searched through an HNSW index when hnswlib is
+# installed; below it the exact scan is fast enough and the index build is not worth it
+HNSW_MIN_CHUNKS = int(os.getenv("HNSW_MIN_CHUNKS", "50000"))
+# HNSW search breadth (ef); higher is slower with better recall
+HNSW_EF_SEARCH = 200
+
+# Normalized embedding matrix for the fallback scan; built on first use and rebuilt
+# whenever load_dataset replaces the dataset list
+_fallback_index = None
+
+def quantize_rows(matrix):
+    """Per-row symmetric int8 quantization: codes = round(row / (max|row| / 127))"""
+    scales = np.abs(matrix).max(axis=1, keepdims=True) / 127.0
+    scales[scales == 0] = 1.0
+    return np.ascontiguousarray(np.rint(matrix / scales), dtype=np.int8)
+
+def get_fallback_index():
+    """Return (chunks with embeddings, their L2-normalized float32 embedding matrix, per-row source codes, source id -> code,
+    int8 codes of the matrix or None, inverse L2 norms of the codes or None, HNSW index over the matrix or None)"""
+    global _fallback_index
+    if _fallback_index is None or _fallback_index[0] is not dataset:
+        chunks = [chunk for chunk in dataset if chunk.get('embedding')]
+        matrix = np.array([chunk['embedding'] for chunk in chunks], dtype=np.float32).reshape(len(chunks), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
         
-        start_time = time.time()
+        source_code_by_id = {}
+        source_codes = np.empty(len(chunks), dtype=np.int32)
+        for i, chunk in enumerate(chunks):
+            source_key = f"{chunk.get('source', 'Unknown')}_{chunk.get('author', 'Unknown')}"
+            source_id = source_key.lower().replace(' ', '_').replace('.', '').replace('/', '_')
+            source_codes[i] = source_code_by_id.setdefault(source_id, len(source_code_by_id))
         
-        # STAGE 1: ChromaDB vector search - get top 100 by similarity
-        if chroma_collection:
-            # Use ChromaDB for fast vector search
-            stage1_start = time.time()
-            
-            # Build where clause for source filtering if needed
-            where_clause = None
-            if selected_sources and len(selected_sources) > 0:
-                # ChromaDB where clause: {"source": {"$in": [...]}}
-                # Need to map source IDs back to source names
-                source_names = []
-                for source_info in available_sources:
-                    if source_info['id'] in selected_sources:
-                        source_names.append(source_info['name'])
-                if source_names:
-                    where_clause = {"source": {"$in": source_names}}
-            
-            # Query ChromaDB for top 100 results
-            results = chroma_collection.query(
-                query_embeddings=[query_embedding],
-                n_results=100,  # Get top 100 for re-ranking
-                where=where_clause
-            )
-            
-            stage1_time = time.time() - stage1_start
-            print(f"[TIMING] Stage 1 (ChromaDB top 100): {stage1_time:.3f}s")
-            
-            # Map ChromaDB results back to full chunk objects
-            top_100_chunks = []
-            if results['ids'] and len(results['ids'][0]) > 0:
-                # Create mapping from chunk ID to full chunk data
-                chunk_map = {chunk.get('id'): chunk for chunk in dataset}
-                
-                # Get distances (ChromaDB returns distances, convert to similarities)
-                distances = results['distances'][0] if results.get('distances') else []
-                
-                for idx, chunk_id in enumerate(results['ids'][0]):
-                    if chunk_id in chunk_map:
-                        chunk = chunk_map[chunk_id].copy()
-                        # Convert distance to similarity (ChromaDB uses cosine distance: 1 - similarity)
-                        distance = distances[idx] if idx < len(distances) else 1.0
-                        similarity = 1.0 - distance  # Convert distance to similarity
-                        chunk['similarity_score'] = float(similarity)
-                        top_100_chunks.append(chunk)
-        else:
-            # Fallback: use old method if ChromaDB not available
-            print("[WARNING] ChromaDB not available, using slower fallback method")
-            stage1_start = time.time()
-            
-            # Filter dataset by selected sources
-            filtered_dataset = dataset
-            if selected_sources and len(selected_sources) > 0:
-                filtered_dataset = []
-                for chunk in dataset:
-                    source_key = f"{chunk.get('source', 'Unknown')}_{chunk.get('author', 'Unknown')}"
-                    source_id = source_key.lower().replace(' ', '_').replace('.', '').replace('/', '_')
-                    if source_id in selected_sources:
-                        filtered_dataset.append(chunk)
-            
-            if not filtered_dataset:
-                return []
-            
-            # Calculate similarities
-            query_embedding_array = np.array([query_embedding])
-            chunk_embeddings = []
-            valid_chunks = []
-            
-            for chunk in filtered_dataset:
-                if 'embedding' in chunk and chunk['embedding']:
-                    chunk_embeddings.append(chunk['embedding'])
-                    valid_chunks.append(chunk)
-            
-            if not chunk_embeddings:
-                return []
-            
-            embeddings_array = np.array(chunk_embeddings)
-            similarities = cosine_similarity(query_embedding_array, embeddings_array)[0]
-            
-            # Get top 100 by similarity
-            scored_pairs = [(valid_chunks[i], similarities[i]) for i in range(len(valid_chunks))]
-            scored_pairs.sort(key=lambda x: x[1], reverse=True)
-            top_100_chunks = [chunk.copy() for chunk, score in scored_pairs[:100]]
-            for i, chunk in enumerate(top_100_chunks):
-                chunk['similarity_score'] = float(scored_pairs[i][1])
-            
-            stage1_time = time.time() - stage1_start
-            print(f"[TIMING] Stage 1 (Fallback top 100): {stage1_time:.3f}s")
+        codes = code_inv_norms = None
+        if EMBEDDING_QUANTIZATION == 'int8':
+            if SIMSIMD_AVAILABLE:
+                codes = quantize_rows(matrix)
+                code_norms = np.linalg.norm(codes.astype(np.float32), axis=1)
+                code_norms[code_norms == 0] = 1.0
+                code_inv_norms = 1.0 / code_norms
+            else:
+                print("[WARNING] EMBEDDING_QUANTIZATION=int8 needs simsimd; scanning float32 embeddings")
         
-        if not top_100_chunks:
-            return []
+        ann_index = None
+        if HNSWLIB_AVAILABLE and len(chunks) >= HNSW_MIN_CHUNKS:
+            # Rows are unit length, so inner product is cosine similarity
+            print(f"Building HNSW index over {len(chunks)} embeddings...")
+            ann_index = hnswlib.Index(space='ip', dim=matrix.shape[1])
+            ann_index.init_index(max_elements=len(chunks), ef_construction=200, M=16)
+            ann_index.add_items(matrix, np.arange(len(chunks)))
+            ann_index.set_ef(HNSW_EF_SEARCH)
         
-        # STAGE 2: Re-rank top 100 with metadata boost
-        stage2_start = time.time()
-        scored_chunks = []
-        for chunk in top_100_chunks:
-            base_score = chunk.get('similarity_score', 0.0)
-            metadata_boost = calculate_metadata_boost(chunk, analysis)
-            final_score = base_score + metadata_boost
-            
-            scored_chunks.append({
-                **chunk,
-                'similarity_score': float(base_score),
-                'metadata_boost': float(metadata_boost),
-                'final_score': float(final_score)
-            })
+        _fallback_index = (dataset, chunks, matrix, source_codes, source_code_by_id, codes, code_inv_norms, ann_index)
+    return _fallback_index[1:]
+
+def top_k_by_score(scores, k):
+    """Return (positions, scores) of the k highest scores, best first, without sorting the rest"""
+    if len(scores) > k:
+        positions = np.argpartition(-scores, k - 1)[:k]
+    else:
+        positions = np.arange(len(scores))
+    # Stable sort of ascending positions keeps ties in dataset order
+    positions = np.sort(positions)
+    positions = positions[np.argsort(-scores[positions], kind='stable')]
+    return positions, scores[positions]
+
+def retrieve_candidates(query_embedding, selected_sources=None):
+    """Stage 1 of search_with_filters: top 100 by similarity from ChromaDB (or the fallback scan), as
+    parallel lists of dataset chunks and similarity scores; needs no query analysis"""
+    if not query_embedding:
+        return [], []
+    
+    # STAGE 1: ChromaDB vector search - get top 100 by similarity
+    if chroma_collection:
+        # Use ChromaDB for fast vector search
+        stage1_start = time.time()
+        
+        # Build where clause for source filtering if needed
+        where_clause = None
+        if selected_sources and len(selected_sources) > 0:
+            # ChromaDB where clause: {"source": {"$in": [...]}}
+            # Need to map source IDs back to source names
+            source_names = [source_name_by_id[source_id] for source_id in selected_sources if source_id in source_name_by_id]
+            if source_names:
+                where_clause = {"source": {"$in": source_names}}
+        
+        # Query ChromaDB for top 100 results; chunk text and metadata come from dataset,
+        # so only ids and distances are fetched
+        results = chroma_collection.query(
+            query_embeddings=[query_embedding],
+            n_results=100,  # Get top 100 for re-ranking
+            where=where_clause,
+            include=["distances"]
+        )
+        
+        stage1_time = time.time() - stage1_start
+        print(f"[TIMING] Stage 1 (ChromaDB top 100): {stage1_time:.3f}s")
+        
+        # Map ChromaDB results back to dataset chunks, kept as parallel candidate/similarity
+        # arrays; result dicts are only built for the final top 15
+        candidates = []
+        candidate_similarities = []
+        if results['ids'] and len(results['ids'][0]) > 0:
+            ids = results['ids'][0]
+            similarities = chroma_distances_to_similarities(results['distances'][0] if results.get('distances') else [], len(ids))
+            for chunk_id, similarity in zip(ids, similarities.tolist()):
+                chunk = chunk_by_id.get(chunk_id)
+                if chunk is not None:
+                    candidates.append(chunk)
+                    candidate_similarities.append(similarity)
+    else:
+        # Fallback: use old method if ChromaDB not available
+        print("[WARNING] ChromaDB not available, using slower fallback method")
+        stage1_start = time.time()
+        
+        valid_chunks, embedding_matrix, source_codes, source_code_by_id, embedding_codes, code_inv_norms, ann_index = get_fallback_index()
+        
+        # Rows of the selected sources (all rows when no sources are selected)
+        rows = None
+        if selected_sources and len(selected_sources) > 0:
+            codes = [source_code_by_id[source_id] for source_id in selected_sources if source_id in source_code_by_id]
+            rows = np.flatnonzero(np.isin(source_codes, codes))
+            if len(rows) == 0:
+                return [], []
         
-        # Sort by final score and return top 15
-        scored_chunks.sort(key=lambda x: x['final_score'], reverse=True)
-        top_15 = scored_chunks[:15]
+        if not valid_chunks:
+            return [], []
         
-        stage2_time = time.time() - stage2_start
-        total_time = time.time() - start_time
-        print(f"[TIMING] Stage 2 (Re-rank top 100): {stage2_time:.3f}s")
-        print(f"[TIMING] Total search time: {total_time:.3f}s")
+        # Rows are unit length, so cosine similarity is a single dot product per row
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        query_vector = query_vector / (np.linalg.norm(query_vector) or 1.0)
+        if ann_index is not None and (rows is None or len(rows) >= HNSW_MIN_CHUNKS):
+            # Approximate top 100 from the HNSW graph (restricted to the selected rows),
+            # rescored exactly in float32
+            row_filter = None
+            if rows is not None:
+                selected = np.zeros(len(valid_chunks), dtype=bool)
+                selected[rows] = True
+                row_filter = lambda label: selected[label]
+            labels, _ = ann_index.knn_query(query_vector, k=100, filter=row_filter)
+            candidates = np.sort(labels[0].astype(np.intp))
+            candidate_positions, top_scores = top_k_by_score(embedding_matrix[candidates] @ query_vector, 100)
+            top_indices = candidates[candidate_positions]
+        elif embedding_codes is not None:
+            # Rank by the cosine of the int8 codes (exact integer dot products over a
+            # quarter of the float32 bytes), then rescore the best candidates in float32
+            query_codes = quantize_rows(query_vector[None, :])
+            approximate = np.asarray(simsimd.cdist(query_codes, embedding_codes, metric='dot'))[0] * code_inv_norms
+            if rows is not None:
+                approximate = approximate[rows]
+            candidate_positions, _ = top_k_by_score(approximate, 100 * INT8_OVERSAMPLE)
+            candidates = np.sort(rows[candidate_positions] if rows is not None else candidate_positions)
+            candidate_positions, top_scores = top_k_by_score(embedding_matrix[candidates] @ query_vector, 100)
+            top_indices = candidates[candidate_positions]
+        else:
+            if SIMSIMD_AVAILABLE:
+                similarities = np.asarray(simsimd.cdist(query_vector[None, :], embedding_matrix, metric='dot'))[0]
+            else:
+                similarities = embedding_matrix @ query_vector
+            if rows is not None:
+                similarities = similarities[rows]
+            
+            # Get top 100 by similarity
+            top_positions, top_scores = top_k_by_score(similarities, 100)
+            top_indices = rows[top_positions] if rows is not None else top_positions
+        candidates = [valid_chunks[index] for index in top_indices.tolist()]
+        candidate_similarities = top_scores
         
+        stage1_time = time.time() - stage1_start
+        print(f"[TIMING] Stage 1 (Fallback top 100): {stage1_time:.3f}s")
+    
+    return candidates, candidate_similarities
+
+def rerank_candidates(candidates, candidate_similarities, analysis):
+    """Stage 2 of search_with_filters: re-rank retrieve_candidates() results with the metadata boost → top 15"""
+    if not candidates:
+        return []
+    
+    # STAGE 2: Re-rank top 100 with metadata boost
+    stage2_start = time.time()
+    prepared_boost = prepare_metadata_boost(analysis)
+    base_scores = np.array(candidate_similarities, dtype=np.float64)
+    metadata_boosts = np.array([calculate_metadata_boost(chunk, analysis, prepared_boost, boost_features[chunk['_chunk_index']]) for chunk in candidates], dtype=np.float64)
+    final_scores = base_scores + metadata_boosts
+    
+    # Sort by final score (stable, so ties keep similarity order) and return top 15
+    top_15 = [
+        {
+            # Embeddings are only needed for retrieval, not by the client
+            **{key: value for key, value in candidates[i].items() if key != 'embedding'},
+            'similarity_score': float(base_scores[i]),
+            'metadata_boost': float(metadata_boosts[i]),
+            'final_score': float(final_scores[i])
+        }
+        for i in np.argsort(-final_scores, kind='stable')[:15].tolist()
+    ]
+    
+    stage2_time = time.time() - stage2_start
+    print(f"[TIMING] Stage 2 (Re-rank top 100): {stage2_time:.3f}s")
+    
+    return top_15
+
+def search_with_filters(query, query_embedding, analysis, selected_sources=None):
+    """Perform intelligent two-stage search: ChromaDB top 100 → re-rank with metadata → top 15"""
+    try:
+        start_time = time.time()
+        candidates, candidate_similarities = retrieve_candidates(query_embedding, selected_sources)
+        top_15 = rerank_candidates(candidates, candidate_similarities, analysis)
+        if top_15:
+            total_time = time.time() - start_time
+            print(f"[TIMING] Total search time: {total_time:.3f}s")
         return top_15
         
     except Exception as e:
@@ -17,8 +17,34 @@ import yaml
 from dataclasses import dataclass, asdict
 from typing import Dict, List, Optional, Any
 from datetime import datetime
+import bisect
 import re
 
+# libyaml-backed C dumper/loader when PyYAML was built with it
+try:
+    from yaml import CSafeDumper as _YamlDumper, CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeDumper as _YamlDumper, SafeLoader as _YamlLoader
+
+try:
+    import orjson  # Serializes the metadata dataclasses natively, without asdict()
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
+
+_NON_LETTER_RE = re.compile(r'[^a-zA-Z]')
+_YEAR_RE = re.compile(r'\b(19|20)\d{2}\b')  # 1900-2099
+
+
+def _ordinal(number: int) -> str:
+    """English ordinal for a positive integer: 1st, 2nd, 3rd, 4th, ..., 11th, 12th, 13th, ..., 21st."""
+    if 10 <= number % 100 <= 20:
+        suffix = 'th'
+    else:
+        suffix = {1: 'st', 2: 'nd', 3: 'rd'}.get(number % 10, 'th')
+    return f"{number}{suffix}"
+
 
 @dataclass
 class SourceIdentification:
@@ -132,6 +158,11 @@ class SourceMetadataManager:
         self.theological_traditions = self._load_theological_traditions()
         self.genres = self._load_theological_genres()
         self.historical_periods = self._load_historical_periods()
+        # Periods ordered by start year, for bisecting a publication year into its period
+        ordered_periods = sorted(self.historical_periods.items(), key=lambda item: item[1][0])
+        self._period_names = [period for period, _ in ordered_periods]
+        self._period_starts = [start for _, (start, _) in ordered_periods]
+        self._period_ends = [end for _, (_, end) in ordered_periods]
         
     def _load_theological_traditions(self) -> Dict[str, List[str]]:
         """Load theological tradition classification data."""
@@ -265,7 +296,7 @@ class SourceMetadataManager:
         date_elem = xml_root.find('.//DC.Date')
         pub_year = None
         if date_elem is not None and date_elem.text:
-            year_match = re.search(r'\b(19|20)\d{2}\b', date_elem.text)
+            year_match = _YEAR_RE.search(date_elem.text)
             if year_match:
                 pub_year = int(year_match.group(0))
         
@@ -283,8 +314,8 @@ class SourceMetadataManager:
     def _generate_source_id(self, title: str, author: str) -> str:
         """Generate a unique source identifier."""
         # Clean title and author for ID
-        clean_title = re.sub(r'[^a-zA-Z]', '', title)[:8].upper()
-        clean_author = re.sub(r'[^a-zA-Z]', '', author.split()[-1])[:6].upper()
+        clean_title = _NON_LETTER_RE.sub('', title)[:8].upper()
+        clean_author = _NON_LETTER_RE.sub('', author.split()[-1])[:6].upper()
         
         return f"{clean_title}_{clean_author}"
     
@@ -296,19 +327,8 @@ class SourceMetadataManager:
         historical_period = ""
         century = ""
         if publication.original_publication_year:
-            for period, (start, end) in self.historical_periods.items():
-                if start <= publication.original_publication_year <= end:
-                    historical_period = period
-                    break
-            century = f"{((publication.original_publication_year - 1) // 100) + 1}"
-            if century == "21":
-                century = "21st"
-            elif century == "20":
-                century = "20th"
-            elif century == "19":
-                century = "19th"
-            else:
-                century = f"{century}th"
+            historical_period = self._historical_period(publication.original_publication_year)
+            century = _ordinal(((publication.original_publication_year - 1) // 100) + 1)
         
         # Basic classification (could be enhanced with NLP)
         classification = TheologicalClassification(
@@ -329,17 +349,31 @@ class SourceMetadataManager:
         
         return classification
     
+    def _historical_period(self, year: int) -> str:
+        """Name of the historical period containing year, or "" if none does."""
+        index = bisect.bisect_right(self._period_starts, year) - 1
+        # Period ranges are inclusive, so a boundary year belongs to the earlier period
+        if index > 0 and year <= self._period_ends[index - 1]:
+            index -= 1
+        if index >= 0 and year <= self._period_ends[index]:
+            return self._period_names[index]
+        return ""
+    
     def _analyze_content_from_xml(self, xml_root) -> ContentCharacteristics:
         """Analyze content characteristics from XML structure."""
         
-        # Count chapters/divisions
-        div1_elements = xml_root.findall('.//div1')
-        chapter_count = len([div for div in div1_elements 
-                           if div.get('title', '').lower() not in ['title page', 'toc']])
-        
-        # Check for structural elements
-        has_preface = any(div.get('title', '').lower() == 'preface' for div in div1_elements)
-        has_introduction = any('introduction' in div.get('title', '').lower() for div in div1_elements)
+        # Count chapters/divisions and check for structural elements in one pass
+        chapter_count = 0
+        has_preface = False
+        has_introduction = False
+        for div in xml_root.iterfind('.//div1'):
+            title = div.get('title', '').lower()
+            if title not in ('title page', 'toc'):
+                chapter_count += 1
+            if title == 'preface':
+                has_preface = True
+            elif 'introduction' in title:
+                has_introduction = True
         
         return ContentCharacteristics(
             chapter_count=chapter_count,
@@ -374,8 +408,10 @@ class SourceMetadataManager:
         """Save metadata in specified format."""
         
         if format == 'yaml':
-            return yaml.dump(asdict(metadata), default_flow_style=False, sort_keys=False)
+            return yaml.dump(asdict(metadata), Dumper=_YamlDumper, default_flow_style=False, sort_keys=False)
         elif format == 'json':
+            if ORJSON_AVAILABLE:
+                return orjson.dumps(metadata, option=orjson.OPT_INDENT_2).decode('utf-8')
             return json.dumps(asdict(metadata), indent=2)
         else:
             raise ValueError(f"Unsupported format: {format}")
@@ -384,9 +420,9 @@ class SourceMetadataManager:
         """Load metadata from string representation."""
         
         if format == 'yaml':
-            data = yaml.safe_load(metadata_str)
+            data = yaml.load(metadata_str, Loader=_YamlLoader)
         elif format == 'json':
-            data = json.loads(metadata_str)
+            data = orjson.loads(metadata_str) if ORJSON_AVAILABLE else json.loads(metadata_str)
         else:
             raise ValueError(f"Unsupported format: {format}")
         
@@ -11,9 +11,17 @@ import sys
 import os
 from pathlib import Path
 import xml.etree.ElementTree as ET
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
 import re
 
+# Prefer lxml's C parser to stream div1s; fall back to parsing the whole tree with ElementTree
+try:
+    from lxml import etree as lxml_etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+    lxml_etree = None
+
 # Add parent directories to path to import base processor
 # Script is in theological_processing/scripts/, need to go up 2 levels to root
 script_dir = Path(__file__).parent
@@ -22,6 +30,37 @@ sys.path.insert(0, str(root_dir))
 
 from ccel_xml_to_markdown import CCELThMLProcessor
 
+# Section titles that are a bare chapter number: "12", or a lowercased Roman numeral: "xii."
+_NUMBER_TITLE_RE = re.compile(r'^[0-9]+$')
+_ROMAN_TITLE_RE = re.compile(r'^[ivxlc]+\.?$')
+# Uppercased headings that just repeat the book title
+_BOOK_TITLE_SKIP = frozenset({'THE CONFESSIONS OF SAINT AUGUSTINE', 'CONFESSIONS'})
+
+
+class _NbspToSpaceReader:
+    """Binary file wrapper that streams its bytes with &nbsp; replaced by a space.
+    
+    &nbsp; is undefined without the ThML DTD, so parsers reject it; replacing it
+    per read keeps the parse incremental instead of loading the whole file first.
+    """
+    
+    def __init__(self, f):
+        self._f = f
+        self._carry = b''
+    
+    def read(self, size: int = -1) -> bytes:
+        while True:
+            chunk = self._f.read(size)
+            data = self._carry + chunk
+            self._carry = b''
+            if chunk:
+                # Hold back a trailing '&' that may start an entity split across reads
+                amp = data.rfind(b'&', max(0, len(data) - 5))
+                if amp != -1:
+                    data, self._carry = data[:amp], data[amp:]
+            if data or not chunk:
+                return data.replace(b'&nbsp;', b' ')
+
 
 class ConfessionsProcessor(CCELThMLProcessor):
     """
@@ -32,17 +71,36 @@ class ConfessionsProcessor(CCELThMLProcessor):
     - div2 = Chapters within each Book (Chapter I, Chapter II, etc.)
     """
     
-    def process_div1_sections(self, root: ET.Element) -> List[Dict]:
-        """Process div1 sections, handling nested div2 chapters for Books."""
-        body = root.find('.//ThML.body')
-        if body is None:
-            return []
-        
-        sections = []
+    @staticmethod
+    def children_by_tag(element: ET.Element) -> Dict[str, List[ET.Element]]:
+        """Group an element's direct children by tag in a single pass, keeping document order."""
+        children = {}
+        for child in element:
+            # lxml comments and processing instructions have a non-string tag
+            if isinstance(child.tag, str):
+                children.setdefault(child.tag, []).append(child)
+        return children
+    
+    def extract_headings(self, children: Dict[str, List[ET.Element]]) -> List[tuple]:
+        """(level, text) of the h1-h6 children grouped by children_by_tag, by level then document order."""
+        headings = []
+        for i in range(1, 7):
+            for heading in children.get(f'h{i}', ()):
+                heading_text = self.extract_text_content(heading)
+                if heading_text:
+                    headings.append((i, self.clean_text(heading_text)))
+        return headings
+    
+    def process_div1_elements(self, div1_elements: Iterable[ET.Element]) -> Iterator[Dict]:
+        """Process div1 sections, handling nested div2 chapters for Books.
         
-        for div1 in body.findall('div1'):
+        Yields one section per chapter for Books; process_div1_sections(root)
+        from the base class collects these into a list.
+        """
+        for div1 in div1_elements:
             # Check if this div1 has nested div2 elements (chapters)
-            div2_elements = div1.findall('div2')
+            div1_children = self.children_by_tag(div1)
+            div2_elements = div1_children.get('div2')
             
             if div2_elements:
                 # This is a Book with Chapters - process each chapter separately
@@ -54,12 +112,7 @@ class ConfessionsProcessor(CCELThMLProcessor):
                     continue
                 
                 # Extract book-level headings
-                book_headings = []
-                for i in range(1, 7):
-                    for heading in div1.findall(f'h{i}'):
-                        heading_text = self.extract_text_content(heading)
-                        if heading_text:
-                            book_headings.append((i, self.clean_text(heading_text)))
+                book_headings = self.extract_headings(div1_children)
                 
                 # Process each chapter (div2) within this book
                 for div2 in div2_elements:
@@ -71,9 +124,9 @@ class ConfessionsProcessor(CCELThMLProcessor):
                     )
                     
                     if chapter_data:
-                        sections.append(chapter_data)
                         if self.verbose:
                             print(f"Processing: {chapter_data['title']}")
+                        yield chapter_data
             else:
                 # No div2 elements - fall back to standard div1 processing
                 # But still skip Contents
@@ -81,9 +134,7 @@ class ConfessionsProcessor(CCELThMLProcessor):
                 if title.lower() not in ['contents', 'toc', 'table of contents', 'title page']:
                     section_data = self.process_div1(div1)
                     if section_data:
-                        sections.append(section_data)
-        
-        return sections
+                        yield section_data
     
     def process_div2_as_section(
         self, 
@@ -97,22 +148,18 @@ class ConfessionsProcessor(CCELThMLProcessor):
         chapter_id = div2.get('id', '')
         
         # Extract chapter-level headings
-        chapter_headings = []
-        for i in range(1, 7):
-            for heading in div2.findall(f'h{i}'):
-                heading_text = self.extract_text_content(heading)
-                if heading_text:
-                    chapter_headings.append((i, self.clean_text(heading_text)))
+        children = self.children_by_tag(div2)
+        chapter_headings = self.extract_headings(children)
         
         # Extract paragraphs from this chapter
         paragraphs = []
-        for p in div2.findall('p'):
+        for p in children.get('p', ()):
             p_text = self.extract_text_content(p)
             if p_text:
                 paragraphs.append(self.clean_text(p_text))
         
         # Also check for verse elements (poetry within prose)
-        for verse in div2.findall('verse'):
+        for verse in children.get('verse', ()):
             verse_text = self.extract_text_content(verse)
             if verse_text:
                 # Add verse as a separate paragraph for clarity
@@ -157,9 +204,9 @@ class ConfessionsProcessor(CCELThMLProcessor):
             if div1_title:
                 cleaned_title = div1_title.strip()
                 # Clean up common chapter/section patterns
-                if re.match(r'^[0-9]+$', cleaned_title):
+                if _NUMBER_TITLE_RE.match(cleaned_title):
                     cleaned_title = f"Chapter {cleaned_title}"
-                elif re.match(r'^[ivxlc]+\.?$', cleaned_title.lower()):
+                elif _ROMAN_TITLE_RE.match(cleaned_title.lower()):
                     cleaned_title = f"Chapter {cleaned_title.upper()}"
                 elif cleaned_title.lower() in ['preface', 'foreword', 'introduction']:
                     cleaned_title = cleaned_title.capitalize()
@@ -167,15 +214,17 @@ class ConfessionsProcessor(CCELThMLProcessor):
                 path_parts.append(cleaned_title)
         
         # Add meaningful headings (skip redundant ones)
+        div1_title_upper = div1_title.upper()
         for level, heading_text in headings:
             cleaned_heading = heading_text.strip()
+            heading_upper = cleaned_heading.upper()
             
             # Skip if it's just repeating the title
-            if div1_title and cleaned_heading.upper() in div1_title.upper():
+            if div1_title and heading_upper in div1_title_upper:
                 continue
             
             # Skip book titles
-            if cleaned_heading.upper() in ['THE CONFESSIONS OF SAINT AUGUSTINE', 'CONFESSIONS']:
+            if heading_upper in _BOOK_TITLE_SKIP:
                 continue
             
             # Add h1 and h2 level headings for structure
@@ -203,17 +252,40 @@ if __name__ == '__main__':
         print(f"Error: File not found: {source_path}")
         sys.exit(1)
     
-    with open(source_path, 'r', encoding='utf-8') as f:
-        xml_content = f.read()
-    
-    # Parse XML (simplified - actual pipeline uses more robust cleaning)
-    try:
-        root = ET.fromstring(xml_content)
-    except ET.ParseError as e:
-        print(f"XML Parse Error: {e}")
-        sys.exit(1)
-    
-    sections = processor.process_div1_sections(root)
+    if LXML_AVAILABLE:
+        def iter_body_div1s(context):
+            """Yield each ThML.body div1 as iterparse completes it, then free it and its predecessors."""
+            for _, div1 in context:
+                body = div1.getparent()
+                if body is None or body.tag != 'ThML.body':
+                    continue
+                yield div1
+                div1.clear(keep_tail=True)
+                while div1.getprevious() is not None:
+                    del body[0]
+        
+        with open(source_path, 'rb') as f:
+            context = lxml_etree.iterparse(
+                _NbspToSpaceReader(f),
+                events=('end',),
+                tag='div1',
+                huge_tree=True
+            )
+            try:
+                sections = list(processor.process_div1_elements(iter_body_div1s(context)))
+            except lxml_etree.XMLSyntaxError as e:
+                print(f"XML Parse Error: {e}")
+                sys.exit(1)
+    else:
+        # Parse XML straight from the file (simplified - actual pipeline uses more robust cleaning)
+        try:
+            with open(source_path, 'rb') as f:
+                root = ET.parse(_NbspToSpaceReader(f)).getroot()
+        except ET.ParseError as e:
+            print(f"XML Parse Error: {e}")
+            sys.exit(1)
+        
+        sections = processor.process_div1_sections(root)
     
     print(f"\nProcessed {len(sections)} sections")
     print(f"\nFirst few sections:")
@@ -7,6 +7,14 @@ import json
 import re
 from pathlib import Path
 
+# orjson is a faster drop-in for JSONL encoding; fall back to the stdlib json module
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
+
 # Book and chapter mapping
 BOOK_CHAPTER_MAP = {
     "Book 1": {
@@ -64,6 +72,12 @@ BOOK_CHAPTER_MAP = {
     }
 }
 
+# Front and back matter sections whose structure_path is kept as-is
+SPECIAL_SECTIONS = frozenset({
+    "Contents", "Preface", "Foreword", "About the Author",
+    "Other Books by C. S. Lewis", "About the Publisher", "Copyright"
+})
+
 # Chapter title patterns for detection
 CHAPTER_TITLES = {}
 for book_num, book_info in BOOK_CHAPTER_MAP.items():
@@ -72,79 +86,58 @@ for book_num, book_info in BOOK_CHAPTER_MAP.items():
         normalized = chap_title.upper().replace('"', "'")
         CHAPTER_TITLES[normalized] = (book_num, chap_num)
 
+# Chapter number -> books containing it, in book order
+CHAPTER_TO_BOOKS = {}
+for book_num, book_info in BOOK_CHAPTER_MAP.items():
+    for chap_num in book_info["chapters"]:
+        CHAPTER_TO_BOOKS.setdefault(chap_num, []).append(book_num)
+
+def _strip_quotes_and_spaces(text):
+    return text.replace("'", "").replace('"', "").replace(" ", "")
+
+# (title, title without quotes/spaces, (book, chapter)) in CHAPTER_TITLES order; titles are
+# already uppercase, so both forms are computed once here rather than per chunk
+CHAPTER_TITLE_FORMS = [
+    (title, _strip_quotes_and_spaces(title), location)
+    for title, location in CHAPTER_TITLES.items()
+]
+
 def detect_chapter_from_text(text):
     """Try to detect book and chapter from text content."""
     # Look for chapter titles in the first 500 characters
     text_upper = text[:500].upper()
+    # Remove common punctuation variations
+    text_clean = _strip_quotes_and_spaces(text_upper)
     
-    # Try to find chapter titles - check for full match first
-    for title, (book_num, chap_num) in CHAPTER_TITLES.items():
-        title_upper = title.upper()
-        # Check if title appears near the start of the text
-        # Remove common punctuation variations
-        title_clean = title_upper.replace("'", "").replace('"', "").replace(" ", "")
-        text_clean = text_upper.replace("'", "").replace('"', "").replace(" ", "")
-        
-        # Check if title (or cleaned version) appears in text
+    # Return the first title (in chapter order) that appears, as written or cleaned
+    for title_upper, title_clean, (book_num, chap_num) in CHAPTER_TITLE_FORMS:
         if title_upper in text_upper or title_clean in text_clean:
             return book_num, chap_num
     
     return None, None
 
-def update_structure_path(chunk):
-    """Update structure_path for a chunk."""
-    current_path = chunk.get("structure_path", [])
-    
-    # Handle special sections
-    if not current_path:
-        return chunk
-    
-    first_path = current_path[0] if current_path else ""
-    
-    # Keep special sections as-is
-    if first_path in ["Contents", "Preface", "Foreword", "About the Author", 
-                     "Other Books by C. S. Lewis", "About the Publisher", "Copyright"]:
-        return chunk
-    
-    # Try to detect from text if structure_path is just a number
-    if first_path.isdigit():
-        chapter_num = int(first_path)
-        text = chunk.get("text", "")
-        
-        # Detect book and chapter from text
-        book_num, detected_chap = detect_chapter_from_text(text)
-        
-        if book_num and detected_chap:
-            book_info = BOOK_CHAPTER_MAP[book_num]
-            chapter_title = book_info["chapters"][detected_chap]
-            
-            # Format: Book 1: Right and Wrong > Chapter 1: The Law of Human Nature
-            book_name = f"Book {book_num.split()[-1]}: {book_info['name']}"
-            chapter_name = f"Chapter {detected_chap}: {chapter_title}"
-            chunk["structure_path"] = [book_name, chapter_name]
-        else:
-            # Fallback: try to infer from chapter number sequence
-            # Book 1: chapters 1-5
-            # Book 2: chapters 1-5
-            # Book 3: chapters 1-12
-            # Book 4: chapters 1-11
-            
-            # We need to track which book we're in based on sequence
-            # This is a fallback - ideally we'd detect from text
-            # For now, we'll need to track state or use a different approach
-            pass
-    
-    return chunk
+# (book, chapter) -> formatted structure_path labels, e.g.
+# ("Book 1: Right and Wrong", "Chapter 1: The Law of Human Nature")
+CHAPTER_LABELS = {}
+for book_num, book_info in BOOK_CHAPTER_MAP.items():
+    book_name = f"Book {book_num.split()[-1]}: {book_info['name']}"
+    for chap_num, chap_title in book_info["chapters"].items():
+        CHAPTER_LABELS[(book_num, chap_num)] = (book_name, f"Chapter {chap_num}: {chap_title}")
+
+def chapter_structure_path(book_num, chap_num):
+    """structure_path for a chapter, e.g. ["Book 1: Right and Wrong", "Chapter 1: The Law of Human Nature"]."""
+    return list(CHAPTER_LABELS[(book_num, chap_num)])
 
 def process_chunks_file(input_file, output_file):
     """Process all chunks and update structure_path."""
     chunks = []
     
     print(f"Reading chunks from: {input_file}")
-    with open(input_file, 'r', encoding='utf-8') as f:
+    loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+    with open(input_file, 'rb') as f:
         for line in f:
             if line.strip():
-                chunk = json.loads(line)
+                chunk = loads(line)
                 chunks.append(chunk)
     
     print(f"Found {len(chunks)} chunks")
@@ -155,101 +148,51 @@ def process_chunks_file(input_file, output_file):
     
     # Process chunks
     updated_chunks = []
-    for i, chunk in enumerate(chunks):
+    for chunk in chunks:
         current_path = chunk.get("structure_path", [])
         first_path = current_path[0] if current_path else ""
         
         # Handle special sections
-        if first_path in ["Contents", "Preface", "Foreword", "About the Author",
-                         "Other Books by C. S. Lewis", "About the Publisher", "Copyright"]:
+        if first_path in SPECIAL_SECTIONS:
             updated_chunks.append(chunk)
             continue
         
         # If it's a numeric path, try to map it
         if first_path.isdigit():
             chapter_num = int(first_path)
-            text = chunk.get("text", "")
             
             # Try to detect from text first (primary method)
-            book_num, detected_chap = detect_chapter_from_text(text)
+            book_num, detected_chap = detect_chapter_from_text(chunk.get("text", ""))
             
-            if book_num and detected_chap:
-                # Found chapter title in text - use it
-                book_info = BOOK_CHAPTER_MAP[book_num]
-                chapter_title = book_info["chapters"][detected_chap]
-                book_name = f"Book {book_num.split()[-1]}: {book_info['name']}"
-                chapter_name = f"Chapter {detected_chap}: {chapter_title}"
-                chunk["structure_path"] = [book_name, chapter_name]
+            if not (book_num and detected_chap):
+                # Fallback: stay in the last detected book if it has this chapter number,
+                # otherwise use the first book that does (Book 1 for the first chunk)
+                if last_detected_book and chapter_num in BOOK_CHAPTER_MAP[last_detected_book]["chapters"]:
+                    book_num = last_detected_book
+                else:
+                    book_num = CHAPTER_TO_BOOKS.get(chapter_num, [None])[0]
+                detected_chap = chapter_num
+            
+            if book_num:
+                chunk["structure_path"] = chapter_structure_path(book_num, detected_chap)
                 # Update last detected
                 last_detected_book = book_num
                 last_detected_chapter = detected_chap
             else:
-                # Fallback: use last detected book, but check if chapter_num matches
-                if last_detected_book:
-                    # Check if chapter_num exists in last detected book
-                    if chapter_num in BOOK_CHAPTER_MAP[last_detected_book]["chapters"]:
-                        # Use the chapter_num from structure_path
-                        book_info = BOOK_CHAPTER_MAP[last_detected_book]
-                        chapter_title = book_info["chapters"][chapter_num]
-                        book_name = f"Book {last_detected_book.split()[-1]}: {book_info['name']}"
-                        chapter_name = f"Chapter {chapter_num}: {chapter_title}"
-                        chunk["structure_path"] = [book_name, chapter_name]
-                        # Update last detected
-                        last_detected_chapter = chapter_num
-                    else:
-                        # Chapter doesn't exist in last book - try to find which book it belongs to
-                        found_book = None
-                        for book_key, book_info in BOOK_CHAPTER_MAP.items():
-                            if chapter_num in book_info["chapters"]:
-                                found_book = book_key
-                                break
-                        
-                        if found_book:
-                            book_info = BOOK_CHAPTER_MAP[found_book]
-                            chapter_title = book_info["chapters"][chapter_num]
-                            book_name = f"Book {found_book.split()[-1]}: {book_info['name']}"
-                            chapter_name = f"Chapter {chapter_num}: {chapter_title}"
-                            chunk["structure_path"] = [book_name, chapter_name]
-                            # Update last detected
-                            last_detected_book = found_book
-                            last_detected_chapter = chapter_num
-                        else:
-                            # Can't map - keep original
-                            print(f"Warning: Could not map chunk {chunk.get('id')} with structure_path {current_path} (chapter {chapter_num} not found in any book)")
-                else:
-                    # No last detected - try to find which book chapter_num belongs to
-                    # This happens for the first chunk
-                    found_book = None
-                    for book_key, book_info in BOOK_CHAPTER_MAP.items():
-                        if chapter_num in book_info["chapters"]:
-                            # For chapter 1, start with Book 1
-                            if chapter_num == 1 and not found_book:
-                                found_book = "Book 1"
-                            elif chapter_num > 1:
-                                # For other chapters, use first book that has it
-                                if not found_book:
-                                    found_book = book_key
-                    
-                    if found_book:
-                        book_info = BOOK_CHAPTER_MAP[found_book]
-                        chapter_title = book_info["chapters"][chapter_num]
-                        book_name = f"Book {found_book.split()[-1]}: {book_info['name']}"
-                        chapter_name = f"Chapter {chapter_num}: {chapter_title}"
-                        chunk["structure_path"] = [book_name, chapter_name]
-                        # Update last detected
-                        last_detected_book = found_book
-                        last_detected_chapter = chapter_num
-                    else:
-                        # Can't map - keep original
-                        print(f"Warning: Could not map chunk {chunk.get('id')} with structure_path {current_path} (chapter {chapter_num} not found)")
+                # Can't map - keep original
+                reason = "not found in any book" if last_detected_book else "not found"
+                print(f"Warning: Could not map chunk {chunk.get('id')} with structure_path {current_path} (chapter {chapter_num} {reason})")
         
         updated_chunks.append(chunk)
     
     # Write updated chunks
     print(f"Writing updated chunks to: {output_file}")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        for chunk in updated_chunks:
-            f.write(json.dumps(chunk, ensure_ascii=False) + '\n')
+    if ORJSON_AVAILABLE:
+        with open(output_file, 'wb') as f:
+            f.writelines(orjson.dumps(chunk, option=orjson.OPT_APPEND_NEWLINE) for chunk in updated_chunks)
+    else:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(chunk, ensure_ascii=False) + '\n' for chunk in updated_chunks)
     
     print(f"✅ Updated {len(updated_chunks)} chunks")
     
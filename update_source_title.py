@@ -10,11 +10,44 @@ Example:
 """
 
 import json
+import mmap
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 import shutil
 
+# orjson is a faster drop-in for JSONL encoding; fall back to the stdlib json module
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    orjson = None
+
+def iter_lines(file_path: Path):
+    """Yield each line of a file as bytes, newline included, splitting a memory map in C with find()."""
+    with open(file_path, 'rb') as f:
+        # mmap cannot map an empty file
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos, end = 0, len(mm)
+            while pos < end:
+                nl = mm.find(b'\n', pos)
+                nl = end if nl < 0 else nl + 1
+                yield mm[pos:nl]
+                pos = nl
+
+def file_contains(file_path: Path, needle: bytes) -> bool:
+    """Whether the raw bytes of a file contain needle, searched in C over a memory map."""
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return False
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm.find(needle) != -1
+
 def update_source_in_file(file_path: Path, old_title: str, new_title: str) -> tuple[int, bool]:
     """
     Update source title in a JSONL file.
@@ -24,23 +57,36 @@ def update_source_in_file(file_path: Path, old_title: str, new_title: str) -> tu
         print(f"  ⚠️  File not found: {file_path}")
         return 0, False
     
-    # Create backup
-    backup_path = file_path.parent / f"{file_path.name}.backup"
-    if file_path.exists():
-        shutil.copy2(file_path, backup_path)
+    # Skip parsing files the title cannot occur in. Only titles JSON encoders write
+    # verbatim (ASCII without quotes, backslashes or control characters) can be
+    # searched for as raw bytes; anything else goes straight to the full parse.
+    if old_title.isascii() and not any(c in '"\\' or c < ' ' for c in old_title):
+        if not file_contains(file_path, old_title.encode('ascii')):
+            return 0, False
     
     chunks_updated = 0
     updated_chunks = []
+    # Original line of each chunk, or None where the chunk was updated and must be re-serialized
+    original_lines = []
+    
+    # Optional fields seen in any chunk, which decide the field order below
+    has_annotation = False
+    has_embedding = False
     
     # Read and update chunks
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            if line.strip():
-                chunk = json.loads(line.strip())
-                if chunk.get('source') == old_title:
-                    chunk['source'] = new_title
-                    chunks_updated += 1
-                updated_chunks.append(chunk)
+    loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+    for line in iter_lines(file_path):
+        if line.strip():
+            chunk = loads(line)
+            has_annotation = has_annotation or 'annotation_method' in chunk
+            has_embedding = has_embedding or 'embedding' in chunk
+            if chunk.get('source') == old_title:
+                chunk['source'] = new_title
+                chunks_updated += 1
+                original_lines.append(None)
+            else:
+                original_lines.append(line if line.endswith(b'\n') else line + b'\n')
+            updated_chunks.append(chunk)
     
     # Write updated chunks back
     if chunks_updated > 0:
@@ -56,19 +102,13 @@ def update_source_in_file(file_path: Path, old_title: str, new_title: str) -> tu
         field_order = ['id', 'structure_path', 'text', 'source', 'author', 'chunk_type', 'chunk_index', 
                        'processing_stage', 'processing_timestamp']
         
-        if stage == 3:
-            field_order = ['id', 'structure_path', 'text', 'source', 'author', 'chunk_type', 'chunk_index', 
-                          'processing_stage', 'processing_timestamp', 'metadata']
-            if any('annotation_method' in chunk for chunk in updated_chunks):
+        if stage in (3, 4):
+            field_order.append('metadata')
+            if has_annotation:
                 field_order.extend(['annotation_method', 'annotation_model'])
         
-        if stage == 4:
-            field_order = ['id', 'structure_path', 'text', 'source', 'author', 'chunk_type', 'chunk_index', 
-                          'processing_stage', 'processing_timestamp', 'metadata']
-            if any('annotation_method' in chunk for chunk in updated_chunks):
-                field_order.extend(['annotation_method', 'annotation_model'])
-            if any('embedding' in chunk for chunk in updated_chunks):
-                field_order.extend(['embedding', 'embedding_model'])
+        if stage == 4 and has_embedding:
+            field_order.extend(['embedding', 'embedding_model'])
         
         def reorder_chunk(chunk):
             """Reorder chunk fields to match original format"""
@@ -82,10 +122,34 @@ def update_source_in_file(file_path: Path, old_title: str, new_title: str) -> tu
                     ordered_chunk[key] = value
             return ordered_chunk
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            for chunk in updated_chunks:
-                ordered_chunk = reorder_chunk(chunk)
-                f.write(json.dumps(ordered_chunk, ensure_ascii=False) + '\n')
+        if ORJSON_AVAILABLE:
+            encode = lambda chunk: orjson.dumps(chunk, option=orjson.OPT_APPEND_NEWLINE)
+        else:
+            encode = lambda chunk: (json.dumps(chunk, ensure_ascii=False) + '\n').encode('utf-8')
+        
+        # Unchanged chunks are written back verbatim; only updated ones are reordered and re-serialized.
+        # Write to a temporary file and swap it in rather than truncating in place,
+        # which would also truncate the hardlinked backup.
+        tmp_path = file_path.parent / f"{file_path.name}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.writelines(
+                line if line is not None else encode(reorder_chunk(chunk))
+                for line, chunk in zip(original_lines, updated_chunks)
+            )
+        shutil.copymode(file_path, tmp_path)
+        
+        # Create backup as a hardlink to the original bytes just before swapping in the
+        # rewrite, so the link keeps the pre-update contents and is never left sharing
+        # the live file's inode. Fall back to a full copy where hardlinks are unsupported
+        # (e.g. across filesystems).
+        backup_path = file_path.parent / f"{file_path.name}.backup"
+        if backup_path.exists():
+            backup_path.unlink()
+        try:
+            os.link(file_path, backup_path)
+        except OSError:
+            shutil.copy2(file_path, backup_path)
+        os.replace(tmp_path, file_path)
         
         return chunks_updated, True
     
@@ -138,12 +202,23 @@ def main():
     total_updated = 0
     files_modified = []
     
-    for file_path in files_to_update:
+    # Each stage file is an independent read-modify-write pass dominated by JSON
+    # parsing, so update them in separate processes; results are reported in stage order below
+    if old_title:
+        with ProcessPoolExecutor(max_workers=len(files_to_update)) as executor:
+            results = list(executor.map(
+                update_source_in_file,
+                files_to_update,
+                [old_title] * len(files_to_update),
+                [new_title] * len(files_to_update)
+            ))
+    
+    for i, file_path in enumerate(files_to_update):
         stage_name = file_path.parent.name
         print(f"Processing {stage_name}/{file_path.name}...")
         
         if old_title:
-            chunks_updated, was_modified = update_source_in_file(file_path, old_title, new_title)
+            chunks_updated, was_modified = results[i]
             if chunks_updated > 0:
                 print(f"  ✓ Updated {chunks_updated} chunks")
                 total_updated += chunks_updated